@@ -0,0 +1,22 @@
+import asyncio
+from pytse_filter import AsyncRealTime, AsyncHistory, RealTimePoller
+from pytse_filter.async_client import AsyncClient
+
+# نظارت بر بازار و به روزرسانی سوابق همه ی نمادها در یک حلقه ی رویداد و بدون thread
+# نیاز به نصب aiohttp دارد: pip install pytse_filter[async]
+async def watch(poller):
+    async for event in poller.stream():
+        if event.kind == 'enter':
+            print(event.name, event.data['symbol'].tolist())
+
+async def main():
+    async with AsyncClient() as client:
+        market = AsyncRealTime(client= client)
+        history = AsyncHistory(client= client)
+        poller = RealTimePoller(interval= 10, market= market, conditions= {'buy_queue': 'pl == tmax and qd1 > 0'})
+        watch_task = asyncio.create_task(watch(poller))
+        summery = await history.download_summery(workers= 8)
+        print(summery)
+        watch_task.cancel()
+
+asyncio.run(main())
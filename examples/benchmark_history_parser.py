@@ -0,0 +1,86 @@
+from pytse_filter.download_history import parse_adjusted_price_history, parse_client_history, decode_client_history
+from pytse_filter import inds_setting
+from time import perf_counter
+import json
+import tracemalloc
+import jdatetime
+import numpy as np
+import pandas as pd
+
+# مقایسه ی زمان و حافظه ی پردازش سابقه ی یک نماد قدیمی، فقط با خواندن رکوردهای لازم از انتهای پاسخ
+def make_payloads(number_of_days= 5000):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end= '2024-01-01', periods= number_of_days).strftime('%Y%m%d')
+    close = (10000 + rng.normal(0, 100, number_of_days).cumsum()).astype(int)
+    price = ';'.join(f'{d},{c + 50},{c - 50},{c - 10},{c},{int(v)},{c}' for d, c, v in zip(dates, close, rng.integers(10**5, 10**8, number_of_days)))
+    fields = ['buy_I_Volume', 'buy_N_Volume', 'buy_I_Value', 'buy_N_Value', 'buy_N_Count', 'sell_I_Volume', 'buy_I_Count',
+              'sell_N_Volume', 'sell_I_Value', 'sell_N_Value', 'sell_N_Count', 'sell_I_Count']
+    records = [dict({'recDate': int(d)}, **{f: int(x) for f, x in zip(fields, rng.integers(1, 10**9, len(fields)))}) for d in dates[::-1]]
+    return price, json.dumps({'clientType': records})
+
+# پیاده سازی قبلی بدون تغییر (نسخه ی 1ae47bb)، فقط درخواست شبکه حذف شده است
+def legacy_parse_adjusted_price_history(text, length):
+    datas = text.split(';')
+    rows = []
+    for data in datas:
+        rows.append(data.split(','))
+    if len(rows) == 0 : return
+    columns = ['date',  'high', 'low', 'open', 'close', 'volume', 'adj_close']
+    df = pd.DataFrame(rows, columns= columns)
+    df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
+    def jdate(x):
+        """
+        Convert Gregorian date to jalali date
+        """
+
+        jalali_date = jdatetime.date.fromgregorian(date= x['date'])
+        return jalali_date.strftime('%Y-%m-%d')
+
+    df['jdate'] = df.apply(func= jdate, axis= 1)
+    columns = ['date', 'jdate', 'open', 'low', 'high', 'close', 'adj_close', 'volume']
+    df = df[columns]
+    df.set_index(df['date'], inplace= True)
+    df.drop(columns= ['date'], inplace= True)
+    df[columns[2:]] = df[columns[2:]].apply (pd.to_numeric, errors='coerce')
+    if length == -1 : length = 0
+    df = df[-length:]
+    return df
+
+def legacy_parse_client_history(text, length):
+    try:
+        df = pd.DataFrame(json.loads(text)['clientType'])
+    except :
+        return
+    if len(df) == 0 : return    
+    df['recDate'] = pd.to_datetime(df['recDate'], format='%Y%m%d')
+    df = df[:length]
+    df.columns = df.columns.str.lower()
+    df.rename(columns= {'recdate': 'date'}, inplace= True)
+    df.set_index(df['date'], inplace= True)
+    df.drop(columns= ['date'], inplace= True)
+    df = df[::-1]
+    df = df.astype('float64')
+    return df
+
+def measure(function, *args, runs= 10):
+    start = perf_counter()
+    for i in range(runs):
+        result = function(*args)
+    elapsed = (perf_counter() - start) / runs
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+price, client = make_payloads()
+length = inds_setting.find_count(inds_setting.indicators)
+cases = [
+    ('adjusted price', legacy_parse_adjusted_price_history, parse_adjusted_price_history, price),
+    ('client', legacy_parse_client_history, lambda text, length: parse_client_history(decode_client_history(text, length), length), client),
+]
+for name, legacy, new, payload in cases:
+    legacy_df, legacy_time, legacy_peak = measure(legacy, payload, length)
+    new_df, new_time, new_peak = measure(new, payload, length)
+    assert legacy_df.equals(new_df)
+    print(f'{name} ({length} of 5000 records): {legacy_time * 1000:.1f} ms, {legacy_peak / 1e6:.1f} MB -> {new_time * 1000:.1f} ms, {new_peak / 1e6:.1f} MB')
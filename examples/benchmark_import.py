@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+# زمان import کتابخانه و اعتبارسنجی یک شرط سابقه در یک پردازش جدید
+code = """
+import sys
+from time import perf_counter
+start = perf_counter()
+import pytse_filter
+import_time = perf_counter() - start
+start = perf_counter()
+pytse_filter.HistoryCondition('rsi < 50 and y_k < y_d and k > d')
+validate_time = perf_counter() - start
+print(f'import pytse_filter: {import_time:.3f}s')
+print(f'validate history condition: {validate_time:.3f}s')
+print(f'pandas_ta imported: {"pandas_ta" in sys.modules}')
+"""
+
+runs = 5
+for i in range(runs):
+    print(subprocess.run([sys.executable, '-c', code], capture_output= True, text= True).stdout)
+
+# برای جزئیات بیشتر: python -X importtime -c "import pytse_filter"
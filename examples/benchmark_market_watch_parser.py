@@ -0,0 +1,115 @@
+from pytse_filter.download_realtime import parse_price
+from time import perf_counter
+import sys
+import numpy as np
+import pandas as pd
+
+# مقایسه ی سرعت پردازش پاسخ MarketWatchPlus با روش قبلی
+# مسیر یک پاسخ ذخیره شده را می توان به عنوان آرگومان داد، در غیر این صورت یک پاسخ ساختگی ساخته می شود
+def make_payload(number_of_symbols= 700):
+    rng = np.random.default_rng(0)
+    price, book = [], []
+    for i in range(number_of_symbols):
+        py = int(rng.integers(1000, 50000))
+        values = [py + int(x) for x in rng.integers(-300, 300, 8)]
+        price.append(','.join([str(10**15 + i), f'IRO1X{i:05d}0001', f'symbol{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}', f'name {i}', '120000']
+            + [str(x) for x in values[:3]] + [str(int(x)) for x in rng.integers(1, 10**8, 3)] + [str(x) for x in values[3:5]]
+            + [str(py), '100', '1000', '0', '0', '0', str(py + 500), str(py - 500), '1000000', '300']))
+        for depth in range(1, 6):
+            book.append(','.join([str(10**15 + i), str(depth)] + [str(int(x)) for x in rng.integers(1, 1000, 6)]))
+    return '0,0,0@index@' + ';'.join(price) + '@' + ';'.join(book) + '@123456'
+
+# پیاده سازی قبلی بدون تغییر (نسخه ی 1ae47bb)، فقط درخواست شبکه حذف شده است
+def legacy_get_supply_demand_data(datas):
+    try:
+        datas = datas.split('@')[3].split(';')
+    except:
+        return
+    if len(datas) < 100 : return 
+    rows = []
+    for data in datas:
+        sub_data = data.split(',')
+        if len(sub_data) == 8 :
+            rows.append(sub_data)
+    if len(rows) < 100 : return 
+    df = pd.DataFrame(rows)
+    df.columns =['id', 'row', 2, 3, 4, 5, 6, 7]
+    df.set_index(df['id'], inplace= True)
+    df.drop(columns=['id'], inplace= True)
+    groups = df.groupby('row')
+    df1 = groups.get_group('1')
+    df1.columns=['row', 'zo1', 'zd1', 'pd1', 'po1', 'qd1', 'qo1']
+    df2 = groups.get_group('2')
+    df2.columns=['row', 'zo2', 'zd2', 'pd2', 'po2', 'qd2', 'qo2']
+    df3 = groups.get_group('3')
+    df3.columns=['row', 'zo3', 'zd3', 'pd3', 'po3', 'qd3', 'qo3']
+    df4 = groups.get_group('4')
+    df4.columns=['row', 'zo4', 'zd4', 'pd4', 'po4', 'qd4', 'qo4']
+    df5 = groups.get_group('5')
+    df5.columns=['row', 'zo5', 'zd5', 'pd5', 'po5', 'qd5', 'qo5']
+    df = pd.concat([df1, df2, df3, df4, df5], axis=1)
+    df.drop(columns= ['row'], inplace= True)
+    df = df.apply (pd.to_numeric, errors='coerce')
+    df['d1_value'] = df['pd1'] * df['qd1']
+    df['o1_value'] = df['po1'] * df['qo1']
+    df['d1_per_capita'] = (df['d1_value'] / df['zd1']) / 10000000
+    df['o1_per_capita'] = (df['o1_value'] / df['zo1']) / 10000000
+    return df
+
+def legacy_parse_price(datas):
+    rows_df = legacy_get_supply_demand_data(datas)
+    if rows_df is None: return
+    datas = datas.split(';')
+    if len(datas) < 100 : return 
+    data23 = []
+    data25 = []
+    for data in datas:
+        sub_data = data.split(',')
+        if len(sub_data) == 23 : 
+            data23.append(sub_data)
+        elif len(sub_data) == 25 : 
+            data25.append(sub_data)
+    if len(data23) < 100 and len(data25) < 100: return
+    if len(data23) > 100 :
+        df = pd.DataFrame(data23)
+        df.columns = ['id', 'code', 'symbol', 'name', 'nc', 'pf', 'pc', 'pl', 'tno', 'tvol', 'tval',
+        'pmin', 'pmax', 'py', 'eps', 'bvol', 'nc', 'nc', 'nc', 'tmax', 'tmin', 'z', 'nc']
+    else:
+        df = pd.DataFrame(data25)
+        df.columns = ['id', 'code', 'symbol', 'name', 'nc', 'pf', 'pc', 'pl', 'tno', 'tvol', 'tval',
+        'pmin', 'pmax', 'py', 'eps', 'bvol', 'nc', 'nc', 'nc', 'tmax', 'tmin', 'z', 'nc', 'nc', 'nc']
+    df = df[~df['symbol'].str.contains(r'\d')]
+    df.set_index(df['id'], inplace= True)
+    df.drop(columns=['id', 'nc'], inplace= True)
+    df = pd.concat([df, rows_df], axis= 1)
+    cols = df.columns[3:]
+    df[cols] = df[cols].apply (pd.to_numeric, errors='coerce')
+    df['pcp'] = (100 * (df['pc'] - df['py']) / df['py']).round(2)
+    df['plp'] = (100 * (df['pl'] - df['py']) / df['py']).round(2)
+    df['pfp'] = (100 * (df['pf'] - df['py']) / df['py']).round(2)
+    df['pminp'] = (100 * (df['pmin'] - df['py']) / df['py']).round(2)
+    df['pmaxp'] = (100 * (df['pmax'] - df['py']) / df['py']).round(2)
+    df['tminp'] = (100 * (df['tmin'] - df['py']) / df['py']).round(2)
+    df['tmaxp'] = (100 * (df['tmax'] - df['py']) / df['py']).round(2)
+    return df
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], encoding= 'utf-8') as f:
+        payload = f.read()
+else:
+    payload = make_payload()
+
+runs = 20
+start = perf_counter()
+for i in range(runs):
+    legacy = legacy_parse_price(payload)
+legacy_time = (perf_counter() - start) / runs
+
+start = perf_counter()
+for i in range(runs):
+    df = parse_price(payload)
+new_time = (perf_counter() - start) / runs
+
+print(f'legacy parser: {1000 * legacy_time:.1f}ms')
+print(f'single pass parser: {1000 * new_time:.1f}ms ({legacy_time / new_time:.1f}x)')
+print(f'symbols: {len(df)} (legacy: {len(legacy)})')
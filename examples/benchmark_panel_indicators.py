@@ -0,0 +1,43 @@
+from pytse_filter.calculate_indicators import calculate_indicators
+from pytse_filter.panel_indicators import calculate_panel_indicators, build_panel
+from pytse_filter.incremental_indicators import IndicatorEngine
+from pytse_filter import inds_setting
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+# مقایسه ی سرعت محاسبه ی اندیکاتورها به صورت تک نماد و به صورت یکجا برای همه ی نمادها
+number_of_symbols = 670
+length = inds_setting.find_count(inds_setting.indicators)
+rng = np.random.default_rng(0)
+frames = {}
+for i in range(number_of_symbols):
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    frames[f'symbol{i}'] = pd.DataFrame({
+        'open': close, 'low': close * 0.97, 'high': close * 1.03, 'close': close,
+        'volume': rng.integers(100_000, 1_000_000, length).astype('float64')
+    }, index= pd.date_range('2020-01-01', periods= length, name= 'date'))
+
+start = perf_counter()
+per_symbol = {symbol: calculate_indicators(df.copy()) for symbol, df in frames.items()}
+per_symbol_time = perf_counter() - start
+
+start = perf_counter()
+panel = calculate_panel_indicators(frames)
+panel_time = perf_counter() - start
+
+# زمان محاسبه ی یکجای اندیکاتورها روی ماتریس تاریخ ها و نمادها، بدون اندیکاتورهای محاسبه شده برای هر نماد
+engine = IndicatorEngine(size= number_of_symbols)
+columns = sorted({column for state in engine.states for column in state.inputs})
+start = perf_counter()
+engine.seed(build_panel(frames, columns))
+seed_time = perf_counter() - start
+
+same = all(
+    np.allclose(per_symbol[s].to_numpy(dtype= 'float64'), panel[s][per_symbol[s].columns].to_numpy(dtype= 'float64'), equal_nan= True)
+    for s in frames
+)
+print(f'per symbol: {per_symbol_time:.2f}s')
+print(f'panel: {panel_time:.2f}s ({per_symbol_time / panel_time:.1f}x)')
+print(f'vectorized pass of {len(engine.columns)} columns: {seed_time:.2f}s')
+print(f'same results: {same}')
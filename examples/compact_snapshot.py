@@ -0,0 +1,16 @@
+from pytse_filter import RealTime
+from pytse_filter.download_realtime import compact_realtime, memory_usage
+
+# مقایسه ی حافظه ی مصرفی یک دریافت لحظه ای با نوع داده های معمول و فشرده
+market = RealTime()
+df = market.get_all_stocks_data()
+compact_df = compact_realtime(df)
+before = memory_usage(df)
+after = memory_usage(compact_df)
+print(f'float64/object: {before / 1024:.0f} KB')
+print(f'compact: {after / 1024:.0f} KB ({100 * (1 - after / before):.0f}% less)')
+print(compact_df.dtypes.value_counts())
+
+# برای نگهداری داده ها به صورت فشرده در هر دریافت
+market = RealTime(compact= True)
+print(market.filter_by_text_condition('pl == tmax and qd1 > 0'))
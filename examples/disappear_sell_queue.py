@@ -1,23 +1,9 @@
-from pytse_filter import RealTime
-from time import time
-import sys
+from pytse_filter import RealTimePoller
 
-market = RealTime()
-sell_queue_symbols = market.filter_by_text_condition('pl == tmin')
-if len(sell_queue_symbols) == 0:
-    print('There are no sell queues')
-    sys .exit()
+def sell_queue_damaged(event):
+    for sym in event.data['symbol']:
+        print(f'Damage sell queue in {sym}')
 
-sell_queue_symbols = sell_queue_symbols['symbol'].tolist()
-print(sell_queue_symbols)
-while True:
-    if int(time()) % 10 != 0:
-        continue
-    reload_sell_queue_symbols = market.filter_by_text_condition('pl == tmin')
-    if reload_sell_queue_symbols is None: 
-        continue
-    reload_sell_queue_symbols = reload_sell_queue_symbols['symbol'].tolist()
-    for sym in sell_queue_symbols:
-        if not sym in reload_sell_queue_symbols:
-            print(f'Damage sell queue in {sym}')
-    sell_queue_symbols = reload_sell_queue_symbols
\ No newline at end of file
+poller = RealTimePoller(interval= 10, conditions= {'sell_queue': 'pl == tmin'})
+poller.on('exit', sell_queue_damaged)
+poller.run()
@@ -0,0 +1,14 @@
+from pytse_filter.history_archive import write_archive, HistoryArchive
+import pandas as pd
+
+# نوشتن سابقه ی چند نماد در یک فایل و خواندن بخشی از سابقه ی یک نماد بدون خواندن بقیه
+dates = pd.date_range('2024-01-01', periods= 5, name= 'date')
+histories = {
+    # حجم نماد اول عدد صحیح و حجم نماد دوم اعشاری است و در فایل به صورت اعشاری ذخیره می شود
+    'symbol1': pd.DataFrame({'close': [100.0, 101, 102, 103, 104], 'volume': [1000, 1200, 900, 1100, 1300]}, index= dates),
+    'symbol2': pd.DataFrame({'close': [50.0, 49, 51, 52, 50], 'volume': [500.5, 600, None, 700, 800]}, index= dates),
+}
+write_archive('histories.arrow', histories)
+with HistoryArchive('histories.arrow') as archive:
+    print(archive.read('symbol1', start= '2024-01-02', end= '2024-01-04'))
+    print(archive.panel('volume'))
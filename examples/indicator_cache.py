@@ -0,0 +1,17 @@
+from pytse_filter import History, inds_setting
+
+# نگهداری سابقه ها و اندیکاتورها روی دیسک تا در اجرای بعدی هم استفاده شوند
+history = History(use_cache= True, cache_on_disk= True)
+history.download_summery()
+
+# اجرای دوباره در ۵ دقیقه ی بعد بدون دریافت دوباره ی داده ها و بدون محاسبه ی دوباره ی اندیکاتورها انجام می شود
+history.download_summery()
+
+# با تغییر تنظیمات یک اندیکاتور فقط همان اندیکاتور دوباره محاسبه می شود
+inds_setting.indicators['rsi'][0]['args']['length'] = 10
+df = history.download_summery()
+print(df[['rsi', 'macd']])
+
+# برای دریافت آخرین داده ها پیش از پایان ۵ دقیقه، داده ها دوباره دریافت می شوند
+# و اندیکاتورها فقط در صورت تغییر سابقه دوباره محاسبه می شوند
+df = history.download_summery(refresh= True)
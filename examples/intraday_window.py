@@ -0,0 +1,20 @@
+from time import sleep
+from pytse_filter import RealTime
+
+# نگهداری ۶۰ دریافت آخر بازار در یک بافر حلقه ای
+market = RealTime(buffer_size= 60, buffer_fields= ['pl', 'tval', 'buy_i_value', 'power', 'qd1', 'qo1'])
+
+for _ in range(10):
+    market.download()
+    sleep(10)
+
+symbols = market.datas['symbol']
+# ورود پول حقیقی در ۶۰ ثانیه آخر
+in_money = market.buffer.delta('buy_i_value', seconds= 60)
+# تغییر صف خرید نسبت به ۳ دریافت قبل به درصد
+queue_change = market.buffer.rate_of_change('qd1', polls= 3)
+# میانگین قدرت خریدار در ۵ دریافت آخر
+mean_power = market.buffer.mean('power', polls= 5)
+
+df = symbols.to_frame().join(in_money.rename('in_money')).join(queue_change.rename('queue_change')).join(mean_power.rename('mean_power'))
+print(df.loc[(df['in_money'] > 10_000_000_000) & (df['mean_power'] > 1.5)].sort_values('in_money', ascending= False))
@@ -0,0 +1,79 @@
+from pytse_filter.market_watch import MarketWatchSession
+from pytse_filter.download_realtime import parse_price
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from time import perf_counter
+import threading
+import numpy as np
+
+# یک سرور محلی که پاسخ های MarketWatchPlus را بازپخش می کند و مقایسه ی به روزرسانی افزایشی با دریافت کامل تابلو
+# پاسخ کامل تابلو با r=0 و تغییرات بعد از هر refid با r=refid برگردانده می شود
+rng = np.random.default_rng(0)
+number_of_symbols = 700
+number_of_updates = 20
+changes_per_update = 30
+
+ids = [str(10**15 + i) for i in range(number_of_symbols)]
+prices = {i: [int(x) for x in rng.integers(1000, 50000, 8)] + [int(rng.integers(1000, 50000))] for i in ids}
+books = {i: {depth: [int(x) for x in rng.integers(1, 1000, 6)] for depth in range(1, 6)} for i in ids}
+
+def price_row(i, heven):
+    pf, pc, pl, tno, tvol, tval, pmin, pmax, py = prices[i]
+    n = int(i) - 10**15
+    return ','.join(str(x) for x in [i, f'IRO1X{n:05d}0001', f'symbol{chr(97 + n % 26)}{chr(97 + n // 26 % 26)}', f'name {n}', heven,
+        pf, pc, pl, tno, tvol, tval, pmin, pmax, py, 100, 1000, 0, 0, 0, py + 500, py - 500, 1000000, 300])
+
+def full_payload(heven, refid):
+    price = ';'.join(price_row(i, heven) for i in ids)
+    book = ';'.join(','.join(str(x) for x in [i, depth] + books[i][depth]) for i in ids for depth in range(1, 6))
+    return f'0,0,0@index@{price}@{book}@{refid}'
+
+payloads = {}
+heven = 90000
+payloads[0] = full_payload(heven, 1)
+for refid in range(1, number_of_updates + 1):
+    heven += 5
+    changed = rng.choice(ids, changes_per_update, replace= False)
+    price, book = [], []
+    for i in changed:
+        prices[i][:8] = [int(x) for x in rng.integers(1000, 50000, 8)]
+        price.append(','.join(str(x) for x in [i, heven] + prices[i][:8]))
+        depth = int(rng.integers(1, 6))
+        books[i][depth] = [int(x) for x in rng.integers(1, 1000, 6)]
+        book.append(','.join(str(x) for x in [i, depth] + books[i][depth]))
+    payloads[refid] = f'0,0,0@index@{";".join(price)}@{";".join(book)}@{refid + 1}'
+final_payload = full_payload(heven, number_of_updates + 1)
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        refid = int(parse_qs(urlparse(self.path).query).get('r', ['0'])[0])
+        body = payloads.get(refid, f'0,0,0@index@@@{refid}').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), ReplayHandler)
+threading.Thread(target= server.serve_forever, daemon= True).start()
+session = MarketWatchSession(url= f'http://127.0.0.1:{server.server_port}/MarketWatchPlus.aspx')
+
+start = perf_counter()
+session.update()
+print(f'full load: {session.payload_size} bytes, {1000 * (perf_counter() - start):.1f}ms')
+sizes, times = [], []
+for i in range(number_of_updates):
+    start = perf_counter()
+    df = session.update()
+    times.append(perf_counter() - start)
+    sizes.append(session.payload_size)
+print(f'incremental update: {np.mean(sizes):.0f} bytes, {1000 * np.mean(times):.1f}ms, {len(session.changed)} changed rows')
+server.shutdown()
+
+start = perf_counter()
+expected = parse_price(final_payload)
+print(f'parse of the whole board: {1000 * (perf_counter() - start):.1f}ms')
+same = np.allclose(df[expected.columns[3:]].to_numpy(dtype= 'float64'), expected[expected.columns[3:]].to_numpy(dtype= 'float64'), equal_nan= True)
+print(f'same snapshot as the whole board: {same and df.index.equals(expected.index)}')
@@ -0,0 +1,9 @@
+from pytse_filter import History
+
+# در ویندوز پردازش های موازی فقط داخل این شرط اجرا می شوند
+if __name__ == '__main__':
+    history = History()
+    # ابتدا سابقه ی همه ی نمادها دریافت می شود و سپس اندیکاتورها روی همه ی هسته های پردازنده محاسبه می شوند
+    df = history.download_summery(processes= 0)
+    print(df)
+    print(history.failed_symbols)
@@ -0,0 +1,14 @@
+from pytse_filter import RealTimePoller
+
+# ورود بیش از یک میلیارد تومان پول حقیقی در ۵ دقیقه آخر و میانگین قدرت خریدار بالای ۲ در ۱۰ دریافت آخر
+hot_money = 'delta(buy_i_value, 5m) > 1e10 and avg(power, 10 polls) > 2'
+# افزایش بیش از ۲۰ درصدی صف خرید نسبت به دریافت قبلی
+growing_queue = 'pl == tmax and roc(qd1, 1 poll) > 20'
+
+def on_enter(event):
+    # می توان نمادها را به شبکه های اجتماعی ارسال کرد
+    print(event.name, event.data['symbol'].tolist())
+
+poller = RealTimePoller(interval= 10, conditions= {'hot_money': hot_money, 'growing_queue': growing_queue})
+poller.on('enter', on_enter)
+poller.run()
@@ -26,10 +26,11 @@ setup(
         "Intended Audience :: Financial and Insurance Industry",
         "Topic :: Office/Business :: Financial :: Investment",
     ],
-    python_requires = ">=3.6",
+    python_requires = ">=3.9",
     packages=find_packages(where="src"),
     package_dir={"": "src"},
     install_requires=install_requires,
+    extras_require={"async": ["aiohttp"]},
     package_data = {
         "pytse_filter": ["docs/*", "examples/*","syms.json"]
     },
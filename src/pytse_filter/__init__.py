@@ -1,5 +1,8 @@
 # This module serves as the initialization for the pytse_filter package.
-# It imports and exposes the main classes from the history and realtime modules.
+# It imports and exposes the main classes from the history, realtime, poller and async modules.
 
 from .history import History, HistoryCondition
-from .realtime import RealTime, RealTimeCondition
\ No newline at end of file
+from .realtime import RealTime, RealTimeCondition
+from .poller import RealTimePoller, PollEvent
+from .async_realtime import AsyncRealTime
+from .async_history import AsyncHistory
\ No newline at end of file
@@ -0,0 +1,122 @@
+# This module owns the asynchronous HTTP transport of the pytse_filter project.
+# It is the asyncio counterpart of http_client: one aiohttp session keeps the
+# connections to tsetmc.com alive, the number of simultaneous requests per host
+# is bounded and failed requests are retried with jittered exponential backoff.
+# aiohttp is an optional dependency, it is imported when the first session is created.
+
+import asyncio
+import json
+import random
+from urllib.parse import urlparse
+from . import config
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+async def gather(*coroutines, return_exceptions= False):
+    """
+    Runs coroutines at the same time like asyncio.gather. As a coroutine it can be passed to asyncio.wait_for,
+    which then cancels the coroutines cleanly when the deadline passes or the caller is cancelled.
+    """
+
+    return await asyncio.gather(*coroutines, return_exceptions= return_exceptions)
+
+
+class AsyncResponse:
+    """
+    The status, headers and body of a response read by AsyncClient.
+    """
+
+    def __init__(self, status, headers, content):
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors= 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncClient:
+    """
+    A shared aiohttp session for the asynchronous classes of pytse_filter.
+    It can be used as an async context manager, the session is closed on exit.
+    """
+
+    def __init__(self, max_connections_per_host= None, retries= None):
+        """
+        Parameters:
+            max_connections_per_host (int): Maximum number of simultaneous requests sent to one host, config.MAX_CONNECTIONS_PER_HOST if None.
+            retries (int): Number of retries for a failed request, config.DOWNLOAD_RETRIES if None.
+        """
+
+        self.max_connections_per_host = max_connections_per_host or config.MAX_CONNECTIONS_PER_HOST
+        self.retries = config.DOWNLOAD_RETRIES if retries is None else retries
+        self._session = None
+        self._semaphores = {}
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError("The async API of pytse_filter needs aiohttp, install it with 'pip install pytse_filter[async]'.")
+            headers = dict(config.HEADERS)
+            headers['Accept-Encoding'] = 'gzip, deflate'
+            connector = aiohttp.TCPConnector(limit_per_host= self.max_connections_per_host)
+            self._session = aiohttp.ClientSession(headers= headers, connector= connector)
+        return self._session
+
+    def _semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._semaphores[host]
+
+    async def get(self, url, endpoint, params= None, headers= None):
+        """
+        Sends a GET request.
+
+        Parameters:
+            url (str): The requested url.
+            endpoint (str): Name of the endpoint in config.TIMEOUTS, used to select the timeout of each try.
+            params (dict): The query parameters.
+            headers (dict): Additional headers of the request.
+
+        Returns:
+            AsyncResponse: The response of the request.
+
+        Raises:
+            aiohttp.ClientResponseError: If the response has an error status, after all retries for the statuses of RETRY_STATUSES.
+            aiohttp.ClientConnectionError: If the connection fails after all retries.
+            asyncio.TimeoutError: If the last try timed out.
+        """
+
+        session = self._get_session()
+        import aiohttp
+        timeout = aiohttp.ClientTimeout(total= config.TIMEOUTS[endpoint])
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore(url):
+                    async with session.get(url, params= params, headers= headers, timeout= timeout) as response:
+                        if response.status not in RETRY_STATUSES or attempt == self.retries:
+                            response.raise_for_status()
+                            return AsyncResponse(response.status, response.headers, await response.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            delay = config.RETRY_BACKOFF * 2 ** attempt + random.uniform(0, config.RETRY_JITTER)
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
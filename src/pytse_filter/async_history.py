@@ -0,0 +1,236 @@
+# This module contains the asyncio counterpart of the History class of the pytse_filter project.
+# Histories are downloaded with AsyncClient and the number of symbols downloaded at the same
+# time is bounded by a semaphore, so a history refresh of every symbol can share an event loop
+# with the realtime poller. The parquet I/O of the store and the indicator calculations are
+# blocking, they run in the default executor of the loop.
+
+import asyncio
+import functools
+from tqdm import tqdm
+from . import config
+from . import http_client
+from . import inds_setting
+from .async_client import AsyncClient, gather
+from .download_history import (
+    parse_adjusted_price_history, parse_price_history, parse_client_history, decode_client_history,
+    read_store, join_histories, check_history
+)
+from .history import History
+from .syms_manager import symbols_dict, symbol_to_inscode
+
+
+class AsyncHistory(History):
+    """
+    This class is the asynchronous version of History. download_summery and download_history are coroutines,
+    the filtering methods are inherited from History. Downloads can be cancelled like any other task.
+    """
+
+    def __init__(self, condition= None, base_path= 'history\\', use_store= False, client= None, use_cache= False, cache_on_disk= False):
+        """
+        Parameters:
+            condition (HistoryCondition): An object representing the filter condition.
+            base_path (str): The base directory path where files will be saved.
+            use_store (bool): Keep the histories in a local store under base_path and download only new records, off by default.
+            client (AsyncClient): The client used to send the requests, a new AsyncClient if None.
+            use_cache (bool): Keep the combined histories with their indicators in memory, off by default, see History.
+            cache_on_disk (bool): Also keep the cached histories in the 'cache' subdirectory of base_path.
+        """
+
+        super().__init__(condition= condition, base_path= base_path, use_store= use_store, use_cache= use_cache, cache_on_disk= cache_on_disk)
+        self.client = AsyncClient() if client is None else client
+
+    async def _get_price_history(self, inscode, adjusted_price, length):
+        if length == 0:
+            return
+        try:
+            if adjusted_price:
+                response = await self.client.get(config.ADJUSTED_PRICE_HISTORY.format(inscode), 'adjusted_price_history')
+                return parse_adjusted_price_history(response.text, length)
+            response = await self.client.get(config.PRICE_HISTORY.format(inscode, 9999 if length == -1 else length), 'price_history')
+            return parse_price_history(response.text)
+        except ImportError:
+            raise
+        except Exception:
+            return
+
+    async def _get_client_history(self, inscode, length):
+        if length == 0:
+            return
+        try:
+            response = await self.client.get(config.CLIENT_HISTORY.format(inscode), 'client_history')
+            return parse_client_history(decode_client_history(response.text, length), length)
+        except ImportError:
+            raise
+        except Exception:
+            return
+
+    async def _get_histories(self, inscode, adjusted_price, length, client_length):
+        """
+        Downloads the price and client histories at the same time, waiting at most http_client.deadline('history', ...) seconds.
+        """
+
+        try:
+            return await asyncio.wait_for(gather(
+                self._get_price_history(inscode, adjusted_price, length),
+                self._get_client_history(inscode, client_length)
+            ), http_client.deadline('history', [
+                'adjusted_price_history' if adjusted_price else 'price_history', 'client_history'
+            ]))
+        except asyncio.TimeoutError:
+            return None, None
+
+    @staticmethod
+    async def _run(function, *args, **kwargs):
+        """
+        Calls a blocking function, such as the parquet I/O of the store or an indicator calculation,
+        in the default executor of the event loop, so the other downloads keep running meanwhile.
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    async def _update_store(self, inscode, adjusted_price):
+        """
+        Downloads the missing records of the histories of a symbol and appends them to the store,
+        the whole adjusted price history is downloaded again if it has been readjusted.
+        """
+
+        length, client_length = await self._run(self.store.missing_lengths, inscode, adjusted_price)
+        price_df, client_df = await self._get_histories(inscode, adjusted_price, length, client_length)
+        if await self._run(self.store.needs_full_history, inscode, adjusted_price, length, price_df):
+            price_df = await self._get_price_history(inscode, adjusted_price, -1)
+        await self._run(self.store.update, inscode, adjusted_price= adjusted_price, histories= (price_df, client_df))
+
+    async def _fetch_histories(self, inscode, adjusted_price, length, calc_inds):
+        """
+        Returns the price and client histories of a symbol, read from the updated store if there is one,
+        with the indicators of the store if calc_inds is True.
+        """
+
+        if self.store is not None:
+            await self._update_store(inscode, adjusted_price)
+            price_df, client_df, _ = await self._run(read_store, self.store, inscode, adjusted_price, length, calc_inds)
+            return price_df, client_df
+        return await self._get_histories(inscode, adjusted_price, length, length)
+
+    async def combine_history(self, symbol= None, inscode= None, adjusted_price= True, length= 200, calc_inds= True, calc_client= True, refresh= False):
+        """
+        The asynchronous version of download_history.combine_history, using the store and the cache of the object.
+
+        Returns:
+            DataFrame: A DataFrame containing the combined history.
+        """
+
+        if inscode is None:
+            if symbol is None: return
+            inscode = symbol_to_inscode(symbol)
+            if inscode is None: return
+        if self.cache is not None:
+            entry = None if refresh else await self._run(self.cache.fresh, inscode, adjusted_price, length)
+            if entry is None:
+                price_df, client_df = await self._fetch_histories(inscode, adjusted_price, length, calc_inds)
+                entry = await self._run(self.cache.update, inscode, adjusted_price, length, price_df, client_df)
+            if entry is None:
+                return
+            return await self._run(self.cache.combine, inscode, adjusted_price, length, entry, calc_inds, calc_client)
+        if self.store is not None:
+            await self._update_store(inscode, adjusted_price)
+            price_df, client_df, calc_inds = await self._run(read_store, self.store, inscode, adjusted_price, length, calc_inds)
+        else:
+            price_df, client_df = await self._get_histories(inscode, adjusted_price, length, length)
+        return await self._run(join_histories, price_df, client_df, calc_inds, calc_client)
+
+    async def download_histories(self, symbols, adjusted_price= True, length= 200, workers= None, progress= None, calc_inds= True, refresh= False):
+        """
+        Downloads the combined history of many symbols, at most workers symbols at the same time.
+
+        Parameters:
+            symbols (list): The stock symbols.
+            adjusted_price (bool): select adjusted price or not
+            length (int): Number of records to retrieve.
+            workers (int): Number of symbols downloaded at the same time, config.DOWNLOAD_WORKERS if None.
+            progress (callable): Called with no arguments after each symbol is finished.
+            calc_inds (bool): Whether to calculate indicators.
+            refresh (bool): Download the histories even if they are in the cache.
+
+        Returns:
+            tuple: A dictionary of symbol to DataFrame for successful downloads and
+            a dictionary of symbol to error message for failed ones.
+        """
+
+        semaphore = asyncio.Semaphore(workers or config.DOWNLOAD_WORKERS)
+        results = {}
+        failures = {}
+
+        async def download(symbol):
+            async with semaphore:
+                try:
+                    inscode = symbol_to_inscode(symbol)
+                    if inscode is None:
+                        raise LookupError('symbol was not found in syms.json')
+                    df = await self.combine_history(inscode= inscode, adjusted_price= adjusted_price, length= length, calc_inds= calc_inds, refresh= refresh)
+                    results[symbol] = check_history(df)
+                except ImportError:
+                    raise
+                except Exception as e:
+                    failures[symbol] = str(e) or type(e).__name__
+            if progress is not None:
+                progress()
+
+        await asyncio.gather(*[download(symbol) for symbol in symbols])
+        return results, failures
+
+    async def download_summery(self, symbols= "all", adjusted_price= True, workers= None, vectorized= False, processes= None, refresh= False):
+        """
+        Downloads and summarizes historical data for a list of symbols or all symbols if not specified.
+        The symbols that could not be downloaded are stored in the failed_symbols attribute with the reason of failure.
+
+        Parameters:
+            symbols (list/str): A list of symbols to summarize or "all" to summarize all symbols.
+            adjusted_price (bool): download adjusted price or not
+            workers (int): Number of symbols downloaded at the same time, config.DOWNLOAD_WORKERS if None.
+            vectorized (bool): Calculate the indicators of all symbols together with the panel engine.
+            processes (int): If given, the indicators are calculated after all downloads in this number of processes,
+                0 for config.COMPUTE_PROCESSES or the number of cores. Ignored if vectorized is True.
+            refresh (bool): Download the histories even if they are in the cache.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing the summarized historical data.
+        """
+
+        if symbols == "all":
+            symbols = list(symbols_dict().keys())
+        length = inds_setting.find_count(inds_setting.indicators)
+        with tqdm(total= len(symbols)) as progress_bar:
+            results, self.failed_symbols = await self.download_histories(
+                symbols, adjusted_price= adjusted_price, length= length, workers= workers,
+                progress= progress_bar.update, calc_inds= not vectorized and processes is None, refresh= refresh
+            )
+        return await self._run(self._summerize, symbols, results, vectorized, processes)
+
+    async def download_history(self, symbol, adjusted_price= True, length= -1, calc_inds= True, calc_client= True, save_excel_file= True, refresh= False):
+        """
+        Downloads and saves historical data for a specific symbol to an Excel file.
+
+        Parameters:
+            symbol (str): The stock symbol to download historical data for.
+            adjusted_price (bool): download adjusted price or not
+            length (int): The number of days of historical data to download.
+            calc_inds (bool): Whether to calculate indicators for the data.
+            calc_client (bool): Whether to calculate client data for the data.
+            save_excel_file (bool): save result to an excel file or not
+            refresh (bool): Download the history even if it is in the cache.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing the historical data.
+        """
+
+        df = await self.combine_history(symbol= symbol, adjusted_price= adjusted_price, length= length, calc_inds= calc_inds, calc_client= calc_client, refresh= refresh)
+        return await self._run(self._save_history, df, symbol, save_excel_file)
+
+    async def close(self):
+        """
+        Closes the connections of the client.
+        """
+
+        await self.client.close()
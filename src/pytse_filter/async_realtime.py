@@ -0,0 +1,170 @@
+# This module contains the asyncio counterpart of the RealTime class of the pytse_filter project.
+# The price and client data are downloaded with AsyncClient, so the realtime data can be polled
+# from an event loop that also runs other tasks, without threads.
+
+import asyncio
+import pandas as pd
+from . import config
+from . import http_client
+from .async_client import AsyncClient, gather
+from .download_realtime import _PayloadCache, _parse_price_payload, _snapshot, parse_client
+from .realtime import RealTime, RealTimeCondition
+
+
+class AsyncRealTime(RealTime):
+    """
+    This class is the asynchronous version of RealTime. The methods that may download data are coroutines,
+    the other methods are inherited from RealTime. A download can be cancelled like any other task and
+    takes at most http_client.deadline('realtime', ...) seconds.
+    """
+
+    def __init__(self, condition= None, client= None, compact= False, buffer_size= None, buffer_fields= None):
+        """
+        Parameters:
+            condition (RealTimeCondition): The condition object for filtering the stock data.
+            client (AsyncClient): The client used to send the requests, a new AsyncClient if None.
+            compact (bool): Whether to store the data with the compact dtypes of config.REALTIME_COMPACT_DTYPES.
+            buffer_size (int): The number of last snapshots kept in the buffer attribute, no buffer if None.
+            buffer_fields (list): The columns kept in the buffer, all numeric columns if None.
+        """
+
+        super().__init__(condition, compact= compact, buffer_size= buffer_size, buffer_fields= buffer_fields)
+        self.client = AsyncClient() if client is None else client
+        self._caches = {'price': _PayloadCache(), 'client': _PayloadCache(), 'realtime': _PayloadCache()}
+
+    async def _get(self, name, url, parser):
+        """
+        Downloads a payload and parses it if it changed since the previous download.
+        """
+
+        cache = self._caches[name]
+        response = await self.client.get(url, name, headers= cache.validators)
+        content = cache.accept(None if response.status == 304 else response.content, response.headers)
+        if content is not None:
+            cache.result = parser(cache, content.decode('utf-8', errors= 'replace'))
+        return cache.result
+
+    async def download(self, deadline= None):
+        """
+        This method downloads the price and client data at the same time and stores them in the datas attribute as a pandas data frame.
+
+        Parameters:
+            deadline (float): The maximum time in seconds to wait for both downloads, http_client.deadline('realtime', ...) if None.
+
+        Returns:
+            None: The data frame is stored in the datas attribute, None if the download failed.
+        """
+
+        deadline = http_client.deadline('realtime', ['price', 'client']) if deadline is None else deadline
+        try:
+            results = await asyncio.wait_for(gather(
+                self._get('price', config.PRICE_URL, _parse_price_payload),
+                self._get('client', config.CLIENT_URL, lambda cache, datas: parse_client(datas)),
+                return_exceptions= True
+            ), deadline)
+        except asyncio.TimeoutError:
+            results = [None, None]
+        for result in results:
+            if isinstance(result, ImportError):
+                raise result
+        price_df, client_df = [None if isinstance(result, Exception) else result for result in results]
+        fetched_at = {'price': self._caches['price'].fetched_at, 'client': self._caches['client'].fetched_at}
+        self._set_datas(_snapshot(self._caches['realtime'], price_df, client_df, fetched_at))
+
+    async def get_all_stocks_data(self, update_data= True):
+        """
+        The asynchronous version of RealTime.get_all_stocks_data.
+
+        Parameters:
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            datas (pd.DataFrame): The data frame of all the stocks.
+        """
+
+        if update_data:
+            await self.download()
+        return self.datas
+
+    async def get_stocks_data_as_list(self, update_data= True):
+        """
+        The asynchronous version of RealTime.get_stocks_data_as_list.
+
+        Parameters:
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            list_of_dicts (list): The list of dictionaries containing all the stocks data.
+        """
+
+        df = await self.get_all_stocks_data(update_data= update_data)
+        return df.to_dict('records')
+
+    async def filter_by_obj_condition(self, update_data= True):
+        """
+        The asynchronous version of RealTime.filter_by_obj_condition.
+
+        Parameters:
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            filtered_symbols (pd.DataFrame): The data frame of the filtered stocks.
+        """
+
+        if update_data:
+            await self.download()
+        return super().filter_by_obj_condition(update_data= False)
+
+    async def filter_by_text_condition(self, text_condition):
+        """
+        The asynchronous version of RealTime.filter_by_text_condition.
+
+        Parameters:
+            text_condition (str): The raw text of the condition in custom syntax.
+
+        Returns:
+            pd.DataFrame: The filtered DataFrame of stock data.
+        """
+
+        self.condition = RealTimeCondition(rau_text= text_condition)
+        return await self.filter_by_obj_condition()
+
+    async def membership(self, conditions, update_data= True):
+        """
+        The asynchronous version of RealTime.membership.
+
+        Parameters:
+            conditions (dict): Names to RealTimeCondition objects or raw texts of conditions.
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            membership (pd.DataFrame): A boolean data frame with one row per stock and one column per condition.
+        """
+
+        if update_data:
+            await self.download()
+        return super().membership(conditions, update_data= False)
+
+    async def filter_by_conditions(self, conditions, update_data= True):
+        """
+        The asynchronous version of RealTime.filter_by_conditions.
+
+        Parameters:
+            conditions (dict): Names to RealTimeCondition objects or raw texts of conditions.
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            filtered (dict): Names of the conditions to the data frames of the filtered stocks.
+        """
+
+        membership = await self.membership(conditions, update_data= update_data)
+        if self.datas is None:
+            return {name: pd.DataFrame() for name in conditions}
+        return {name: self.datas.loc[membership[name].to_numpy()] for name in conditions}
+
+    async def close(self):
+        """
+        Closes the connections of the client.
+        """
+
+        await self.client.close()
@@ -1,8 +1,44 @@
 # This module contains the function to calculate client-specific financial data
 # for the pytse_filter project. It uses settings from the client_setting module
 # to perform rolling calculations on the provided DataFrame.
+# The settings are compiled once into a plan of rolling calculations.
 
+import numpy as np
+import pandas as pd
+from pandas.core.window.rolling import Rolling
 from . import client_setting
+from .incremental_indicators import settings_hash
+
+_plans = {}
+
+def compile_plan(calculations= None):
+    """
+    Compiles client calculation settings into a plan. Plans are cached by the hash of the settings.
+
+    Parameters:
+        calculations (dict): The calculation settings, client_setting.calculations if None.
+
+    Returns:
+        tuple: The output columns and a list of the source column, period and method name of each calculation.
+
+    Raises:
+        ValueError: If a method is not a rolling method of pandas.
+    """
+
+    calculations = client_setting.calculations if calculations is None else calculations
+    key = settings_hash(calculations)
+    if key not in _plans:
+        columns = []
+        steps = []
+        for calc_name, calc_sets in calculations.items():
+            for calc_set in calc_sets:
+                method = calc_set['args']['method']
+                if method.startswith('_') or not callable(getattr(Rolling, method, None)):
+                    raise ValueError(f'The method {method} is not a rolling method.')
+                steps.append((calc_name, calc_set['args']['period'], method))
+                columns.append(calc_set['columns'][0])
+        _plans[key] = (columns, steps)
+    return _plans[key]
 
 def calculate_client_data(df):
     """
@@ -18,10 +54,11 @@ def calculate_client_data(df):
     """
 
     df['buy_per_capita'] = (df['buy_i_value'] / df['buy_i_count']) / 10000000
-    df['sell_per_capita'] = (df['sell_i_value'] / df['sell_i_count']) / 10000000    
+    df['sell_per_capita'] = (df['sell_i_value'] / df['sell_i_count']) / 10000000
     df['power'] = df['buy_per_capita'] / df['sell_per_capita']
     df['money_flow'] = (df['buy_i_value'] - df['sell_i_value']) / 10000000
-    for calc_name, calc_sets in client_setting.calculations.items():
-        for calc_set in calc_sets:
-            df[calc_set['columns'][0]] = eval(f"df['{calc_name}'].rolling({calc_set['args']['period']}).{calc_set['args']['method']}()")
-    return df
\ No newline at end of file
+    columns, steps = compile_plan()
+    block = np.empty((len(df), len(columns)))
+    for i, (source, period, method) in enumerate(steps):
+        block[:, i] = getattr(df[source].rolling(period), method)().to_numpy(dtype= 'float64')
+    return pd.concat([df, pd.DataFrame(block, index= df.index, columns= columns)], axis= 1)
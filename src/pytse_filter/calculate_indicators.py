@@ -1,10 +1,146 @@
 # This module contains the function to calculate various technical analysis indicators
 # for the pytse_filter project. It uses settings from the inds_setting module
 # to apply technical analysis functions on the provided DataFrame.
+# The settings are compiled once into a plan of bound functions with resolved column
+# inputs, and the outputs of all indicators are written into one preallocated block.
 
+import ast
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from . import inds_setting
+from .incremental_indicators import settings_hash
+
+_plans = {}
+
+def resolve_argument(value):
+    """
+    Resolves an argument value of a setting.
+
+    Parameters:
+        value: The argument value, for example "df['close']", 14 or "'ema'".
+
+    Returns:
+        tuple: The column name and None if the value refers to a column of the DataFrame, otherwise None and the value.
+
+    Raises:
+        ValueError: If the value is a string that is neither a column reference nor a literal.
+    """
+
+    column = inds_setting.source_column(value)
+    if column is not None:
+        return column, None
+    if isinstance(value, str):
+        try:
+            return None, ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise ValueError(f"unsupported argument in settings: {value!r}, use a column such as \"df['close']\" or a literal value")
+    return None, value
+
+def _bind(function, args):
+    """
+    Binds the literal arguments of a setting to a function, the column arguments are read from the DataFrame of each call.
+    """
+
+    columns = {}
+    constants = {}
+    for name, value in args.items():
+        column, constant = resolve_argument(value)
+        if column is None:
+            constants[name] = constant
+        else:
+            columns[name] = column
+    return lambda df: function(**{name: df[column] for name, column in columns.items()}, **constants)
+
+def _write(block, result, index):
+    """
+    Writes a Series or DataFrame result into the block, aligned with the rows of the history.
+    """
+
+    block[:] = result.reindex(index).to_numpy(dtype= 'float64').reshape(len(index), -1)
+
+def _ta_step(function):
+    def step(df, block):
+        result = function(df)
+        if isinstance(result, (pd.DataFrame, pd.Series)):
+            _write(block, result, df.index)
+    return step
+
+def _ichimoku_step(function, ind_set):
+    count = len(ind_set['columns'][0])
+    kijun = ind_set['args']['kijun']
+    def step(df, block):
+        result = function(df)
+        if result is not None and result[0] is not None:
+            _write(block[:, :count], result[0], df.index)
+            future = result[1].to_numpy(dtype= 'float64')[-kijun:]
+            block[len(df) - len(future):, count:] = future
+    return step
+
+def _extreme_step(ind_name, ind_set):
+    source, _ = resolve_argument(ind_set['args']['source'])
+    period = ind_set['args']['period']
+    def step(df, block):
+        extreme = getattr(df[source].rolling(period), ind_name)().to_numpy(dtype= 'float64')
+        block[:, 0] = extreme
+        block[:, 1] = 100 * np.abs(df['close'].to_numpy(dtype= 'float64') - extreme) / extreme
+    return step
+
+def compile_plan(indicators= None):
+    """
+    Compiles indicator settings into a plan. Plans are cached by the hash of the settings.
+
+    Parameters:
+        indicators (dict): The indicator settings, inds_setting.indicators if None.
+
+    Returns:
+        tuple: The output columns and a list of steps. Each step is a function of the history
+        and of its slice of the output block, paired with the position of the slice.
+
+    Raises:
+        ValueError: If an indicator is not a pandas_ta function or an argument is not supported.
+    """
+
+    indicators = inds_setting.indicators if indicators is None else indicators
+    key = settings_hash(indicators)
+    if key in _plans:
+        return _plans[key]
+    # pandas_ta is slow to import, it is only loaded when indicators are calculated.
+    import pandas_ta as ta
+    columns = []
+    steps = []
+    for ind_name, ind_sets in indicators.items():
+        for ind_set in ind_sets:
+            if ind_name in ['min', 'max']:
+                step = _extreme_step(ind_name, ind_set)
+            else:
+                function = getattr(ta, ind_name, None)
+                if not callable(function):
+                    raise ValueError(f'The indicator {ind_name} is not a pandas_ta function.')
+                function = _bind(function, ind_set['args'])
+                step = _ichimoku_step(function, ind_set) if ind_name == 'ichimoku' else _ta_step(function)
+            output = inds_setting.output_columns(ind_name, ind_set)
+            steps.append((step, slice(len(columns), len(columns) + len(output))))
+            columns.extend(output)
+    _plans[key] = (columns, steps)
+    return _plans[key]
+
+def indicator_columns(df, indicators= None):
+    """
+    Calculates the indicators of a price history without joining them to it.
+
+    Parameters:
+        df (DataFrame): The DataFrame containing the stock market data.
+        indicators (dict): The indicator settings, inds_setting.indicators if None.
+
+    Returns:
+        DataFrame: The indicator columns, indexed like df.
+    """
+
+    columns, steps = compile_plan(indicators)
+    block = np.full((len(df), len(columns)), np.nan)
+    for step, position in steps:
+        step(df, block[:, position])
+    return pd.DataFrame(block, index= df.index, columns= columns)
 
 def calculate_indicators(df):
     """
@@ -18,31 +154,4 @@ def calculate_indicators(df):
         DataFrame: The DataFrame with additional columns for each indicator calculated.
     """
 
-    for ind_name, ind_sets  in inds_setting.indicators.items():
-        if ind_name not in ['min', 'max']:
-            for i, ind_set in enumerate(ind_sets):
-                args = ', '.join([f'{k}= {v}' for k, v in ind_set['args'].items()])
-                temp_df = eval(f"ta.{ind_name}({args})")
-                if isinstance(temp_df, pd.DataFrame):
-                    temp_df.columns = ind_set['columns']
-                    df =pd.concat([df, temp_df], axis= 1)
-                elif isinstance(temp_df, pd.Series):
-                    df[ind_set['columns'][0]] = temp_df
-                elif ind_name == "ichimoku":
-                    ichi = temp_df[0]
-                    future_ichi = temp_df[1]
-                    if ichi is not None:
-                        ichi.columns = ind_set['columns'][0]
-                        future_ichi.columns = ind_set['columns'][1]                
-                        future_ichi.set_index(ichi.index[-inds_setting.indicators[ind_name][i]['args']['kijun']:], inplace= True)
-                    else:
-                        ichi = pd.DataFrame(columns= ind_set['columns'][0])
-                        future_ichi = pd.DataFrame(columns= ind_set['columns'][1]                )
-                    df =pd.concat([df, ichi, future_ichi], axis= 1)
-        else:
-            for i, ind_set in enumerate(ind_sets):
-                df[ind_set['columns'][0]] = eval(f"{ind_set['args']['source']}.rolling({ind_set['args']['period']}).{ind_name}()")
-                df["dis_from" + ind_set['columns'][0]] =  100 * (
-                    df['close'] - df[ind_set['columns'][0]]).abs(
-                ) / df[ind_set['columns'][0]]
-    return df
\ No newline at end of file
+    return pd.concat([df, indicator_columns(df)], axis= 1)
@@ -0,0 +1,318 @@
+# This module compiles the text conditions of the pytse_filter project.
+# A condition such as 'pl == tmax and plp > 1' is parsed once into a Python AST,
+# its names are resolved to DataFrame columns and it is compiled to a tree of
+# numpy operations that is evaluated directly on the column arrays.
+# Compiled conditions are cached by their normalized text.
+# Realtime conditions may also use windowed operators such as 'delta(buy_i_value, 5m)'
+# or 'avg(power, 10 polls)', which are evaluated on the snapshot buffer of RealTime.
+
+import ast
+import operator
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.BitAnd: np.logical_and,
+    ast.BitOr: np.logical_or,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+_FUNCTIONS = {
+    'abs': np.abs,
+}
+
+# Windowed operators to the SnapshotBuffer methods that compute them.
+_WINDOW_FUNCTIONS = {
+    'delta': 'delta',
+    'roc': 'rate_of_change',
+    'prev': 'previous',
+    'sum': 'sum',
+    'avg': 'mean',
+    'min': 'min',
+    'max': 'max',
+}
+
+_WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+# A window such as '5m' or '10 polls' given as the second argument of a windowed operator.
+_WINDOW_PATTERN = re.compile(r'(,\s*)(\d+(?:\.\d+)?)\s*(polls?|[smh])\b')
+
+def _replace_window(match):
+    value, unit = match.group(2), match.group(3)
+    if unit.startswith('poll'):
+        return f'{match.group(1)}polls({value})'
+    return f'{match.group(1)}seconds({float(value) * _WINDOW_UNITS[unit]:g})'
+
+
+class _Env:
+    """
+    The values available while evaluating a compiled condition on a DataFrame.
+    Results of sub-expressions are kept in memo, so a sub-expression shared by
+    several conditions evaluated with the same environment is computed once.
+    """
+
+    def __init__(self, df, buffer= None):
+        self.df = df
+        self.buffer = buffer
+        self.memo = {}
+
+    def column(self, name):
+        key = ('column', name)
+        if key not in self.memo:
+            column = self.df[name]
+            if pd.api.types.is_numeric_dtype(column.dtype):
+                self.memo[key] = column.to_numpy(dtype= 'float64', na_value= np.nan)
+            else:
+                self.memo[key] = column.to_numpy()
+        return self.memo[key]
+
+    def window(self, method, name, polls, seconds):
+        """
+        Returns a windowed value of a column computed by the snapshot buffer, aligned with the rows of df.
+        The value is NaN for all rows while the buffer has fewer snapshots than the window needs.
+        """
+
+        key = ('window', method, name, polls, seconds)
+        if key not in self.memo:
+            if self.buffer is None:
+                raise ValueError('windowed operators need a snapshot buffer, create RealTime with buffer_size')
+            if name not in self.buffer.field_positions:
+                raise KeyError(f"'{name}' is not kept in the snapshot buffer")
+            try:
+                if method == 'previous':
+                    values = self.buffer.previous(name, polls= polls)
+                else:
+                    values = getattr(self.buffer, method)(name, polls= polls, seconds= seconds)
+                self.memo[key] = values.reindex(self.df.index).to_numpy()
+            except ValueError:
+                self.memo[key] = np.full(len(self.df), np.nan)
+        return self.memo[key]
+
+
+class CompiledCondition:
+    """
+    A compiled condition that returns a boolean numpy mask for a DataFrame.
+    """
+
+    def __init__(self, text, function, columns, windowed= False):
+        """
+        Parameters:
+            text (str): The normalized text of the condition.
+            function (callable): The compiled expression, called with an _Env.
+            columns (frozenset): The columns referenced by the condition.
+            windowed (bool): Whether the condition uses windowed operators.
+        """
+
+        self.text = text
+        self.function = function
+        self.columns = columns
+        self.windowed = windowed
+
+    def evaluate(self, df, env= None, buffer= None):
+        """
+        Evaluates the condition on a DataFrame.
+
+        Parameters:
+            df (DataFrame): The data to evaluate.
+            env (_Env): An environment shared between several conditions, created if None.
+            buffer (SnapshotBuffer): The snapshots used by the windowed operators.
+
+        Returns:
+            numpy.ndarray: A boolean mask with one value per row of df.
+        """
+
+        env = _Env(df, buffer) if env is None else env
+        with np.errstate(divide= 'ignore', invalid= 'ignore'):
+            mask = self.function(env)
+        return np.broadcast_to(np.asarray(mask, dtype= bool), (len(df),))
+
+    def __call__(self, df):
+        return self.evaluate(df)
+
+    def __str__(self):
+        return self.text
+
+
+def _memoized(node, function):
+    """
+    Wraps a compiled node so its result is kept in the memo of the environment.
+    """
+
+    key = ast.dump(node)
+    def memoized(env):
+        if key not in env.memo:
+            env.memo[key] = function(env)
+        return env.memo[key]
+    return memoized
+
+def _window_argument(node):
+    """
+    Returns the polls and seconds of the window argument of a windowed operator.
+    """
+
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ('polls', 'seconds')
+            and len(node.args) == 1 and isinstance(node.args[0], ast.Constant) and not node.keywords):
+        value = node.args[0].value
+        if node.func.id == 'polls':
+            return int(value), None
+        return None, float(value)
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return node.value, None
+    raise SyntaxError(f"invalid window in condition: '{ast.unparse(node)}', use a window such as '5m', '30s' or '10 polls'")
+
+def _compile_window(node, columns, used):
+    """
+    Compiles a windowed operator such as 'delta(buy_i_value, seconds(300))'.
+    """
+
+    if len(node.args) != 2 or node.keywords or not isinstance(node.args[0], ast.Name):
+        raise SyntaxError(f"invalid windowed operator in condition: '{ast.unparse(node)}', use for example 'delta(buy_i_value, 5m)'")
+    name = node.args[0].id
+    if name not in columns:
+        raise NameError(f"name '{name}' is not a valid column")
+    method = _WINDOW_FUNCTIONS[node.func.id]
+    polls, seconds = _window_argument(node.args[1])
+    if method == 'previous' and polls is None:
+        raise SyntaxError(f"prev needs a window in polls: '{ast.unparse(node)}'")
+    used.add(name)
+    return lambda env: env.window(method, name, polls, seconds)
+
+def _compile_node(node, columns, used, windows= False):
+    """
+    Compiles an AST node to a function of an _Env.
+    """
+
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body, columns, used, windows)
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise NameError(f"name '{node.id}' is not a valid column")
+        used.add(node.id)
+        name = node.id
+        return lambda env: env.column(name)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.BoolOp):
+        values = [_compile_node(value, columns, used, windows) for value in node.values]
+        function = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        def bool_op(env):
+            result = values[0](env)
+            for value in values[1:]:
+                result = function(result, value(env))
+            return result
+        return _memoized(node, bool_op)
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand, columns, used, windows)
+        if isinstance(node.op, ast.Not):
+            return _memoized(node, lambda env: np.logical_not(operand(env)))
+        if isinstance(node.op, ast.USub):
+            return _memoized(node, lambda env: -operand(env))
+        if isinstance(node.op, ast.UAdd):
+            return operand
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        left = _compile_node(node.left, columns, used, windows)
+        right = _compile_node(node.right, columns, used, windows)
+        function = _BIN_OPS[type(node.op)]
+        return _memoized(node, lambda env: function(left(env), right(env)))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPS for op in node.ops):
+        operands = [_compile_node(operand, columns, used, windows) for operand in [node.left] + node.comparators]
+        functions = [_COMPARE_OPS[type(op)] for op in node.ops]
+        def compare(env):
+            values = [operand(env) for operand in operands]
+            result = functions[0](values[0], values[1])
+            for i in range(1, len(functions)):
+                result = np.logical_and(result, functions[i](values[i], values[i + 1]))
+            return result
+        return _memoized(node, compare)
+    if (windows and isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _WINDOW_FUNCTIONS):
+        return _compile_window(node, columns, used)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCTIONS and len(node.args) == 1 and not node.keywords):
+        argument = _compile_node(node.args[0], columns, used, windows)
+        function = _FUNCTIONS[node.func.id]
+        return _memoized(node, lambda env: function(argument(env)))
+    raise SyntaxError(f"unsupported expression in condition: '{ast.unparse(node)}'")
+
+def normalize(text, windows= False):
+    """
+    Returns the normalized text of a condition.
+
+    Parameters:
+        text (str): The raw text of the condition.
+        windows (bool): Whether windows such as '5m' or '10 polls' are written as 'seconds(300)' and 'polls(10)'.
+
+    Returns:
+        str: The condition in lower case with normalized spacing.
+    """
+
+    text = text.lower().strip()
+    if windows:
+        text = _WINDOW_PATTERN.sub(_replace_window, text)
+    return ast.unparse(ast.parse(text, mode= 'eval'))
+
+@lru_cache(maxsize= 512)
+def _compile(text, columns, windows):
+    tree = ast.parse(text, mode= 'eval')
+    used = set()
+    function = _compile_node(tree, columns, used, windows)
+    windowed = windows and any(
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _WINDOW_FUNCTIONS
+        for node in ast.walk(tree)
+    )
+    return CompiledCondition(text, function, frozenset(used), windowed= windowed)
+
+def compile_condition(text, columns, windows= False):
+    """
+    Compiles the text of a condition. Compiled conditions are cached by their normalized text.
+
+    Parameters:
+        text (str): The raw text of the condition in custom syntax.
+        columns (iterable): The names of the columns that the condition may use.
+        windows (bool): Whether the condition may use the windowed operators delta, roc, prev, sum, avg, min and max.
+
+    Returns:
+        CompiledCondition: The compiled condition.
+
+    Raises:
+        SyntaxError: If the text is not a valid condition.
+        NameError: If the condition uses an unknown column.
+    """
+
+    return _compile(normalize(text, windows), frozenset(columns), windows)
+
+def evaluate_conditions(df, conditions, buffer= None):
+    """
+    Evaluates many compiled conditions on a DataFrame in one pass. Column arrays and
+    sub-expressions shared by the conditions (for example 'pl == tmax') are computed once.
+
+    Parameters:
+        df (DataFrame): The data to evaluate.
+        conditions (dict): Name to CompiledCondition.
+        buffer (SnapshotBuffer): The snapshots used by the windowed operators.
+
+    Returns:
+        DataFrame: A boolean membership matrix with one row per row of df and one column per condition.
+    """
+
+    env = _Env(df, buffer)
+    masks = {name: condition.evaluate(df, env) for name, condition in conditions.items()}
+    return pd.DataFrame(masks, index= df.index, columns= list(conditions))
@@ -13,14 +13,30 @@ CLIENT_HISTORY (str): URL template to fetch historical client type data.
 REALTIME_COLUMNS (list): List of column names for real-time data.
 REALTIME_CHECK_DF (DataFrame): Dummy DataFrame for checking real-time data columns.
 REALTIME_CONVERT_DICT (dict): Dictionary for converting real-time data columns.
+REALTIME_COMPACT_DTYPES (dict): Compact dtypes of the real-time data columns, used by compact_realtime.
 HISTORY_COLUMNS (list): List of column names for historical data.
+history_columns (function): Function that returns all columns of the summary, derived from the settings.
 HISTORY_CHECK_DF (function): Function to generate a dummy DataFrame for historical data.
-HISTORY_CONVERT_DICT (dict): Dictionary for converting historical data columns.
+HISTORY_CONVERT_DICT (dict): Dictionary for converting historical data columns, built on first access.
+DOWNLOAD_WORKERS (int): Number of threads used to download histories of many symbols.
+CONCURRENT_WORKERS (int): Number of threads of the pool of http_client.run_concurrently, at least twice DOWNLOAD_WORKERS.
+COMPUTE_PROCESSES (int): Number of processes used to calculate the indicators of a summary, the number of cores if None.
+INDICATOR_CACHE_SIZE (int): Number of combined histories kept in the memory of an IndicatorCache.
+INDICATOR_CACHE_TTL (float): Time in seconds a cached history is used without downloading it again.
+MAX_CONNECTIONS_PER_HOST (int): Maximum number of simultaneous requests sent to one host.
+DOWNLOAD_RETRIES (int): Number of retries for a failed request.
+RETRY_BACKOFF (float): Base delay in seconds between retries, doubled on each retry.
+RETRY_JITTER (float): Maximum random delay in seconds added to each retry delay.
+POOL_CONNECTIONS (int): Number of hosts that keep a connection pool in the shared session.
+TIMEOUTS (dict): Timeout in seconds of the requests of each endpoint.
+DEADLINES (dict): Time in seconds to wait for all the concurrent requests of a realtime snapshot or of a history,
+    raised to the longest time of the requests with their retries, see http_client.deadline.
 """
 
+from functools import lru_cache
 import pandas as pd
-from .calculate_indicators import calculate_indicators
-from .calculate_client_data import calculate_client_data
+from . import inds_setting
+from . import client_setting
 
 HEADERS  = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'}
 PRICE_URL = "http://old.tsetmc.com/tsev2/data/MarketWatchPlus.aspx"
@@ -30,6 +46,29 @@ ADJUSTED_PRICE_HISTORY = "https://members.tsetmc.com/tsev2/chart/data/Financial.
 CLIENT_HISTORY ="http://cdn.tsetmc.com/api/ClientType/GetClientTypeHistory/{}"
 SYMBOLS = "http://old.tsetmc.com/Loader.aspx?ParTree=151114"
 
+DOWNLOAD_WORKERS = 8
+CONCURRENT_WORKERS = None
+COMPUTE_PROCESSES = None
+INDICATOR_CACHE_SIZE = 1000
+INDICATOR_CACHE_TTL = 300
+MAX_CONNECTIONS_PER_HOST = 4
+DOWNLOAD_RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_JITTER = 0.3
+POOL_CONNECTIONS = 4
+TIMEOUTS = {
+    'price': 3,
+    'client': 3,
+    'price_history': 3,
+    'adjusted_price_history': 3,
+    'client_history': 5,
+    'symbols': 10,
+}
+DEADLINES = {
+    'realtime': 5,
+    'history': 15,
+}
+
 REALTIME_COLUMNS = [
     'code', 'symbol', 'name', 'pf', 'pmin', 'pmax', 'pl', 'pc', 'py', 'tno', 'tvol', 'tval',
     'eps', 'bvol', 'tmax', 'tmin', 
@@ -49,6 +88,26 @@ REALTIME_COLUMNS = [
 
 REALTIME_CHECK_DF = pd.DataFrame({col: [1] for col in REALTIME_COLUMNS})
 
+# Compact dtypes of the realtime columns: nullable integers for prices, counts and volumes, float32 for
+# values (about 7 significant digits), percentages and ratios and arrow strings for text.
+# Quantities of the order book and volumes can exceed 2^31 and are Int64, compact_realtime also
+# stores an Int32 column as Int64 when one of its values does not fit.
+REALTIME_COMPACT_DTYPES = {
+    **{col: 'string[pyarrow]' for col in ['code', 'symbol', 'name']},
+    **{col: 'Int32' for col in [
+        'pf', 'pmin', 'pmax', 'pl', 'pc', 'py', 'tmax', 'tmin', 'eps', 'tno',
+        'buy_i_count', 'buy_n_count', 'sell_i_count', 'sell_n_count'
+    ] + [f'{field}{depth}' for depth in range(1, 6) for field in ['zo', 'zd', 'pd', 'po']]},
+    **{col: 'Int64' for col in [
+        'tvol', 'bvol', 'z', 'buy_i_volume', 'buy_n_volume', 'sell_i_volume', 'sell_n_volume', 'volume'
+    ] + [f'{field}{depth}' for depth in range(1, 6) for field in ['qd', 'qo']]},
+    **{col: 'float32' for col in [
+        'tval', 'buy_i_value', 'sell_i_value', 'buy_n_value', 'sell_n_value', 'money_flow', 'd1_value', 'o1_value',
+        'plp', 'pcp', 'pfp', 'pminp', 'pmaxp', 'tminp', 'tmaxp', 'buy_per_capita', 'sell_per_capita', 'power',
+        'ind_buy_ratio', 'ind_sell_ratio', 'cor_buy_ratio', 'cor_sell_ratio', 'd1_per_capita', 'o1_per_capita'
+    ]},
+}
+
 REALTIME_CONVERT_DICT = {col: f'df["{col}"]' for col in REALTIME_COLUMNS}
 
 HISTORY_COLUMNS = [
@@ -59,21 +118,49 @@ HISTORY_COLUMNS = [
     "sell_i_value", "sell_n_value", "sell_n_count", "sell_i_count"
 ]
 
+CLIENT_DATA_COLUMNS = ['buy_per_capita', 'sell_per_capita', 'power', 'money_flow']
+
+@lru_cache(maxsize= None)
+def history_columns():
+    """
+    Returns the columns of the summary DataFrame of historical data. The columns are
+    derived from the settings of the inds_setting and client_setting modules, and
+    each column is repeated with the 'y_' prefix for the data of the previous day.
+
+    Returns:
+        tuple: The column names.
+    """
+
+    columns = list(HISTORY_COLUMNS)
+    for ind_name, ind_sets in inds_setting.indicators.items():
+        for ind_set in ind_sets:
+            columns.extend(inds_setting.output_columns(ind_name, ind_set))
+    columns.extend(CLIENT_DATA_COLUMNS)
+    for calc_sets in client_setting.calculations.values():
+        for calc_set in calc_sets:
+            columns.append(calc_set['columns'][0])
+    columns = list(dict.fromkeys(columns))
+    return tuple(columns + ['y_' + col for col in columns])
+
+@lru_cache(maxsize= None)
 def HISTORY_CHECK_DF():
     """
-    Generates a DataFrame with dummy values for historical data and applies indicator
-    and client data calculations. Adds 'y_' prefix to each column name to indicate
-    historical data.
+    Generates a one row DataFrame with dummy values for every column of the summary
+    of historical data.
 
     Returns:
-        DataFrame: A DataFrame with calculated indicators and client data, including prefixed column names.
+        DataFrame: A DataFrame with a column for each name of history_columns.
     """
 
-    df = pd.DataFrame([{col: 1 for col in HISTORY_COLUMNS} for i in range(100)])
-    df = calculate_indicators(df)
-    df = calculate_client_data(df)
-    for col in df.columns:
-        df['y_' + col] = df[col]
-    return df
+    return pd.DataFrame({col: [1] for col in history_columns()})
+
+def __getattr__(name):
+    """
+    Builds HISTORY_CONVERT_DICT when it is accessed for the first time.
+    """
 
-HISTORY_CONVERT_DICT = {col: f'df["{col}"]' for col in HISTORY_CHECK_DF().columns}
+    if name == 'HISTORY_CONVERT_DICT':
+        value = {col: f'df["{col}"]' for col in history_columns()}
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,16 +1,20 @@
 # This module contains functions to download and process historical stock data.
 
-import requests
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from .syms_manager import symbols_dict, symbol_to_inscode
 from . import config
+from . import http_client
 from .calculate_client_data import calculate_client_data
 from .calculate_indicators import calculate_indicators
-import jdatetime
+from .jalali import jalali_dates
 import warnings
 warnings.filterwarnings('ignore' , category= FutureWarning)
 
+_SEPARATORS = re.compile(r'[\s,]*')
+
 def get_adjusted_price_history(symbol= None, inscode=None, length= 200):
     """
     Retrieves adjusted price history for a given stock symbol or inscode.
@@ -29,9 +33,25 @@ def get_adjusted_price_history(symbol= None, inscode=None, length= 200):
         inscode =         symbol_to_inscode(symbol)
         if inscode is None : return
     try:
-        datas = requests.get(config.ADJUSTED_PRICE_HISTORY.format(inscode), headers= config.HEADERS, timeout= 3).text.split(';')
+        datas = http_client.get(config.ADJUSTED_PRICE_HISTORY.format(inscode), 'adjusted_price_history').text
     except:
         return
+    return parse_adjusted_price_history(datas, length)
+
+def parse_adjusted_price_history(datas, length= 200):
+    """
+    Parses the payload of the adjusted price history. The records are in ascending order of date,
+    so only the last length records are split from the tail of the payload.
+
+    Parameters:
+        datas (str): The payload, records separated by ';' and fields by ','.
+        length (int): Number of last records to keep, -1 for all records.
+
+    Returns:
+        DataFrame: A DataFrame containing the price history.
+    """
+
+    datas = datas.rsplit(';', length)[-length:] if length > 0 else datas.split(';')
     rows = []
     for data in datas:
         rows.append(data.split(','))
@@ -39,15 +59,7 @@ def get_adjusted_price_history(symbol= None, inscode=None, length= 200):
     columns = ['date',  'high', 'low', 'open', 'close', 'volume', 'adj_close']
     df = pd.DataFrame(rows, columns= columns)
     df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
-    def jdate(x):
-        """
-        Convert Gregorian date to jalali date
-        """
-
-        jalali_date = jdatetime.date.fromgregorian(date= x['date'])
-        return jalali_date.strftime('%Y-%m-%d')
-
-    df['jdate'] = df.apply(func= jdate, axis= 1)
+    df['jdate'] = jalali_dates(df['date'])
     columns = ['date', 'jdate', 'open', 'low', 'high', 'close', 'adj_close', 'volume']
     df = df[columns]
     df.set_index(df['date'], inplace= True)
@@ -77,9 +89,23 @@ def get_price_history(symbol= None, inscode=None, length= 200):
     if length == -1 :
         length = 9999
     try:
-        datas = requests.get(config.PRICE_HISTORY.format(inscode, length), headers= config.HEADERS, timeout= 3).text.split(';')
+        datas = http_client.get(config.PRICE_HISTORY.format(inscode, length), 'price_history').text
     except:
         return
+    return parse_price_history(datas)
+
+def parse_price_history(datas):
+    """
+    Parses the payload of the price history.
+
+    Parameters:
+        datas (str): The payload, records separated by ';' and fields by '@'.
+
+    Returns:
+        DataFrame: A DataFrame containing the price history.
+    """
+
+    datas = datas.split(';')
     rows = []
     for data in datas[:-1]:
         if len(data.split('@')) != 10 : break
@@ -88,15 +114,7 @@ def get_price_history(symbol= None, inscode=None, length= 200):
     columns = ['date', 'high', 'low', 'adj_close', 'close', 'open', 'yesterday_adj_close', 'value', 'volume', 'count']
     df = pd.DataFrame(rows, columns= columns)
     df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
-    def jdate(x):
-        """
-        Convert Gregorian date to jalali date
-        """
-
-        jalali_date = jdatetime.date.fromgregorian(date= x['date'])
-        return jalali_date.strftime('%Y-%m-%d')
-
-    df['jdate'] = df.apply(func= jdate, axis= 1)
+    df['jdate'] = jalali_dates(df['date'])
     columns = ['date', 'jdate', 'open', 'low', 'high', 'close', 'adj_close', 'volume', 'value', 'count', 'yesterday_adj_close']
     df = df[columns]
     df.set_index(df['date'], inplace= True)
@@ -124,8 +142,52 @@ def get_client_history(symbol= None, inscode=None, length= 200):
         if inscode is None : return
     url = config.CLIENT_HISTORY.format(inscode)
     try:
-        datas = requests.get(url, headers= config.HEADERS, timeout= 5)
-        df = pd.DataFrame(datas.json()['clientType'])
+        datas = decode_client_history(http_client.get(url, 'client_history').text, length)
+    except :
+        return
+    return parse_client_history(datas, length)
+
+def decode_client_history(text, length= 200):
+    """
+    Decodes the json payload of the client history. The records are in descending order of date,
+    so only the first length records are decoded and the rest of the payload is skipped.
+
+    Parameters:
+        text (str): The json payload.
+        length (int): Number of last records to decode, all records if None or negative.
+
+    Returns:
+        dict: The decoded payload with the 'clientType' records.
+    """
+
+    key = text.find('"clientType"')
+    if length is None or length < 0 or key < 0:
+        return json.loads(text)
+    decoder = json.JSONDecoder()
+    index = text.index('[', key) + 1
+    records = []
+    while len(records) < length:
+        index = _SEPARATORS.match(text, index).end()
+        if index >= len(text) or text[index] == ']':
+            break
+        record, index = decoder.raw_decode(text, index)
+        records.append(record)
+    return {'clientType': records}
+
+def parse_client_history(datas, length= 200):
+    """
+    Parses the decoded json payload of the client history.
+
+    Parameters:
+        datas (dict): The decoded payload.
+        length (int): Number of last records to keep.
+
+    Returns:
+        DataFrame: A DataFrame containing the client history.
+    """
+
+    try:
+        df = pd.DataFrame(datas['clientType'])
     except :
         return
     if len(df) == 0 : return    
@@ -139,7 +201,7 @@ def get_client_history(symbol= None, inscode=None, length= 200):
     df = df.astype('float64')
     return df
 
-def combine_history(symbol= None, inscode=None, adjusted_price= True, length= 200, calc_inds= True, calc_client= True):
+def combine_history(symbol= None, inscode=None, adjusted_price= True, length= 200, calc_inds= True, calc_client= True, store= None, cache= None, refresh= False):
     """
     Combines price and client history into a single DataFrame.
 
@@ -150,19 +212,83 @@ def combine_history(symbol= None, inscode=None, adjusted_price= True, length= 20
         length (int): Number of records to retrieve.
         calc_inds (bool): Whether to calculate indicators.
         calc_client (bool): Whether to calculate client data.
+        store (HistoryStore): If given, the store is updated with the new records
+            and the histories are read from it instead of being downloaded completely.
+            Indicators are then updated incrementally by the store.
+        cache (IndicatorCache): If given, a history cached less than cache.ttl seconds ago is not downloaded again
+            and only the indicators whose settings are not cached are calculated.
+        refresh (bool): Download the histories even if the cache has a recent entry, the cached indicators are
+            still used if the downloaded histories did not change.
+
+    The price and client histories are downloaded at the same time and both must arrive before http_client.deadline('history', ...).
 
     Returns:
         DataFrame: A DataFrame containing the combined history.
     """
 
-    if adjusted_price:
-        price_df = get_adjusted_price_history(symbol= symbol, inscode=inscode, length= length)
+    if inscode is None:
+        if symbol is None: return
+        inscode = symbol_to_inscode(symbol)
+        if inscode is None: return
+    if cache is not None:
+        entry = None if refresh else cache.fresh(inscode, adjusted_price, length)
+        if entry is None:
+            price_df, client_df = fetch_histories(inscode, adjusted_price, length, store, calc_inds)
+            entry = cache.update(inscode, adjusted_price, length, price_df, client_df)
+        if entry is None:
+            return
+        return cache.combine(inscode, adjusted_price, length, entry, calc_inds, calc_client)
+    if store is not None:
+        store.update(inscode, adjusted_price= adjusted_price)
+        price_df, client_df, calc_inds = read_store(store, inscode, adjusted_price, length, calc_inds)
     else:
-        price_df = get_price_history(symbol= symbol, inscode=inscode, length= length)
-    if price_df is None :
-        return
-    client_df = get_client_history(symbol= symbol, inscode=inscode, length= length)
-    if client_df is None:
+        price_df, client_df = fetch_histories(inscode, adjusted_price, length)
+    return join_histories(price_df, client_df, calc_inds, calc_client)
+
+def fetch_histories(inscode, adjusted_price, length, store= None, calc_inds= False):
+    """
+    Returns the price and client histories of a symbol, read from an updated store if given, with
+    the indicators of the store if calc_inds is True. Otherwise they are downloaded without indicators
+    at the same time and both must arrive before http_client.deadline('history', ...).
+    """
+
+    if store is not None:
+        store.update(inscode, adjusted_price= adjusted_price)
+        price_df, client_df, _ = read_store(store, inscode, adjusted_price, length, calc_inds)
+        return price_df, client_df
+    get_history = get_adjusted_price_history if adjusted_price else get_price_history
+    return http_client.run_concurrently([
+        lambda: get_history(inscode= inscode, length= length),
+        lambda: get_client_history(inscode= inscode, length= length)
+    ], http_client.deadline('history', ['adjusted_price_history' if adjusted_price else 'price_history', 'client_history']))
+
+def read_store(store, inscode, adjusted_price, length, calc_inds):
+    """
+    Reads the price and client histories of a symbol from an updated store.
+    The indicators are read from the store when calc_inds is True.
+
+    Returns:
+        tuple: The price history, the client history and whether the indicators still have to be calculated.
+    """
+
+    price_kind = 'adjusted_price' if adjusted_price else 'price'
+    if calc_inds:
+        price_df = store.read_with_indicators(inscode, price_kind, length= length)
+        calc_inds = False
+    else:
+        price_df = store.read(inscode, price_kind, length= length)
+    client_df = store.read(inscode, 'client', length= length)
+    return price_df, client_df, calc_inds
+
+def join_histories(price_df, client_df, calc_inds= True, calc_client= True):
+    """
+    Joins a price history and a client history, calculating indicators and client data if requested.
+
+    Returns:
+        DataFrame: A DataFrame containing the combined history, or None if a history is missing.
+    """
+
+    if price_df is None or client_df is None:
         return
     if calc_inds:
         price_df = calculate_indicators(price_df)
@@ -171,3 +297,66 @@ def combine_history(symbol= None, inscode=None, adjusted_price= True, length= 20
     df = pd.concat([price_df, client_df], axis= 1, sort= True)
     return df
 
+def _download_symbol(symbol, adjusted_price, length, store, calc_inds, cache= None, refresh= False):
+    """
+    Downloads the combined history of one symbol for download_histories.
+    Raises an exception describing the problem instead of returning None.
+    """
+
+    inscode = symbol_to_inscode(symbol)
+    if inscode is None:
+        raise LookupError('symbol was not found in syms.json')
+    df = combine_history(inscode= inscode, adjusted_price= adjusted_price, length= length, calc_inds= calc_inds, store= store, cache= cache, refresh= refresh)
+    return check_history(df)
+
+def check_history(df):
+    """
+    Checks that a combined history can be summarized.
+
+    Raises:
+        ValueError: If the history is missing or has less than two records.
+    """
+
+    if df is None:
+        raise ValueError('price or client history could not be downloaded')
+    if len(df) < 2:
+        raise ValueError('history has less than two records')
+    return df
+
+def download_histories(symbols, adjusted_price= True, length= 200, workers= None, progress= None, store= None, calc_inds= True, cache= None, refresh= False):
+    """
+    Downloads the combined history of many symbols concurrently with a thread pool.
+
+    Parameters:
+        symbols (list): The stock symbols.
+        adjusted_price (bool): select adjusted price or not
+        length (int): Number of records to retrieve.
+        workers (int): Number of download threads, config.DOWNLOAD_WORKERS if None.
+        progress (callable): Called with no arguments after each symbol is finished.
+        store (HistoryStore): The local history store passed to combine_history.
+        calc_inds (bool): Whether to calculate indicators.
+        cache (IndicatorCache): The cache of combined histories passed to combine_history.
+        refresh (bool): Download the histories even if they are cached, see combine_history.
+
+    Returns:
+        tuple: A dictionary of symbol to DataFrame for successful downloads and
+        a dictionary of symbol to error message for failed ones.
+    """
+
+    workers = workers or config.DOWNLOAD_WORKERS
+    results = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers= workers) as executor:
+        futures = {
+            executor.submit(_download_symbol, symbol, adjusted_price, length, store, calc_inds, cache, refresh): symbol
+            for symbol in symbols
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                failures[symbol] = str(e) or type(e).__name__
+            if progress is not None:
+                progress()
+    return results, failures
@@ -1,9 +1,79 @@
 # This module is designed to fetch and process real-time stock market data. 
 # It includes functions to retrieve supply and demand data, price data, and client transaction data from specified URLs. The data is then processed into pandas DataFrames, which are combined to provide a comprehensive view of the market activity.
 
-import requests  
+import io
+import itertools
+import threading
+from time import time
+import numpy as np
 import pandas as pd
 from . import config
+from . import http_client
+
+PRICE_FIELDS = ['id', 'code', 'symbol', 'name', 'heven', 'pf', 'pc', 'pl', 'tno', 'tvol', 'tval',
+    'pmin', 'pmax', 'py', 'eps', 'bvol', 'nc', 'nc', 'nc', 'tmax', 'tmin', 'z', 'nc', 'nc', 'nc']
+PRICE_COLUMNS = ['pf', 'pc', 'pl', 'tno', 'tvol', 'tval', 'pmin', 'pmax', 'py', 'eps', 'bvol', 'tmax', 'tmin', 'z']
+ORDER_BOOK_FIELDS = ['zo', 'zd', 'pd', 'po', 'qd', 'qo']
+ORDER_BOOK_COLUMNS = [f'{field}{depth}' for depth in range(1, 6) for field in ORDER_BOOK_FIELDS]
+PERCENT_COLUMNS = ['pc', 'pl', 'pf', 'pmin', 'pmax', 'tmin', 'tmax']
+
+def _read_rows(section, fields, text_fields= (), lengths= None):
+    """
+    Parses a section of ';' separated rows of ',' separated fields in a single pass with the C parser of pandas.
+    Numeric fields are read directly as numbers, invalid values become NaN.
+    Only the rows with an accepted number of fields are parsed, like the exact field count
+    checks of the row by row parsers.
+
+    Parameters:
+        section (str): The rows of the section.
+        fields (int): The number of fields to read, shorter accepted rows get NaN in the missing fields.
+        text_fields (tuple): The positions of the fields that are kept as strings.
+        lengths (tuple): The accepted numbers of fields of a row, (fields,) if None.
+
+    Returns:
+        tuple: A dictionary of position to numpy array for each field.
+    """
+
+    lengths = (fields,) if lengths is None else lengths
+    section = ';'.join(row for row in section.split(';') if row.count(',') + 1 in lengths)
+    df = pd.read_csv(
+        io.StringIO(section), sep= ',', lineterminator= ';', header= None, names= range(fields),
+        dtype= {i: str for i in text_fields}, engine= 'c'
+    )
+    return {
+        i: df[i].to_numpy(dtype= object) if i in text_fields else pd.to_numeric(df[i], errors= 'coerce').to_numpy(dtype= 'float64')
+        for i in range(fields)
+    }
+
+def _parse_order_book(section):
+    """
+    Parses the order book section of MarketWatchPlus into a preallocated array.
+
+    Parameters:
+        section (str): The ';' separated rows of id, depth, zo, zd, pd, po, qd and qo.
+
+    Returns:
+        tuple: The unique ids and a float64 array of shape (ids, 30) in the order of ORDER_BOOK_COLUMNS.
+    """
+
+    rows = _read_rows(section, 8, text_fields= (0,))
+    depth = rows[1]
+    valid = (depth >= 1) & (depth <= 5) & pd.notna(rows[0])
+    ids, codes = np.unique(rows[0][valid].astype(str), return_inverse= True)
+    book = np.full((len(ids), 5, len(ORDER_BOOK_FIELDS)), np.nan)
+    book[codes, depth[valid].astype('int64') - 1] = np.column_stack([rows[i][valid] for i in range(2, 8)])
+    return ids, book.reshape(len(ids), len(ORDER_BOOK_COLUMNS))
+
+def _add_order_book_values(df):
+    """
+    Adds the value and per capita value of the first rows of the order book.
+    """
+
+    df['d1_value'] = df['pd1'] * df['qd1']
+    df['o1_value'] = df['po1'] * df['qo1']
+    df['d1_per_capita'] = (df['d1_value'] / df['zd1']) / 10000000
+    df['o1_per_capita'] = (df['o1_value'] / df['zo1']) / 10000000
+    return df
 
 def get_supply_demand_data(datas):
     """
@@ -17,46 +87,230 @@ def get_supply_demand_data(datas):
 """
 
     try:
-        datas = datas.split('@')[3].split(';')
+        section = datas.split('@')[3]
     except:
         return
+    ids, book = _parse_order_book(section)
+    if len(ids) < 100 : return
+    df = pd.DataFrame(book, index= pd.Index(ids, name= 'id'), columns= ORDER_BOOK_COLUMNS)
+    return _add_order_book_values(df)
+
+def _parse_price_rows(section, min_rows= 100, price_columns= PRICE_COLUMNS):
+    """
+    Parses the price section of MarketWatchPlus.
+
+    Parameters:
+        section (str): The ';' separated rows of the price section.
+        min_rows (int): The minimum number of valid rows of a valid section.
+        price_columns (list): The numeric fields of PRICE_FIELDS to keep.
+
+    Returns:
+        pd.DataFrame: The code, symbol, name and price_columns of each stock indexed by id, or None if the section is not valid.
+    """
+
+    # Rows of 23 fields lack the last two unused fields.
+    rows = _read_rows(section, len(PRICE_FIELDS), text_fields= (0, 1, 2, 3), lengths= (23, len(PRICE_FIELDS)))
+    valid = pd.notna(rows[0]) & pd.notna(rows[2])
+    if valid.sum() < min_rows : return
+    valid &= ~pd.Series(rows[2]).str.contains(r'\d', na= False).to_numpy()
+    columns = {'code': rows[1][valid], 'symbol': rows[2][valid], 'name': rows[3][valid]}
+    columns.update((column, rows[PRICE_FIELDS.index(column)][valid]) for column in price_columns)
+    return pd.DataFrame(columns, index= pd.Index(rows[0][valid].astype(str), name= 'id'))
+
+def _join_price(price_df, order_book):
+    """
+    Joins the parsed price rows with the parsed order book and adds the calculated columns.
+
+    Parameters:
+        price_df (pd.DataFrame): The result of _parse_price_rows.
+        order_book (tuple): The ids and the array returned by _parse_order_book.
+
+    Returns:
+        pd.DataFrame: The data frame returned by parse_price.
+    """
+
+    book_ids, book = order_book
+    positions = pd.Index(book_ids).get_indexer(price_df.index)
+    book = np.where((positions >= 0)[:, None], book[positions], np.nan)
+    df = pd.concat([price_df, pd.DataFrame(book, index= price_df.index, columns= ORDER_BOOK_COLUMNS)], axis= 1)
+    return _add_calculated_columns(df)
+
+def _add_calculated_columns(df):
+    """
+    Adds the order book values and the percentage change of the prices from the yesterday price.
+    df may be a data frame or a dictionary of numpy arrays.
+    """
+
+    df = _add_order_book_values(df)
+    for column in PERCENT_COLUMNS:
+        df[column + 'p'] = (100 * (df[column] - df['py']) / df['py']).round(2)
+    return df
+
+def parse_price(datas):
+    """
+    This function parses a MarketWatchPlus payload in a single pass. The price section and the order book section are split once and
+    their numeric fields are written straight into float64 arrays, the order book of each stock is placed in a preallocated array by depth.
+
+    Parameters:
+        datas (str): The MarketWatchPlus payload, sections separated by '@' and rows separated by ';'.
+
+    Returns:
+        df (pd.DataFrame): The same data frame as get_price, or None if the payload is not valid.
+    """
+
+    sections = datas.split('@')
+    if len(sections) < 4 : return
+    order_book = _parse_order_book(sections[3])
+    if len(order_book[0]) < 100 : return
+    price_df = _parse_price_rows(sections[2])
+    if price_df is None : return
+    return _join_price(price_df, order_book)
+
+def parse_client(datas):
+    """
+    This function parses a clienttypeall payload.
+
+    Parameters:
+        datas (str): The payload, rows separated by ';' and fields by ','.
+
+    Returns:
+        df (pd.DataFrame): The same data frame as get_client, or None if the payload is not valid.
+    """
+
+    datas = datas.split(';')
     if len(datas) < 100 : return 
-    rows = []
+    client = []
     for data in datas:
         sub_data = data.split(',')
-        if len(sub_data) == 8 :
-            rows.append(sub_data)
-    if len(rows) < 100 : return 
-    df = pd.DataFrame(rows)
-    df.columns =['id', 'row', 2, 3, 4, 5, 6, 7]
+        if len(sub_data) == 9 : 
+            client.append(sub_data)
+    if len(client) < 100 : return 
+    df = pd.DataFrame(client)
+    df.columns = ['id', 'buy_i_count', 'buy_n_count', 'buy_i_volume', 'buy_n_volume', 'sell_i_count', 'sell_n_count', 'sell_i_volume', 'sell_n_volume']
     df.set_index(df['id'], inplace= True)
     df.drop(columns=['id'], inplace= True)
-    groups = df.groupby('row')
-    df1 = groups.get_group('1')
-    df1.columns=['row', 'zo1', 'zd1', 'pd1', 'po1', 'qd1', 'qo1']
-    df2 = groups.get_group('2')
-    df2.columns=['row', 'zo2', 'zd2', 'pd2', 'po2', 'qd2', 'qo2']
-    df3 = groups.get_group('3')
-    df3.columns=['row', 'zo3', 'zd3', 'pd3', 'po3', 'qd3', 'qo3']
-    df4 = groups.get_group('4')
-    df4.columns=['row', 'zo4', 'zd4', 'pd4', 'po4', 'qd4', 'qo4']
-    df5 = groups.get_group('5')
-    df5.columns=['row', 'zo5', 'zd5', 'pd5', 'po5', 'qd5', 'qo5']
-    df = pd.concat([df1, df2, df3, df4, df5], axis=1)
-    df.drop(columns= ['row'], inplace= True)
     df = df.apply (pd.to_numeric, errors='coerce')
-    df['d1_value'] = df['pd1'] * df['qd1']
-    df['o1_value'] = df['po1'] * df['qo1']
-    df['d1_per_capita'] = (df['d1_value'] / df['zd1']) / 10000000
-    df['o1_per_capita'] = (df['o1_value'] / df['zo1']) / 10000000
     return df
 
+
+_versions = itertools.count(1)
+
+class _PayloadCache:
+    """
+    The last payload of an endpoint and the frames parsed from it.
+    The HTTP validators of the payload are sent with the next request and the raw
+    bytes of each section are compared with the previous ones, so only the sections
+    that changed are parsed again.
+    """
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.content = None
+        self.sections = {}
+        self.result = None
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def fetch(self, url, endpoint):
+        """
+        Downloads the payload of the endpoint.
+
+        Returns:
+            bytes: The new payload, or None if it did not change since the previous call.
+        """
+
+        response = http_client.get_if_modified(url, endpoint, etag= self.etag, last_modified= self.last_modified)
+        if response is None:
+            return self.accept(None)
+        return self.accept(response.content, response.headers)
+
+    @property
+    def validators(self):
+        """
+        dict: The conditional headers to send with the next request of the endpoint.
+        """
+
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def accept(self, content, headers= None):
+        """
+        Records a downloaded payload.
+
+        Parameters:
+            content (bytes): The payload, None if the server answered 304 Not Modified.
+            headers (dict): The headers of the response.
+
+        Returns:
+            bytes: The new payload, or None if it did not change since the previous payload.
+        """
+
+        self.fetched_at = time()
+        if content is None or content == self.content:
+            return
+        headers = headers or {}
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+        self.content = content
+        return content
+
+    def section(self, name, text, parser):
+        """
+        Returns the parsed section, parsing the text only if it differs from the previous text of the section.
+
+        Returns:
+            tuple: The parsed section and whether it changed.
+        """
+
+        if name in self.sections and self.sections[name][0] == text:
+            return self.sections[name][1], False
+        parsed = parser(text)
+        self.sections[name] = (text, parsed)
+        return parsed, True
+
+    def clear(self):
+        self.__init__()
+
+
+_caches = {'price': _PayloadCache(), 'client': _PayloadCache(), 'realtime': _PayloadCache()}
+
+def clear_cache():
+    """
+    Forgets the cached payloads, so the next call downloads and parses everything again.
+    """
+
+    for cache in _caches.values():
+        with cache.lock:
+            cache.clear()
+
+def _parse_price_payload(cache, datas):
+    """
+    Parses a MarketWatchPlus payload like parse_price, reusing the sections of the cache that did not change.
+    """
+
+    sections = datas.split('@')
+    if len(sections) < 4 : return
+    order_book, book_changed = cache.section('order_book', sections[3], _parse_order_book)
+    if len(order_book[0]) < 100 : return
+    price_df, price_changed = cache.section('price', sections[2], _parse_price_rows)
+    if price_df is None : return
+    if price_changed or book_changed or cache.result is None:
+        return _join_price(price_df, order_book)
+    return cache.result
+
 def get_price():
     """
-    This function requests the data from a web link specified in the config file, and calls the get_supply_demand_data function to process the data related to the supply and demand queues. 
-    It also separates the data related to the price data of different stocks, and returns a pandas data frame that has columns for the code, 
+    This function requests the data from a web link specified in the config file, and calls the parse_price function to process the price data and the data related to the supply and demand queues. 
+    It returns a pandas data frame that has columns for the code, 
     the symbol, the name, the final price, the closing price, the last price, the trade volume, the trade value, the minimum price, the maximum price, the yesterday price, the EPS, the base volume, the maximum threshold, and the minimum threshold of each stock. 
     It also calculates the percentage change of the closing price and the last price from the yesterday price, and adds them as columns to the data frame.
+    If the payload did not change since the previous call the previous data frame is returned without parsing, otherwise only the changed sections are parsed.
+    The returned data frame is shared between calls and must not be modified in place.
 
     Parameters:
         None
@@ -66,50 +320,23 @@ def get_price():
         the symbol, the name, the final price, the closing price, the last price, the trade volume, the trade value, the minimum price, the maximum price, the yesterday price, the EPS, the base volume, the maximum threshold, and the minimum threshold of each stock, as well as the percentage change of the closing price and the last price from the yesterday price.
     """
 
-    try:
-        datas=requests.get(config.PRICE_URL, headers= config.HEADERS, timeout= 3).text
-    except:
-        return
-    rows_df = get_supply_demand_data(datas)
-    if rows_df is None: return
-    datas = datas.split(';')
-    if len(datas) < 100 : return 
-    data23 = []
-    data25 = []
-    for data in datas:
-        sub_data = data.split(',')
-        if len(sub_data) == 23 : 
-            data23.append(sub_data)
-        elif len(sub_data) == 25 : 
-            data25.append(sub_data)
-    if len(data23) < 100 and len(data25) < 100: return
-    if len(data23) > 100 :
-        df = pd.DataFrame(data23)
-        df.columns = ['id', 'code', 'symbol', 'name', 'nc', 'pf', 'pc', 'pl', 'tno', 'tvol', 'tval',
-        'pmin', 'pmax', 'py', 'eps', 'bvol', 'nc', 'nc', 'nc', 'tmax', 'tmin', 'z', 'nc']
-    else:
-        df = pd.DataFrame(data25)
-        df.columns = ['id', 'code', 'symbol', 'name', 'nc', 'pf', 'pc', 'pl', 'tno', 'tvol', 'tval',
-        'pmin', 'pmax', 'py', 'eps', 'bvol', 'nc', 'nc', 'nc', 'tmax', 'tmin', 'z', 'nc', 'nc', 'nc']
-    df = df[~df['symbol'].str.contains(r'\d')]
-    df.set_index(df['id'], inplace= True)
-    df.drop(columns=['id', 'nc'], inplace= True)
-    df = pd.concat([df, rows_df], axis= 1)
-    cols = df.columns[3:]
-    df[cols] = df[cols].apply (pd.to_numeric, errors='coerce')
-    df['pcp'] = (100 * (df['pc'] - df['py']) / df['py']).round(2)
-    df['plp'] = (100 * (df['pl'] - df['py']) / df['py']).round(2)
-    df['pfp'] = (100 * (df['pf'] - df['py']) / df['py']).round(2)
-    df['pminp'] = (100 * (df['pmin'] - df['py']) / df['py']).round(2)
-    df['pmaxp'] = (100 * (df['pmax'] - df['py']) / df['py']).round(2)
-    df['tminp'] = (100 * (df['tmin'] - df['py']) / df['py']).round(2)
-    df['tmaxp'] = (100 * (df['tmax'] - df['py']) / df['py']).round(2)
-    return df
+    cache = _caches['price']
+    with cache.lock:
+        try:
+            content = cache.fetch(config.PRICE_URL, 'price')
+        except:
+            return
+        if content is None:
+            return cache.result
+        cache.result = _parse_price_payload(cache, content.decode('utf-8', errors= 'replace'))
+        return cache.result
 
 def get_client():
     """
     This function requests the data from another web link specified in the config file, and separates the data related to the purchase and sales information of different stocks. 
     It returns a pandas data frame that has columns for the buy individual count, the buy non-individual count, the buy individual volume, the buy non-individual volume, the sell individual count, the sell non-individual count, the sell individual volume, and the sell non-individual volume of each stock. 
+    If the payload did not change since the previous call the previous data frame is returned without parsing.
+    The returned data frame is shared between calls and must not be modified in place.
 
     Parameters:
         None
@@ -119,41 +346,138 @@ def get_client():
         as well as the buy individual value, the sell individual value, the buy non-individual value, the sell non-individual value, the buy per capita, the sell per capita, the supply demand index, the volume, the individual buy ratio, the individual sell ratio, the non-individual buy ratio, and the non-individual sell ratio.
     """ 
 
-    try:
-        datas=requests.get(config.CLIENT_URL, headers= config.HEADERS, timeout= 3).text.split(';')
-    except:
-        return
-    if len(datas) < 100 : return 
-    client = []
-    for data in datas:
-        sub_data = data.split(',')
-        if len(sub_data) == 9 : 
-            client.append(sub_data)
-    if len(client) < 100 : return 
-    df = pd.DataFrame(client)
-    df.columns = ['id', 'buy_i_count', 'buy_n_count', 'buy_i_volume', 'buy_n_volume', 'sell_i_count', 'sell_n_count', 'sell_i_volume', 'sell_n_volume']
-    df.set_index(df['id'], inplace= True)
-    df.drop(columns=['id'], inplace= True)
-    df = df.apply (pd.to_numeric, errors='coerce')
-    return df
+    cache = _caches['client']
+    with cache.lock:
+        try:
+            content = cache.fetch(config.CLIENT_URL, 'client')
+        except:
+            return
+        if content is None:
+            return cache.result
+        cache.result = parse_client(content.decode('utf-8', errors= 'replace'))
+        return cache.result
 
-def combine_realtime():
+def combine_realtime(price_session= None):
     """
     This function calls the get_price and the get_client functions, and combines their data frames by joining them on the id column. 
     It returns a pandas data frame that has all the columns from the previous data frames, and filters out the rows that have null values in the symbol column.
     It also calculates the buy individual value, the sell individual value, the buy non-individual value, the sell non-individual value, the buy per capita, the sell per capita, the supply demand index, the volume, the individual buy ratio, the individual sell ratio, the non-individual buy ratio, and the non-individual sell ratio, and adds them as columns to the data frame.
+    The price and client data are downloaded at the same time and both must arrive before http_client.deadline('realtime', ...).
+    The download times are stored in df.attrs['fetched_at'] and the older one in df.attrs['snapshot_time'], see snapshot_age.
+    If neither payload changed since the previous call a shallow copy of the previous data frame is returned, its columns must not be modified in place.
 
     Parameters:
-        None
+        price_session (MarketWatchSession): If given, the price data is updated incrementally by the session instead of being downloaded completely by get_price.
 
     Returns:
         df (pd.DataFrame): A pandas data frame that has all the columns from the previous data frames, and filters out the rows that have null values in the symbol column.
     """
 
-    price_df = get_price()
-    if price_df is None : return
-    client_df = get_client()
-    if client_df is None : return
+    price_source = _caches['price'] if price_session is None else price_session
+    get_price_df = get_price if price_session is None else price_session.update
+    price_df, client_df = http_client.run_concurrently(
+        [get_price_df, get_client], http_client.deadline('realtime', ['price', 'client'])
+    )
+    fetched_at = {'price': price_source.fetched_at, 'client': _caches['client'].fetched_at}
+    return _snapshot(_caches['realtime'], price_df, client_df, fetched_at)
+
+def _snapshot(cache, price_df, client_df, fetched_at):
+    """
+    Combines the price and client data frames, reusing the previous result of the cache if both are unchanged,
+    and records the download times in the attrs of the result. The cached result is shared by the callers,
+    so a shallow copy of it is returned with its own attrs.
+    """
+
+    if price_df is None or client_df is None : return
+    with cache.lock:
+        inputs = cache.sections.get('inputs', (None, None))
+        if inputs[0] is not price_df or inputs[1] is not client_df:
+            cache.result = _combine(price_df, client_df)
+            cache.sections['inputs'] = (price_df, client_df)
+            cache.sections['version'] = next(_versions)
+        df = cache.result.copy(deep= False)
+        version = cache.sections['version']
+    df.attrs = {'fetched_at': dict(fetched_at), 'snapshot_time': min(fetched_at.values()), 'version': version}
+    return df
+
+def same_snapshot(df, other):
+    """
+    Checks whether two data frames returned by combine_realtime are copies of the same combined data,
+    using the version recorded in their attrs.
+
+    Parameters:
+        df (pd.DataFrame): A data frame returned by combine_realtime or None.
+        other (pd.DataFrame): Another data frame or None.
+
+    Returns:
+        bool: True if both are the same snapshot.
+    """
+
+    if df is other:
+        return True
+    if df is None or other is None:
+        return False
+    return df.attrs.get('version') is not None and df.attrs.get('version') == other.attrs.get('version')
+
+def snapshot_age(df):
+    """
+    Returns how old the data of a snapshot returned by combine_realtime is.
+    The price and client data are downloaded at slightly different times, the age is measured from the older one.
+
+    Parameters:
+        df (pd.DataFrame): A data frame returned by combine_realtime.
+
+    Returns:
+        float: The age of the snapshot in seconds, or None if the time of the snapshot is unknown.
+    """
+
+    if df is None or df.attrs.get('snapshot_time') is None:
+        return
+    return time() - df.attrs['snapshot_time']
+
+def compact_realtime(df):
+    """
+    Converts a data frame returned by combine_realtime to the compact dtypes of config.REALTIME_COMPACT_DTYPES.
+    Prices, counts, volumes and values are rounded to nullable integers, infinite values become missing values.
+    An Int32 column with a value out of the range of Int32 is stored as Int64 instead of overflowing.
+
+    Parameters:
+        df (pd.DataFrame): A data frame returned by combine_realtime.
+
+    Returns:
+        df (pd.DataFrame): A new data frame with the same columns and compact dtypes.
+    """
+
+    columns = {}
+    for column in df.columns:
+        dtype = config.REALTIME_COMPACT_DTYPES.get(column)
+        values = df[column]
+        if dtype is None:
+            columns[column] = values
+        elif dtype in ('Int32', 'Int64'):
+            values = values.to_numpy(dtype= 'float64', na_value= np.nan)
+            values = np.where(np.isfinite(values), np.round(values), np.nan)
+            if dtype == 'Int32' and np.abs(values[~np.isnan(values)]).max(initial= 0) > np.iinfo('int32').max:
+                dtype = 'Int64'
+            columns[column] = pd.array(values, dtype= 'Float64').astype(dtype)
+        else:
+            columns[column] = values.astype(dtype)
+    result = pd.DataFrame(columns, index= df.index)
+    result.attrs = dict(df.attrs)
+    return result
+
+def memory_usage(df):
+    """
+    Returns the memory used by a data frame in bytes, including the contents of string columns.
+    """
+
+    return int(df.memory_usage(deep= True).sum())
+
+def _combine(price_df, client_df):
+    """
+    Joins the price and client data frames and adds the calculated columns for combine_realtime.
+    """
+
     df = pd.concat([price_df, client_df], axis= 1)
     df['buy_i_value'] = df['pc'] * df['buy_i_volume']
     df['sell_i_value'] = df['pc'] * df['sell_i_volume']
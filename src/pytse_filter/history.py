@@ -2,12 +2,18 @@
 # for the pytse_filter project.
 
 from . import config
-from .download_history import combine_history
+from .condition_compiler import compile_condition, evaluate_conditions
+from .download_history import combine_history, download_histories
+from .history_store import HistoryStore
+from .history_archive import HistoryArchive, write_archive
+from .indicator_cache import IndicatorCache
+from .panel_indicators import calculate_panel_indicators
+from .parallel_indicators import calculate_parallel_indicators
 from .syms_manager import symbols_dict
 from . import inds_setting 
-import re
 import pandas as pd
 from tqdm import tqdm
+import os
 from os import path, mkdir
 
 class HistoryCondition:
@@ -25,7 +31,7 @@ class HistoryCondition:
         """
 
         self.rau_text = rau_text
-        self.py_code = None
+        self.compiled = None
         if not file_path is None:
             with open(file_path, 'r') as f:
                 self.rau_text = f.read()
@@ -58,24 +64,14 @@ class HistoryCondition:
 
     def convert(self):
         """
-        Converts the raw text of the condition into executable Python code for data filtering.
+        Compiles the raw text of the condition into a vectorized evaluator for data filtering.
         """
 
-        rau_text = self.rau_text
-        for key, value in config.HISTORY_CONVERT_DICT.items():
-            pattern = r"\b" + key + r"\b"
-            rau_text = re.sub(pattern, value, rau_text)
-        parts = re.split(r'\b(and|or)\b', rau_text)
-        parts = map(lambda x: x.strip(), parts)
-        change_dict = {'and': ' & ', 'or': ' | '}
-        self.py_code = ''
-        for part in parts:
-            self.py_code += f'({part})' if ( part != 'and' and part != 'or' ) else change_dict[part]
-        self.py_code = f'.loc[({self.py_code})]'
+        self.compiled = compile_condition(self.rau_text, config.history_columns())
 
     def is_valid(self):
         """
-        Validates the condition by attempting to execute the generated Python code.
+        Validates the condition by compiling it and evaluating it on a dummy DataFrame.
 
         Returns:
             bool: True if the condition is valid, False otherwise.
@@ -83,7 +79,7 @@ class HistoryCondition:
 
         self.convert()
         df = config.HISTORY_CHECK_DF()
-        df = eval(f'df{self.py_code}')
+        self.compiled(df)
         return True
 
     def __str__(self):
@@ -103,13 +99,18 @@ class History:
     based on specified conditions.
     """
 
-    def __init__(self, condition= None, base_path= 'history\\'):
+    def __init__(self, condition= None, base_path= 'history\\', use_store= False, use_cache= False, cache_on_disk= False):
         """
         Initializes the History object with an optional condition for filtering stock data and a base path for saving files.
 
         Parameters:
             condition (HistoryCondition): An object representing the filter condition.
             base_path (str): The base directory path where files will be saved.
+            use_store (bool): Keep the histories in a local store under base_path and download only new records, off by default.
+            use_cache (bool): Keep the combined histories of download_summery and download_history with their indicators in memory, off by default.
+                A history is not downloaded again for config.INDICATOR_CACHE_TTL seconds, so it may miss the records of that time,
+                and only changed indicators are recalculated. Use refresh= True of the download methods to download it again.
+            cache_on_disk (bool): Also keep the cached histories in the 'cache' subdirectory of base_path.
         """
 
         self.condition = condition
@@ -121,13 +122,49 @@ class History:
             mkdir(self.base_path)
         self.num_of_all_symbols = None
         self.num_of_success = None
-    def download_summery(self, symbols= "all", adjusted_price= True):
+        self.failed_symbols = {}
+        self.store = HistoryStore(self.base_path) if use_store else None
+        self.cache = None
+        if use_cache:
+            self.cache = IndicatorCache(path.join(self.base_path, 'cache') if cache_on_disk else None)
+        self._summery = None
+
+    @staticmethod
+    def summery_row(df, symbol):
+        """
+        Builds the summary row of a symbol from its two last records, the previous
+        record columns are prefixed with 'y_'.
+
+        Parameters:
+            df (pd.DataFrame): The combined history of the symbol.
+            symbol (str): The stock symbol used as index of the row.
+
+        Returns:
+            pd.DataFrame: A one row DataFrame.
+        """
+
+        df0 = df.loc[[df.index[-1]]]
+        df1 =  df.loc[[df.index[-2]]]
+        df1.set_index(df0.index, inplace= True)
+        df1.rename(columns= lambda x: 'y_' + x, inplace= True)
+        df = pd.concat([df0, df1], axis= 1)
+        df.set_index(pd.Series([symbol], name= 'symbol'), inplace= True)
+        return df
+
+    def download_summery(self, symbols= "all", adjusted_price= True, workers= None, vectorized= False, processes= None, refresh= False):
         """
         Downloads and summarizes historical data for a list of symbols or all symbols if not specified.
+        Symbols are downloaded concurrently and the symbols that could not be downloaded are
+        stored in the failed_symbols attribute with the reason of failure.
 
         Parameters:
             symbols (list/str): A list of symbols to summarize or "all" to summarize all symbols.
             adjusted_price (bool): download adjusted price or not
+            workers (int): Number of download threads, config.DOWNLOAD_WORKERS if None.
+            vectorized (bool): Calculate the indicators of all symbols together with the panel engine.
+            processes (int): If given, the indicators are calculated after all downloads in this number of processes,
+                0 for config.COMPUTE_PROCESSES or the number of cores. Ignored if vectorized is True.
+            refresh (bool): Download the histories even if they are in the cache.
 
         Returns:
             pd.DataFrame: A DataFrame containing the summarized historical data.
@@ -135,27 +172,58 @@ class History:
 
         if symbols == "all":
             symbols = list(symbols_dict().keys())
-        dfs = []
         length = inds_setting.find_count(inds_setting.indicators)
-        for symbol in tqdm(symbols):
-            df = combine_history(symbol, adjusted_price= adjusted_price, length= length)
-            if not df is None:
-                df0 = df.loc[[df.index[-1]]]
-                df1 =  df.loc[[df.index[-2]]]
-                df1.set_index(df0.index, inplace= True)
-                df1.rename(columns= lambda x: 'y_' + x, inplace= True)
-                df = pd.concat([df0, df1], axis= 1)
-                df.set_index(pd.Series([symbol], name= 'symbol'), inplace= True)
-                dfs.append(df)
+        with tqdm(total= len(symbols)) as progress_bar:
+            results, self.failed_symbols = download_histories(
+                symbols, adjusted_price= adjusted_price, length= length,
+                workers= workers, progress= progress_bar.update, store= self.store,
+                calc_inds= not vectorized and processes is None, cache= self.cache, refresh= refresh
+            )
+        return self._summerize(symbols, results, vectorized, processes)
+
+    def _summerize(self, symbols, results, vectorized= False, processes= None):
+        """
+        Builds and saves the summary of the downloaded combined histories.
+        """
+
+        if vectorized:
+            results = self._calculate_panel_indicators(results)
+        elif processes is not None:
+            results = self._calculate_parallel_indicators(results, processes)
+        dfs = [self.summery_row(results[symbol], symbol) for symbol in symbols if symbol in results]
         if len(dfs) > 0:
             result = pd.concat(dfs)
             self.download_status = True
             self.num_of_success = len(dfs)
             self.num_of_all_symbols = len(symbols)
-            result.to_csv(self.base_path + 'summery.csv')
+            self._write_summery(result)
             return result
 
-    def download_history(self, symbol, adjusted_price= True, length= -1, calc_inds= True, calc_client= True, save_excel_file= True):
+    @staticmethod
+    def _calculate_panel_indicators(results):
+        """
+        Calculates the indicators of the downloaded combined histories with the panel engine.
+        """
+
+        frames = calculate_panel_indicators({symbol: df[df['close'].notnull()] for symbol, df in results.items()})
+        return {
+            symbol: pd.concat([df, frames[symbol].drop(columns= df.columns)], axis= 1, sort= True)
+            for symbol, df in results.items()
+        }
+
+    @staticmethod
+    def _calculate_parallel_indicators(results, processes):
+        """
+        Calculates the indicators of the downloaded combined histories in a pool of processes.
+        """
+
+        frames = calculate_parallel_indicators({symbol: df[df['close'].notnull()] for symbol, df in results.items()}, processes= processes)
+        return {
+            symbol: pd.concat([df, frames[symbol].drop(columns= df.columns, errors= 'ignore')], axis= 1, sort= True)
+            for symbol, df in results.items()
+        }
+
+    def download_history(self, symbol, adjusted_price= True, length= -1, calc_inds= True, calc_client= True, save_excel_file= True, refresh= False):
         """
         Downloads and saves historical data for a specific symbol to an Excel file.
 
@@ -166,12 +234,20 @@ class History:
             calc_inds (bool): Whether to calculate indicators for the data.
             calc_client (bool): Whether to calculate client data for the data.
             save_excel_file (bool): save result to an excel file or not
+            refresh (bool): Download the history even if it is in the cache.
 
         Returns:
             pd.DataFrame: A DataFrame containing the historical data.
         """
 
-        df = combine_history(symbol= symbol, adjusted_price= adjusted_price, length= length, calc_inds= calc_inds, calc_client= calc_client)
+        df = combine_history(symbol= symbol, adjusted_price= adjusted_price, length= length, calc_inds= calc_inds, calc_client= calc_client, store= self.store, cache= self.cache, refresh= refresh)
+        return self._save_history(df, symbol, save_excel_file)
+
+    def _save_history(self, df, symbol, save_excel_file):
+        """
+        Sorts a downloaded combined history from the newest record and saves it to an Excel file if requested.
+        """
+
         if df is None:
             return
         df.drop(columns= ['inscode'], inplace= True)
@@ -180,6 +256,74 @@ class History:
             df.to_excel(f"{self.base_path}{symbol}.xlsx")
         return df
     
+    def download_archive(self, symbols= "all", adjusted_price= True, length= -1, calc_inds= False, workers= None, file_name= 'histories.arrow'):
+        """
+        Downloads the full combined histories of many symbols and writes them to a single memory mapped archive,
+        which can be opened with open_archive to read any symbol and date range without loading the others.
+
+        Parameters:
+            symbols (list/str): A list of symbols or "all" for all symbols.
+            adjusted_price (bool): download adjusted price or not
+            length (int): The number of days of historical data to download, -1 for all records.
+            calc_inds (bool): Whether to calculate indicators for the data.
+            workers (int): Number of download threads, config.DOWNLOAD_WORKERS if None.
+            file_name (str): The name of the archive file in base_path.
+
+        Returns:
+            HistoryArchive: The opened archive.
+        """
+
+        if symbols == "all":
+            symbols = list(symbols_dict().keys())
+        with tqdm(total= len(symbols)) as progress_bar:
+            results, self.failed_symbols = download_histories(
+                symbols, adjusted_price= adjusted_price, length= length,
+                workers= workers, progress= progress_bar.update, store= self.store,
+                calc_inds= calc_inds
+            )
+        write_archive(self.base_path + file_name, {symbol: results[symbol] for symbol in symbols if symbol in results})
+        return self.open_archive(file_name)
+
+    def open_archive(self, file_name= 'histories.arrow'):
+        """
+        Opens an archive written by download_archive.
+
+        Parameters:
+            file_name (str): The name of the archive file in base_path.
+
+        Returns:
+            HistoryArchive: The opened archive.
+        """
+
+        return HistoryArchive(self.base_path + file_name)
+
+    def _write_summery(self, df):
+        """
+        Saves the summarized historical data to summery.parquet and keeps it in memory.
+        """
+
+        file_path = self.base_path + 'summery.parquet'
+        temp_path = file_path + '.tmp'
+        df.to_parquet(temp_path)
+        os.replace(temp_path, file_path)
+        self._summery = (file_path, os.stat(file_path).st_mtime_ns, df)
+
+    def _read_summery(self):
+        """
+        Returns the summarized historical data saved by download_summery.
+        The data is kept in memory and read again only if the file has been modified, for example
+        by another process. A summery.csv file saved by an older version is read if there is no summery.parquet.
+        """
+
+        for file_name, read in (('summery.parquet', pd.read_parquet), ('summery.csv', lambda f: pd.read_csv(f, index_col= 'symbol'))):
+            file_path = self.base_path + file_name
+            if path.isfile(file_path):
+                mtime = os.stat(file_path).st_mtime_ns
+                if self._summery is None or self._summery[:2] != (file_path, mtime):
+                    self._summery = (file_path, mtime, read(file_path))
+                return self._summery[2]
+        raise FileNotFoundError('The file summery.parquet was not found, To filter symbols, the download method must be called first.')
+
     def filter_by_obj_condition(self):
         """
         Filters the summarized historical data based on the object's condition attribute.
@@ -188,12 +332,10 @@ class History:
             pd.DataFrame: The filtered DataFrame of historical data.
         """
 
-        if not path.isfile(self.base_path + 'summery.csv'):
-            raise FileNotFoundError('The file summery.csv was not found, To filter symbols, the download method must be called first.')
-        df = pd.read_csv( self.base_path + 'summery.csv', index_col= 'symbol')
+        df = self._read_summery()
         if df is None :
             return pd.DataFrame()
-        df = eval(f'df{self.condition.py_code}')
+        df = df.loc[self.condition.compiled(df)]
         self.filtered_symbols = df#[df['symbol'].notnull()]
         return self.filtered_symbols
 
@@ -212,6 +354,46 @@ class History:
         self.condition = condition
         self.filtered_symbols = self.filter_by_obj_condition()
         return self.filtered_symbols
+    @staticmethod
+    def _compile_conditions(conditions):
+        """
+        Returns the compiled conditions of a dictionary of HistoryCondition objects or raw texts.
+        """
+
+        return {
+            name: (HistoryCondition(condition) if isinstance(condition, str) else condition).compiled
+            for name, condition in conditions.items()
+        }
+
+    def membership(self, conditions):
+        """
+        Evaluates a named set of conditions on the summarized historical data in one pass.
+        Sub-expressions shared by the conditions are computed once.
+
+        Parameters:
+            conditions (dict): Names to HistoryCondition objects or raw texts of conditions.
+
+        Returns:
+            pd.DataFrame: A boolean DataFrame with one row per symbol and one column per condition.
+        """
+
+        return evaluate_conditions(self._read_summery(), self._compile_conditions(conditions))
+
+    def filter_by_conditions(self, conditions):
+        """
+        Filters the summarized historical data by a named set of conditions in one pass.
+
+        Parameters:
+            conditions (dict): Names to HistoryCondition objects or raw texts of conditions.
+
+        Returns:
+            dict: Names of the conditions to the filtered DataFrames.
+        """
+
+        df = self._read_summery()
+        membership = evaluate_conditions(df, self._compile_conditions(conditions))
+        return {name: df.loc[membership[name].to_numpy()] for name in conditions}
+
     def __str__(self):
         """
         Returns a string representation of the History object, summarizing its current state.
@@ -219,6 +401,9 @@ class History:
         if self.download_status:
             summary = "History data downloaded\n"
             summary += f"{self.num_of_success} of {self.num_of_all_symbols} downloaded succesfully."
+            if len(self.failed_symbols) > 0:
+                summary += "\nFailed symbols:\n"
+                summary += "\n".join(f"{symbol}: {error}" for symbol, error in self.failed_symbols.items())
         else:
             summary = "No historical data has been downloaded yet."
         return summary
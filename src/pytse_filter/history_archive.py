@@ -0,0 +1,169 @@
+# This module contains an archive of the full histories of many symbols for the pytse_filter project.
+# All histories are written to a single Arrow IPC file, one record batch per symbol, and the position
+# of the batch of each symbol is kept in the metadata of the schema. The file is opened as a memory map,
+# so a history is read without loading the others and the pages of the file are shared by all the
+# processes that open it.
+
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+INDEX_KEY = b'pytse_filter_index'
+
+def _to_table(df):
+    """
+    Converts a history to an Arrow table with the date as a column.
+    """
+
+    df = df.reset_index()
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+    return pa.Table.from_pandas(df, preserve_index= False).replace_schema_metadata()
+
+def write_archive(file_path, histories):
+    """
+    Writes the histories of many symbols to an archive file.
+
+    Parameters:
+        file_path (str): The path of the archive file.
+        histories (dict): Symbol to history DataFrame indexed and sorted by date.
+    """
+
+    tables = {symbol: _to_table(df) for symbol, df in histories.items()}
+    # A column stored as int64 for one symbol and as double for another is promoted to double.
+    schema = (
+        pa.unify_schemas([table.schema for table in tables.values()], promote_options= 'permissive')
+        if tables else pa.schema([('date', pa.timestamp('ns'))])
+    )
+    index = {symbol: [i, table.num_rows] for i, (symbol, table) in enumerate(tables.items())}
+    schema = schema.with_metadata({INDEX_KEY: json.dumps(index, ensure_ascii= False).encode('utf-8')})
+    temp_path = file_path + '.tmp'
+    with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for table in tables.values():
+            columns = [
+                table.column(field.name).cast(field.type) if field.name in table.column_names
+                else pa.nulls(table.num_rows, field.type)
+                for field in schema
+            ]
+            batch = pa.Table.from_arrays(columns, schema= schema).combine_chunks().to_batches()
+            writer.write_batch(batch[0] if batch else pa.RecordBatch.from_pylist([], schema= schema))
+    os.replace(temp_path, file_path)
+
+
+class HistoryArchive:
+    """
+    A read only, memory mapped archive of the histories of many symbols written by write_archive.
+    """
+
+    def __init__(self, file_path):
+        """
+        Opens an archive file.
+
+        Parameters:
+            file_path (str): The path of the archive file.
+        """
+
+        self.file_path = file_path
+        self._source = pa.memory_map(file_path, 'r')
+        self._reader = pa.ipc.open_file(self._source)
+        index = json.loads(self._reader.schema.metadata[INDEX_KEY].decode('utf-8'))
+        self.index = {symbol: tuple(position) for symbol, position in index.items()}
+
+    @property
+    def symbols(self):
+        """
+        list: The symbols of the archive.
+        """
+
+        return list(self.index)
+
+    @property
+    def columns(self):
+        """
+        list: The columns of the histories, without the date.
+        """
+
+        return [name for name in self._reader.schema.names if name != 'date']
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def read_arrow(self, symbol, start= None, end= None, columns= None):
+        """
+        Returns the history of a symbol as an Arrow record batch without copying it from the memory map.
+
+        Parameters:
+            symbol (str): The stock symbol.
+            start (str/Timestamp): The first date to read, from the first record if None.
+            end (str/Timestamp): The last date to read, to the last record if None.
+            columns (list): The columns to read, all columns if None.
+
+        Returns:
+            pyarrow.RecordBatch: The records of the date range, with the date as first column.
+
+        Raises:
+            KeyError: If the symbol is not in the archive.
+        """
+
+        batch = self._reader.get_batch(self.index[symbol][0])
+        if start is not None or end is not None:
+            dates = batch.column('date').to_numpy(zero_copy_only= False)
+            first = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), side= 'left')
+            last = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), side= 'right')
+            batch = batch.slice(first, max(0, last - first))
+        if columns is not None:
+            batch = batch.select(['date'] + [column for column in columns if column != 'date'])
+        return batch
+
+    def read(self, symbol, start= None, end= None, columns= None):
+        """
+        Reads the history of a symbol for a date range. Only the records of the range are converted.
+
+        Parameters:
+            symbol (str): The stock symbol.
+            start (str/Timestamp): The first date to read, from the first record if None.
+            end (str/Timestamp): The last date to read, to the last record if None.
+            columns (list): The columns to read, all columns if None.
+
+        Returns:
+            DataFrame: The history indexed by date.
+
+        Raises:
+            KeyError: If the symbol is not in the archive.
+        """
+
+        return self.read_arrow(symbol, start= start, end= end, columns= columns).to_pandas().set_index('date')
+
+    def panel(self, column, symbols= None, start= None, end= None):
+        """
+        Reads one column of many symbols as a DataFrame with one column per symbol.
+
+        Parameters:
+            column (str): The column to read, for example 'close'.
+            symbols (list): The symbols to read, all symbols if None.
+            start (str/Timestamp): The first date to read, from the first record if None.
+            end (str/Timestamp): The last date to read, to the last record if None.
+
+        Returns:
+            DataFrame: The values indexed by date.
+        """
+
+        symbols = self.symbols if symbols is None else symbols
+        series = {}
+        for symbol in symbols:
+            batch = self.read_arrow(symbol, start= start, end= end, columns= [column])
+            series[symbol] = pd.Series(batch.column(1).to_numpy(zero_copy_only= False), index= batch.column(0).to_numpy(zero_copy_only= False))
+        return pd.DataFrame(series).rename_axis('date')
+
+    def close(self):
+        self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
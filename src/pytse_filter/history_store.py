@@ -0,0 +1,370 @@
+# This module contains the on-disk store of symbol histories for the pytse_filter project.
+# Price and client histories of each symbol are kept in parquet files and only the
+# records from the last stored date are downloaded and written on each update.
+# Indicators of the stored price histories are kept next to them and updated
+# from the saved state of the incremental indicator engine.
+# The two last dates of a history are kept in the metadata of its file, so the
+# freshness of a history is checked without reading its records.
+
+import json
+import os
+import pickle
+from os import path
+from datetime import date
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .download_history import get_adjusted_price_history, get_price_history, get_client_history
+from .incremental_indicators import IndicatorEngine, settings_hash, mask_future_spans
+from . import inds_setting
+from . import config
+from . import http_client
+
+DATES_KEY = b'pytse_filter_last_dates'
+
+def _same_records(stored, df):
+    """
+    Checks whether two frames have the same columns and values, missing values being equal.
+    """
+
+    if not stored.columns.equals(df.columns):
+        return False
+    current = df.to_numpy(dtype= object)
+    old = stored.to_numpy(dtype= object)
+    return bool(((current == old) | (pd.isna(current) & pd.isna(old))).all())
+
+class HistoryStore:
+    """
+    A class to keep price and client histories of symbols in parquet files and
+    update them incrementally.
+    """
+
+    def __init__(self, base_path= 'history\\'):
+        """
+        Initializes the HistoryStore object and creates its directory if needed.
+
+        Parameters:
+            base_path (str): The base directory path, histories are saved in its 'store' subdirectory.
+        """
+
+        self.path = path.join(base_path, 'store')
+        if not path.exists(self.path):
+            os.makedirs(self.path)
+
+    def file_path(self, inscode, kind):
+        """
+        Returns the path of the parquet file of a history.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): One of 'adjusted_price', 'price' or 'client'.
+
+        Returns:
+            str: The file path.
+        """
+
+        return path.join(self.path, f'{inscode}_{kind}.parquet')
+
+    def read(self, inscode, kind, length= -1):
+        """
+        Reads a stored history.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): One of 'adjusted_price', 'price' or 'client'.
+            length (int): Number of last records to read, -1 for all records.
+
+        Returns:
+            DataFrame: The stored history or None if nothing is stored.
+        """
+
+        file_path = self.file_path(inscode, kind)
+        if not path.isfile(file_path):
+            return
+        df = pd.read_parquet(file_path)
+        if length != -1:
+            df = df[-length:]
+        return df
+
+    def write(self, inscode, kind, df):
+        """
+        Replaces a stored history with a DataFrame.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): One of 'adjusted_price', 'price' or 'client'.
+            df (DataFrame): The history sorted by date.
+        """
+
+        file_path = self.file_path(inscode, kind)
+        temp_path = file_path + '.tmp'
+        table = pa.Table.from_pandas(df)
+        dates = json.dumps([str(value) for value in df.index[-2:]]).encode('utf-8')
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), DATES_KEY: dates})
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, file_path)
+
+    def append(self, inscode, kind, df):
+        """
+        Appends the records of a DataFrame from the last stored date. The last stored record
+        is replaced by the downloaded one, so a record stored during a trading session gets
+        the final values of the day.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): One of 'adjusted_price', 'price' or 'client'.
+            df (DataFrame): The new records sorted by date.
+
+        Returns:
+            int: Number of appended or changed records.
+        """
+
+        stored = self.read(inscode, kind)
+        if stored is not None and len(stored) > 0:
+            df = df[df.index >= stored.index[-1]]
+            if len(df) == 0:
+                return 0
+            if len(df) == 1 and df.index[0] == stored.index[-1] and _same_records(stored[-1:], df):
+                return 0
+            self.write(inscode, kind, pd.concat([stored[stored.index < df.index[0]], df]))
+        else:
+            self.write(inscode, kind, df)
+        return len(df)
+
+    def last_dates(self, inscode, kind):
+        """
+        Returns the dates of the two last stored records of a history, read from the metadata of its file.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): One of 'adjusted_price', 'price' or 'client'.
+
+        Returns:
+            list: The dates as Timestamps, empty if nothing is stored.
+        """
+
+        file_path = self.file_path(inscode, kind)
+        if not path.isfile(file_path):
+            return []
+        metadata = pq.read_schema(file_path).metadata or {}
+        if DATES_KEY in metadata:
+            return [pd.Timestamp(value) for value in json.loads(metadata[DATES_KEY])]
+        # Files written without the metadata, only the index is read.
+        return list(pd.read_parquet(file_path, columns= []).index[-2:])
+
+    def last_date(self, inscode, kind):
+        """
+        Returns the date of the last stored record of a history or None.
+        """
+
+        dates = self.last_dates(inscode, kind)
+        return dates[-1] if len(dates) > 0 else None
+
+    def missing_length(self, inscode, kind):
+        """
+        Returns the number of records of a history to download to update the store.
+        The records are counted in calendar days from the date before the last stored one,
+        so the last stored record, which may have been stored during a trading session, is
+        downloaded again, and the record before it is compared to detect readjustments.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): One of 'adjusted_price', 'price' or 'client'.
+
+        Returns:
+            int: The number of records, -1 for all records.
+        """
+
+        dates = self.last_dates(inscode, kind)
+        if len(dates) == 0:
+            return -1
+        return max((pd.Timestamp(date.today()) - dates[0]).days, 0) + 1
+
+    def is_readjusted(self, inscode, df):
+        """
+        Checks whether a downloaded adjusted price history has been readjusted since it was stored,
+        for example after a capital increase.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            df (DataFrame): The downloaded adjusted price history.
+
+        Returns:
+            bool: True if the prices of the date before the last stored one differ or are not in df.
+        """
+
+        dates = self.last_dates(inscode, 'adjusted_price')
+        if len(dates) == 0:
+            return False
+        return dates[0] not in df.index or not self._same_prices(inscode, df, dates[0])
+
+    def update(self, inscode, adjusted_price= True, histories= None):
+        """
+        Downloads the records newer than the last stored date of the price and
+        client histories of a symbol and appends them to the store.
+        When an adjusted price history has been readjusted (for example after a
+        capital increase) the whole price history is downloaded and replaces the stored one.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            adjusted_price (bool): update adjusted price or not
+            histories (tuple): The price and client histories of missing_length records when
+                they were already downloaded, for example by an asynchronous client. The price
+                history must be complete if is_readjusted returns True for it.
+                They are downloaded if None.
+
+        Returns:
+            bool: True if both histories are available in the store.
+        """
+
+        price_kind = 'adjusted_price' if adjusted_price else 'price'
+        if histories is None:
+            histories = self._download(inscode, adjusted_price)
+        price_df, client_df = histories
+        if price_df is not None:
+            if adjusted_price and self.is_readjusted(inscode, price_df):
+                self.write(inscode, price_kind, price_df)
+            else:
+                self.append(inscode, price_kind, price_df)
+        if client_df is not None:
+            self.append(inscode, 'client', client_df)
+        return self.last_date(inscode, price_kind) is not None and self.last_date(inscode, 'client') is not None
+
+    def missing_lengths(self, inscode, adjusted_price):
+        """
+        Returns the lengths of the price and client histories to download to update the store,
+        as they are passed to the download functions.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            adjusted_price (bool): update adjusted price or not
+
+        Returns:
+            tuple: The length of the price history, -1 for all records, and the length of the client history, None for all records.
+        """
+
+        length = self.missing_length(inscode, 'adjusted_price' if adjusted_price else 'price')
+        client_length = self.missing_length(inscode, 'client')
+        return length, None if client_length == -1 else client_length
+
+    def needs_full_history(self, inscode, adjusted_price, length, price_df):
+        """
+        Checks whether the whole price history must be downloaded after the missing records,
+        because the adjusted prices of the stored history have been readjusted.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            adjusted_price (bool): update adjusted price or not
+            length (int): The length returned by missing_lengths.
+            price_df (DataFrame): The downloaded price history or None.
+
+        Returns:
+            bool: True if the whole history must be downloaded.
+        """
+
+        return adjusted_price and length > 0 and price_df is not None and self.is_readjusted(inscode, price_df)
+
+    def _download(self, inscode, adjusted_price):
+        """
+        Downloads the missing records of the price and client histories at the same time.
+        """
+
+        length, client_length = self.missing_lengths(inscode, adjusted_price)
+        get_history = get_adjusted_price_history if adjusted_price else get_price_history
+        price_df, client_df = http_client.run_concurrently([
+            lambda: get_history(inscode= inscode, length= length),
+            lambda: get_client_history(inscode= inscode, length= client_length)
+        ], http_client.deadline('history', [
+            'adjusted_price_history' if adjusted_price else 'price_history', 'client_history'
+        ]))
+        if self.needs_full_history(inscode, adjusted_price, length, price_df):
+            price_df = get_adjusted_price_history(inscode= inscode, length= -1)
+        return price_df, client_df
+
+    def _same_prices(self, inscode, df, check_date):
+        """
+        Checks whether the stored adjusted prices of a date equal the downloaded ones.
+        """
+
+        stored = self.read(inscode, 'adjusted_price')
+        columns = ['open', 'low', 'high', 'close']
+        return np.allclose(
+            stored.loc[[check_date], columns].to_numpy(dtype= 'float64'),
+            df.loc[[check_date], columns].to_numpy(dtype= 'float64'),
+            equal_nan= True
+        )
+
+    def read_with_indicators(self, inscode, kind, length= -1):
+        """
+        Reads a stored price history joined with its indicators. The indicators of the whole
+        history are calculated in one vectorized pass when the indicator settings or the stored
+        prices have changed, the records added since the last call are computed from the saved
+        engine state. Indicators without an incremental state are calculated from the whole history.
+
+        Parameters:
+            inscode (str): The stock inscode.
+            kind (str): 'adjusted_price' or 'price'.
+            length (int): Number of last records to read, -1 for all records.
+
+        Returns:
+            DataFrame: The price history with indicator columns or None if nothing is stored.
+        """
+
+        price_df = self.read(inscode, kind)
+        if price_df is None:
+            return
+        inds_kind = kind + '_indicators'
+        engine = self._load_engine(inscode, kind)
+        inds_df = self.read(inscode, inds_kind)
+        if inds_df is None or not self._engine_is_valid(engine, price_df):
+            engine = IndicatorEngine()
+            inds_df = engine.seed(price_df)
+            self.write(inscode, inds_kind, inds_df)
+        else:
+            new_df = price_df[price_df.index > engine.last_date]
+            if len(new_df) > 0:
+                new_inds_df = engine.run(new_df)
+                self.append(inscode, inds_kind, new_inds_df)
+                inds_df = pd.concat([inds_df, new_inds_df])
+        self._save_engine(inscode, kind, engine)
+        inds_df = pd.concat([inds_df, engine.fallback_columns(price_df)], axis= 1)[engine.output_columns]
+        df = pd.concat([price_df, mask_future_spans(inds_df, engine.indicators)], axis= 1)
+        if length != -1:
+            df = df[-length:]
+        return df
+
+    def _engine_path(self, inscode, kind):
+        return path.join(self.path, f'{inscode}_{kind}_indicators.pkl')
+
+    def _load_engine(self, inscode, kind):
+        """
+        Loads the saved incremental indicator engine of a price history or None.
+        """
+
+        file_path = self._engine_path(inscode, kind)
+        if not path.isfile(file_path):
+            return
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+
+    def _save_engine(self, inscode, kind, engine):
+        file_path = self._engine_path(inscode, kind)
+        with open(file_path + '.tmp', 'wb') as f:
+            pickle.dump(engine, f)
+        os.replace(file_path + '.tmp', file_path)
+
+    def _engine_is_valid(self, engine, price_df):
+        """
+        Checks whether a saved engine can continue from the stored price history.
+        """
+
+        if engine is None or engine.hash != settings_hash(inds_setting.indicators):
+            return False
+        if engine.last_date is None or engine.last_date not in price_df.index:
+            return False
+        last_bar = getattr(engine, 'last_bar', None) or {'close': engine.last_close}
+        return all(
+            column in price_df.columns and np.isclose(price_df.loc[engine.last_date, column], value, equal_nan= True)
+            for column, value in last_bar.items()
+        )
@@ -0,0 +1,183 @@
+# This module owns the HTTP transport of the pytse_filter project.
+# All download modules send their requests through one pooled requests.Session,
+# so connections to tsetmc.com are kept alive and reused between requests.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import monotonic
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from . import config
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+_executor = None
+
+def get_session():
+    """
+    Returns the shared session, creating it on the first call.
+    The session keeps a pool of keep-alive connections per host, accepts gzip
+    responses and retries failed requests with jittered exponential backoff.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total= config.DOWNLOAD_RETRIES,
+                backoff_factor= config.RETRY_BACKOFF,
+                backoff_jitter= config.RETRY_JITTER,
+                status_forcelist= (429, 500, 502, 503, 504),
+                allowed_methods= ('GET',),
+                raise_on_status= False
+            )
+            adapter = HTTPAdapter(
+                pool_connections= config.POOL_CONNECTIONS,
+                pool_maxsize= config.DOWNLOAD_WORKERS,
+                max_retries= retry
+            )
+            session = requests.Session()
+            session.headers.update(config.HEADERS)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def _host_semaphore(url):
+    """
+    Returns the semaphore that limits simultaneous requests to the host of the url.
+    """
+
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(config.MAX_CONNECTIONS_PER_HOST)
+        return _host_semaphores[host]
+
+def get(url, endpoint, **kwargs):
+    """
+    Sends a GET request through the shared session.
+
+    Parameters:
+        url (str): The requested url.
+        endpoint (str): Name of the endpoint in config.TIMEOUTS, used to select the timeout.
+        **kwargs: Other arguments passed to requests.Session.get.
+
+    Returns:
+        Response: The response of the request.
+
+    Raises:
+        requests.RequestException: If the request fails after all retries or the
+        response has an error status.
+    """
+
+    kwargs.setdefault('timeout', config.TIMEOUTS[endpoint])
+    with _host_semaphore(url):
+        response = get_session().get(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+def get_if_modified(url, endpoint, etag= None, last_modified= None, **kwargs):
+    """
+    Sends a conditional GET request through the shared session.
+    The validators of a previous response are sent as If-None-Match and
+    If-Modified-Since headers, so a server that honours them can answer
+    304 Not Modified instead of sending the same payload again.
+
+    Parameters:
+        url (str): The requested url.
+        endpoint (str): Name of the endpoint in config.TIMEOUTS, used to select the timeout.
+        etag (str): The ETag header of the previous response.
+        last_modified (str): The Last-Modified header of the previous response.
+        **kwargs: Other arguments passed to requests.Session.get.
+
+    Returns:
+        Response: The response of the request, or None if the resource was not modified.
+
+    Raises:
+        requests.RequestException: If the request fails after all retries or the
+        response has an error status.
+    """
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    if etag is not None:
+        headers['If-None-Match'] = etag
+    if last_modified is not None:
+        headers['If-Modified-Since'] = last_modified
+    response = get(url, endpoint, headers= headers, **kwargs)
+    if response.status_code == 304:
+        return None
+    return response
+
+def request_time(endpoint):
+    """
+    Returns the longest time of a request of an endpoint that fails on every try but the last one,
+    with the timeout of each try, config.DOWNLOAD_RETRIES retries and their largest backoff delays.
+
+    Parameters:
+        endpoint (str): Name of the endpoint in config.TIMEOUTS.
+
+    Returns:
+        float: The time in seconds.
+    """
+
+    retries = config.DOWNLOAD_RETRIES
+    backoff = sum(config.RETRY_BACKOFF * 2 ** attempt + config.RETRY_JITTER for attempt in range(retries))
+    return config.TIMEOUTS[endpoint] * (retries + 1) + backoff
+
+def deadline(kind, endpoints):
+    """
+    Returns the time to wait for the concurrent requests of a realtime snapshot or of a history.
+    config.DEADLINES[kind] is raised to the longest request_time of the endpoints, so a slow request
+    that succeeds on its last retry is not thrown away while its thread keeps running.
+
+    Parameters:
+        kind (str): 'realtime' or 'history', the key of config.DEADLINES.
+        endpoints (list): The names of the endpoints of the requests in config.TIMEOUTS.
+
+    Returns:
+        float: The deadline in seconds.
+    """
+
+    return max([config.DEADLINES[kind]] + [request_time(endpoint) for endpoint in endpoints])
+
+def run_concurrently(functions, deadline):
+    """
+    Calls independent functions at the same time and waits for all of them until a shared deadline.
+    The functions are called in a thread pool of config.CONCURRENT_WORKERS threads, at least twice
+    config.DOWNLOAD_WORKERS, separate from the pool of download_histories so its workers can wait here
+    without taking the threads of the requests.
+    The total time is the time of the slowest function instead of the sum of the times.
+
+    Parameters:
+        functions (list): The functions to call without arguments.
+        deadline (float): The maximum time in seconds to wait for all the functions.
+
+    Returns:
+        list: The results in the order of functions, None for a function that raised an
+        exception or did not finish before the deadline.
+    """
+
+    global _executor
+    with _session_lock:
+        if _executor is None:
+            # Each worker of download_histories waits here for two functions.
+            workers = max(config.CONCURRENT_WORKERS or 0, 2 * config.DOWNLOAD_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers= workers, thread_name_prefix= 'pytse_filter')
+    futures = [_executor.submit(function) for function in functions]
+    wait(futures, timeout= deadline)
+    results = []
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            results.append(future.result())
+        else:
+            future.cancel()
+            results.append(None)
+    return results
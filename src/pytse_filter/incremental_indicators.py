@@ -0,0 +1,767 @@
+# This module contains an incremental engine for the indicators of the pytse_filter project.
+# Each configured indicator set of the inds_setting module keeps its rolling state
+# (moving average accumulators, rolling windows, ...) and is updated with one new bar
+# at a time, so appending a bar to a stored history does not need a full pandas_ta pass.
+# The states work on numpy arrays, one element per symbol, so many symbols can be
+# updated together. The results follow the formulas used by pandas_ta.
+# A new engine is seeded from whole histories in one vectorized pass over the
+# (bars x symbols) arrays, with numpy sliding windows for the rolling calculations and
+# a blocked linear recursion along the bars for the exponential means, the per bar
+# updates are only used for new bars.
+
+import hashlib
+import json
+from sys import float_info
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import pandas as pd
+from . import inds_setting
+
+def settings_hash(settings):
+    """
+    Returns a short hash of a settings dictionary, used to detect changed settings.
+
+    Parameters:
+        settings: A json serializable settings object.
+
+    Returns:
+        str: The hash.
+    """
+
+    text = json.dumps(settings, sort_keys= True, default= str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def _non_zero_range(high, low):
+    """
+    Returns high - low, replacing zero ranges with epsilon like pandas_ta.
+    """
+
+    diff = high - low
+    return np.where(diff == 0, diff + float_info.epsilon, diff)
+
+def _tail(x, length):
+    """
+    Returns the last length rows of a (bars x symbols) array, padded with NaN at the top.
+    """
+
+    padding = np.full((max(length - len(x), 0), x.shape[1]), np.nan)
+    return np.concatenate([padding, x[len(x) - min(length, len(x)):]])
+
+def _first_observations(x):
+    """
+    Returns the row of the first value of each column of a (bars x symbols) array, the number of rows if there is none.
+    """
+
+    observed = ~np.isnan(x)
+    return np.where(observed.any(axis= 0), observed.argmax(axis= 0), len(x))
+
+
+def _linear_recursion(u, decay, block= 256):
+    """
+    Returns y[t] = decay * y[t - 1] + u[t] along the rows of a (bars x symbols) array, starting from zero.
+    Each block of rows is calculated with one matrix product, so the loop runs once per block.
+    """
+
+    rows = np.arange(min(block, len(u)))
+    steps = np.subtract.outer(rows, rows)
+    weights = np.where(steps >= 0, decay ** np.maximum(steps, 0), 0.0)
+    powers = decay ** (rows + 1)
+    y = np.empty(u.shape)
+    previous = np.zeros(u.shape[1])
+    for start in range(0, len(u), block):
+        size = min(block, len(u) - start)
+        y[start:start + size] = weights[:size, :size] @ u[start:start + size] + np.outer(powers[:size], previous)
+        previous = y[start + size - 1]
+    return y
+
+
+class _Window:
+    """
+    The rolling windows of 'length' bars of all rows of a (bars x symbols) array, with min_periods
+    equal to length like pandas rolling. A window with a missing value gives NaN.
+    """
+
+    def __init__(self, x, length):
+        padded = np.concatenate([np.full((length - 1, x.shape[1]), np.nan), x])
+        self.windows = sliding_window_view(padded, length, axis= 0)
+
+    def sum(self):
+        return self.windows.sum(axis= -1)
+
+    def mean(self):
+        return self.windows.mean(axis= -1)
+
+    def var(self):
+        return self.windows.var(axis= -1)
+
+    def max(self):
+        return self.windows.max(axis= -1)
+
+    def min(self):
+        return self.windows.min(axis= -1)
+
+
+class _Ewm:
+    """
+    Exponentially weighted mean equal to pandas ewm(...).mean() with ignore_na=False.
+    """
+
+    def __init__(self, size, alpha, adjust, min_periods= 0):
+        self.alpha = alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = np.full(size, np.nan)
+        self.old_wt = np.ones(size)
+        self.nobs = np.zeros(size, dtype= 'int64')
+
+    def update(self, x):
+        is_observation = ~np.isnan(x)
+        started = ~np.isnan(self.weighted)
+        new_wt = 1.0 if self.adjust else self.alpha
+        self.nobs += is_observation
+        self.old_wt = np.where(started, self.old_wt * (1 - self.alpha), self.old_wt)
+        mix = started & is_observation
+        with np.errstate(invalid= 'ignore'):
+            weighted = (self.old_wt * self.weighted + new_wt * x) / (self.old_wt + new_wt)
+        self.weighted = np.where(mix, weighted, self.weighted)
+        if self.adjust:
+            self.old_wt = np.where(mix, self.old_wt + new_wt, self.old_wt)
+        else:
+            self.old_wt = np.where(mix, 1.0, self.old_wt)
+        self.weighted = np.where(~started & is_observation, x, self.weighted)
+        return np.where(self.nobs >= self.min_periods, self.weighted, np.nan)
+
+    def seed(self, x):
+        """
+        Sets the state from the values of all bars and returns the means of all bars.
+        """
+
+        observed = ~np.isnan(x)
+        nobs = observed.cumsum(axis= 0)
+        decay = 1 - self.alpha
+        if self.adjust:
+            # The weighted sum and the sum of the weights follow the same linear recursion.
+            numerator = _linear_recursion(np.where(observed, x, 0), decay)
+            denominator = _linear_recursion(observed.astype('float64'), decay)
+            with np.errstate(invalid= 'ignore', divide= 'ignore'):
+                weighted = numerator / denominator
+            old_wt = denominator[-1]
+        else:
+            first = observed & (nobs == 1)
+            weighted = _linear_recursion(np.where(first, x, np.where(observed, self.alpha * x, 0)), decay)
+            weighted = np.where(nobs > 0, weighted, np.nan)
+            # A missing value after the first one changes the weights of the next one,
+            # such columns are calculated one bar at a time.
+            gaps = ((nobs > 0) & ~observed).any(axis= 0)
+            if gaps.any():
+                ewm = _Ewm(int(gaps.sum()), self.alpha, self.adjust)
+                weighted[:, gaps] = np.array([ewm.update(row) for row in x[:, gaps]]).reshape(len(x), -1)
+            rows = np.arange(len(x))[:, None]
+            old_wt = decay ** (len(x) - 1 - np.where(observed, rows, -1).max(axis= 0))
+        started = nobs[-1] > 0
+        self.weighted = weighted[-1].copy()
+        self.old_wt = np.where(started, old_wt, 1.0)
+        self.nobs = nobs[-1].copy()
+        return np.where(nobs >= self.min_periods, weighted, np.nan)
+
+
+class _Ema:
+    """
+    Exponential moving average of pandas_ta, seeded with the simple average of the first 'length' bars.
+    """
+
+    def __init__(self, size, length):
+        self.length = length
+        self.bars = np.zeros(size, dtype= 'int64')
+        self.seed_sum = np.zeros(size)
+        self.seed_count = np.zeros(size, dtype= 'int64')
+        self.ewm = _Ewm(size, 2 / (length + 1), adjust= False)
+
+    def update(self, x):
+        started = (self.bars > 0) | ~np.isnan(x)
+        self.bars += started
+        seeding = started & (self.bars <= self.length)
+        valid = seeding & ~np.isnan(x)
+        self.seed_sum += np.where(valid, x, 0)
+        self.seed_count += valid
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            seed = self.seed_sum / self.seed_count
+        value = np.where(seeding, np.nan, x)
+        value = np.where(self.bars == self.length, seed, value)
+        return self.ewm.update(value)
+
+    def seed(self, x):
+        bars = np.arange(1, len(x) + 1)[:, None] - _first_observations(x)
+        seeding = (bars >= 1) & (bars <= self.length)
+        valid = seeding & ~np.isnan(x)
+        self.bars = np.maximum(bars[-1], 0)
+        self.seed_sum = np.where(valid, x, 0).sum(axis= 0)
+        self.seed_count = valid.sum(axis= 0)
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            seed = self.seed_sum / self.seed_count
+        value = np.where(seeding, np.nan, x)
+        value = np.where(bars == self.length, seed, value)
+        return self.ewm.seed(value)
+
+
+class _Shift:
+    """
+    Returns the value of 'periods' bars ago.
+    """
+
+    def __init__(self, size, periods):
+        self.buffer = np.full((periods, size), np.nan)
+        self.pos = 0
+
+    def update(self, x):
+        old = self.buffer[self.pos].copy()
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % len(self.buffer)
+        return old
+
+    def seed(self, x):
+        periods = len(self.buffer)
+        self.buffer = _tail(x, periods)
+        self.pos = 0
+        return np.concatenate([np.full((periods, x.shape[1]), np.nan), x])[:len(x)]
+
+
+class _Rolling:
+    """
+    Rolling window of 'length' bars with min_periods equal to length, like pandas rolling.
+    Sums are kept as running totals, minimum and maximum are only recomputed from the
+    window when the leaving value was the extreme one.
+    """
+
+    def __init__(self, size, length):
+        self.length = length
+        self.buffer = np.full((length, size), np.nan)
+        self.pos = 0
+        self.total = np.zeros(size)
+        self.nan_count = np.full(size, length, dtype= 'int64')
+        self.highest = np.full(size, -np.inf)
+        self.lowest = np.full(size, np.inf)
+
+    def update(self, x):
+        old = self.buffer[self.pos].copy()
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % self.length
+        old_nan = np.isnan(old)
+        new_nan = np.isnan(x)
+        self.nan_count += new_nan.astype('int64') - old_nan
+        if self.pos == 0:
+            self.total = np.nansum(self.buffer, axis= 0)
+        else:
+            self.total += np.where(new_nan, 0, x) - np.where(old_nan, 0, old)
+        x_max = np.where(new_nan, -np.inf, x)
+        x_min = np.where(new_nan, np.inf, x)
+        recompute = (old == self.highest) & (x_max < self.highest)
+        self.highest = np.maximum(self.highest, x_max)
+        if recompute.any():
+            window = self.buffer[:, recompute]
+            self.highest[recompute] = np.where(np.isnan(window), -np.inf, window).max(axis= 0)
+        recompute = (old == self.lowest) & (x_min > self.lowest)
+        self.lowest = np.minimum(self.lowest, x_min)
+        if recompute.any():
+            window = self.buffer[:, recompute]
+            self.lowest[recompute] = np.where(np.isnan(window), np.inf, window).min(axis= 0)
+
+    def seed(self, x):
+        """
+        Sets the window to the last bars of x and returns the rolling windows of all bars.
+        """
+
+        self.buffer = _tail(x, self.length)
+        self.pos = 0
+        missing = np.isnan(self.buffer)
+        self.nan_count = missing.sum(axis= 0)
+        self.total = np.where(missing, 0, self.buffer).sum(axis= 0)
+        self.highest = np.where(missing, -np.inf, self.buffer).max(axis= 0)
+        self.lowest = np.where(missing, np.inf, self.buffer).min(axis= 0)
+        return _Window(x, self.length)
+
+    @property
+    def ready(self):
+        return self.nan_count == 0
+
+    def sum(self):
+        return np.where(self.ready, self.total, np.nan)
+
+    def mean(self):
+        return np.where(self.ready, self.total / self.length, np.nan)
+
+    def var(self):
+        return np.where(self.ready, self.buffer.var(axis= 0), np.nan)
+
+    def max(self):
+        return np.where(self.ready, self.highest, np.nan)
+
+    def min(self):
+        return np.where(self.ready, self.lowest, np.nan)
+
+
+class _Rsi:
+    def __init__(self, size, length= 14, drift= 1):
+        self.shift = _Shift(size, drift)
+        self.positive = _Ewm(size, 1 / length, adjust= True, min_periods= length)
+        self.negative = _Ewm(size, 1 / length, adjust= True, min_periods= length)
+
+    def update(self, close):
+        diff = close - self.shift.update(close)
+        positive = self.positive.update(np.where(diff < 0, 0, diff))
+        negative = self.negative.update(np.where(diff > 0, 0, diff))
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            return 100 * positive / (positive + np.abs(negative))
+
+    def seed(self, close):
+        diff = close - self.shift.seed(close)
+        positive = self.positive.seed(np.where(diff < 0, 0, diff))
+        negative = self.negative.seed(np.where(diff > 0, 0, diff))
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            return 100 * positive / (positive + np.abs(negative))
+
+
+class _Smooth:
+    """
+    Simple moving average of a series that may start with missing values.
+    """
+
+    def __init__(self, size, length):
+        self.window = _Rolling(size, length)
+
+    def update(self, x):
+        self.window.update(x)
+        return self.window.mean()
+
+    def seed(self, x):
+        return self.window.seed(x).mean()
+
+
+class RsiState:
+    def __init__(self, size, close, length= 14, drift= 1, **kwargs):
+        self.inputs = [close]
+        self.rsi = _Rsi(size, length, drift)
+
+    def update(self, close):
+        return [self.rsi.update(close)]
+
+    def seed(self, close):
+        return [self.rsi.seed(close)]
+
+
+class MacdState:
+    def __init__(self, size, close, fast= 12, slow= 26, signal= 9, **kwargs):
+        self.inputs = [close]
+        self.fast = _Ema(size, fast)
+        self.slow = _Ema(size, slow)
+        self.signal = _Ema(size, signal)
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(macd)
+        return [macd, macd - signal, signal]
+
+    def seed(self, close):
+        macd = self.fast.seed(close) - self.slow.seed(close)
+        signal = self.signal.seed(macd)
+        return [macd, macd - signal, signal]
+
+
+class StochState:
+    def __init__(self, size, high, low, close, k= 14, d= 3, smooth_k= 3, **kwargs):
+        self.inputs = [high, low, close]
+        self.high = _Rolling(size, k)
+        self.low = _Rolling(size, k)
+        self.k = _Smooth(size, smooth_k)
+        self.d = _Smooth(size, d)
+
+    def update(self, high, low, close):
+        self.high.update(high)
+        self.low.update(low)
+        lowest = self.low.min()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            stoch = 100 * (close - lowest) / _non_zero_range(self.high.max(), lowest)
+        k = self.k.update(stoch)
+        return [k, self.d.update(k)]
+
+    def seed(self, high, low, close):
+        highest = self.high.seed(high).max()
+        lowest = self.low.seed(low).min()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            stoch = 100 * (close - lowest) / _non_zero_range(highest, lowest)
+        k = self.k.seed(stoch)
+        return [k, self.d.seed(k)]
+
+
+class MfiState:
+    def __init__(self, size, high, low, close, volume, length= 14, drift= 1, **kwargs):
+        self.inputs = [high, low, close, volume]
+        self.shift = _Shift(size, drift)
+        self.started = np.zeros(size, dtype= bool)
+        self.positive = _Rolling(size, length)
+        self.negative = _Rolling(size, length)
+
+    def update(self, high, low, close, volume):
+        typical_price = (high + low + close) / 3
+        raw_money_flow = typical_price * volume
+        diff = typical_price - self.shift.update(typical_price)
+        self.started |= ~np.isnan(close)
+        positive = np.where(diff > 0, raw_money_flow, 0)
+        negative = np.where(diff < 0, raw_money_flow, 0)
+        self.positive.update(np.where(self.started, positive, np.nan))
+        self.negative.update(np.where(self.started, negative, np.nan))
+        positive = self.positive.sum()
+        negative = self.negative.sum()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            return [100 * positive / (positive + negative)]
+
+    def seed(self, high, low, close, volume):
+        typical_price = (high + low + close) / 3
+        raw_money_flow = typical_price * volume
+        diff = typical_price - self.shift.seed(typical_price)
+        started = np.logical_or.accumulate(~np.isnan(close), axis= 0)
+        if len(close) > 0:
+            self.started = started[-1].copy()
+        positive = np.where(diff > 0, raw_money_flow, 0)
+        negative = np.where(diff < 0, raw_money_flow, 0)
+        positive = self.positive.seed(np.where(started, positive, np.nan)).sum()
+        negative = self.negative.seed(np.where(started, negative, np.nan)).sum()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            return [100 * positive / (positive + negative)]
+
+
+class SmaState:
+    def __init__(self, size, close, length= 10, **kwargs):
+        self.inputs = [close]
+        self.sma = _Smooth(size, length)
+
+    def update(self, close):
+        return [self.sma.update(close)]
+
+    def seed(self, close):
+        return [self.sma.seed(close)]
+
+
+class EmaState:
+    def __init__(self, size, close, length= 10, **kwargs):
+        self.inputs = [close]
+        self.ema = _Ema(size, length)
+
+    def update(self, close):
+        return [self.ema.update(close)]
+
+    def seed(self, close):
+        return [self.ema.seed(close)]
+
+
+class StochRsiState:
+    def __init__(self, size, close, length= 14, rsi_length= 14, k= 3, d= 3, **kwargs):
+        self.inputs = [close]
+        self.rsi = _Rsi(size, rsi_length)
+        self.window = _Rolling(size, length)
+        self.k = _Smooth(size, k)
+        self.d = _Smooth(size, d)
+
+    def update(self, close):
+        rsi = self.rsi.update(close)
+        self.window.update(rsi)
+        lowest = self.window.min()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            stoch = 100 * (rsi - lowest) / _non_zero_range(self.window.max(), lowest)
+        k = self.k.update(stoch)
+        return [k, self.d.update(k)]
+
+    def seed(self, close):
+        rsi = self.rsi.seed(close)
+        window = self.window.seed(rsi)
+        lowest = window.min()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            stoch = 100 * (rsi - lowest) / _non_zero_range(window.max(), lowest)
+        k = self.k.seed(stoch)
+        return [k, self.d.seed(k)]
+
+
+class BbandsState:
+    def __init__(self, size, close, length= 5, std= 2, **kwargs):
+        self.inputs = [close]
+        self.std = std
+        self.window = _Rolling(size, length)
+
+    def update(self, close):
+        self.window.update(close)
+        return self._bands(close, self.window.mean(), np.sqrt(self.window.var()))
+
+    def seed(self, close):
+        window = self.window.seed(close)
+        return self._bands(close, window.mean(), np.sqrt(window.var()))
+
+    def _bands(self, close, mid, deviation):
+        lower = mid - self.std * deviation
+        upper = mid + self.std * deviation
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            width = 100 * (upper - lower) / mid
+            percent = (close - lower) / _non_zero_range(upper, lower)
+        return [lower, mid, upper, width, percent]
+
+
+class IchimokuState:
+    """
+    Ichimoku lines. The future spans are the spans of the current bar before they are
+    shifted forward, they are returned for every bar and only kept for the last kijun
+    bars of a history by mask_future_spans.
+    """
+
+    def __init__(self, size, high, low, close, tenkan= 9, kijun= 26, senkou= 52, **kwargs):
+        self.inputs = [high, low]
+        self.windows = [(_Rolling(size, length), _Rolling(size, length)) for length in (tenkan, kijun, senkou)]
+        self.span_a = _Shift(size, kijun)
+        self.span_b = _Shift(size, kijun)
+
+    def update(self, high, low):
+        mids = []
+        for high_window, low_window in self.windows:
+            high_window.update(high)
+            low_window.update(low)
+            mids.append(0.5 * (high_window.max() + low_window.min()))
+        tenkan, kijun, span_b = mids
+        span_a = 0.5 * (tenkan + kijun)
+        return [[self.span_a.update(span_a), self.span_b.update(span_b), tenkan, kijun], [span_a, span_b]]
+
+    def seed(self, high, low):
+        mids = []
+        for high_window, low_window in self.windows:
+            mids.append(0.5 * (high_window.seed(high).max() + low_window.seed(low).min()))
+        tenkan, kijun, span_b = mids
+        span_a = 0.5 * (tenkan + kijun)
+        return [[self.span_a.seed(span_a), self.span_b.seed(span_b), tenkan, kijun], [span_a, span_b]]
+
+
+class ExtremeState:
+    def __init__(self, size, kind, source, period, **kwargs):
+        self.inputs = [source, 'close']
+        self.kind = kind
+        self.window = _Rolling(size, period)
+
+    def update(self, source, close):
+        self.window.update(source)
+        extreme = self.window.max() if self.kind == 'max' else self.window.min()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            return [extreme, 100 * np.abs(close - extreme) / extreme]
+
+    def seed(self, source, close):
+        window = self.window.seed(source)
+        extreme = window.max() if self.kind == 'max' else window.min()
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            return [extreme, 100 * np.abs(close - extreme) / extreme]
+
+
+STATES = {
+    'rsi': RsiState,
+    'macd': MacdState,
+    'stoch': StochState,
+    'mfi': MfiState,
+    'sma': SmaState,
+    'ema': EmaState,
+    'stochrsi': StochRsiState,
+    'bbands': BbandsState,
+    'ichimoku': IchimokuState,
+}
+
+def _flatten(values):
+    """
+    Flattens the nested output lists of the ichimoku state.
+    """
+
+    flat = []
+    for value in values:
+        if isinstance(value, list):
+            flat.extend(value)
+        else:
+            flat.append(value)
+    return flat
+
+def mask_future_spans(df, indicators= None):
+    """
+    Keeps the future spans of the ichimoku indicator sets only in the last kijun rows
+    of a history, like calculate_indicators.
+
+    Parameters:
+        df (DataFrame): The indicator columns of a history sorted by date, changed in place.
+        indicators (dict): The indicator settings, inds_setting.indicators if None.
+
+    Returns:
+        DataFrame: df.
+    """
+
+    indicators = inds_setting.indicators if indicators is None else indicators
+    for ind_set in indicators.get('ichimoku', []):
+        columns = [column for column in ind_set['columns'][1] if column in df.columns]
+        rows = len(df) - ind_set['args']['kijun']
+        if len(columns) > 0 and rows > 0:
+            df.iloc[:rows, [df.columns.get_loc(column) for column in columns]] = np.nan
+    return df
+
+
+class IndicatorEngine:
+    """
+    A class that keeps the rolling state of every indicator set of inds_setting.indicators
+    for one or more symbols and updates it one bar at a time.
+    Indicators without an incremental state are not updated by the engine, they are kept in
+    the fallback attribute and calculated with calculate_indicators from the whole history.
+    """
+
+    def __init__(self, size= 1, indicators= None):
+        """
+        Initializes the states of the indicator sets.
+
+        Parameters:
+            size (int): Number of symbols updated together.
+            indicators (dict): The indicator settings, inds_setting.indicators if None.
+        """
+
+        indicators = inds_setting.indicators if indicators is None else indicators
+        self.size = size
+        self.hash = settings_hash(indicators)
+        self.indicators = indicators
+        self.states = []
+        self.columns = []
+        self.fallback = {}
+        self.last_date = None
+        self.last_close = None
+        self.last_bar = None
+        for ind_name, ind_sets in indicators.items():
+            for ind_set in ind_sets:
+                args = {
+                    k: inds_setting.source_column(v) if inds_setting.source_column(v) else v
+                    for k, v in ind_set['args'].items()
+                }
+                if ind_name in ['min', 'max']:
+                    state = ExtremeState(size, ind_name, **args)
+                elif ind_name in STATES:
+                    state = STATES[ind_name](size, **args)
+                else:
+                    self.fallback.setdefault(ind_name, []).append(ind_set)
+                    continue
+                self.states.append(state)
+                self.columns.extend(inds_setting.output_columns(ind_name, ind_set))
+
+    @property
+    def output_columns(self):
+        """
+        The columns of all indicator sets in the order of the settings, including the fallback ones.
+        """
+
+        return [
+            column
+            for ind_name, ind_sets in self.indicators.items()
+            for ind_set in ind_sets
+            for column in inds_setting.output_columns(ind_name, ind_set)
+        ]
+
+    def fallback_columns(self, df):
+        """
+        Calculates the indicators of the fallback attribute with calculate_indicators.
+
+        Parameters:
+            df (DataFrame): The whole price history sorted by date.
+
+        Returns:
+            DataFrame: The indicator columns, indexed like df.
+        """
+
+        # calculate_indicators imports this module, it is imported here to avoid a circular import.
+        from .calculate_indicators import indicator_columns
+        if len(self.fallback) == 0:
+            return pd.DataFrame(index= df.index)
+        return indicator_columns(df, self.fallback)
+
+    def _remember(self, df):
+        """
+        Keeps the date and the input values of the last bar of a history, to check later that it did not change.
+        """
+
+        self.last_date = df.index[-1]
+        self.last_close = float(df['close'].iloc[-1])
+        columns = {'close'} | {column for state in self.states for column in state.inputs}
+        self.last_bar = {column: float(df[column].iloc[-1]) for column in sorted(columns)}
+
+    def _inputs(self, df):
+        columns = {column for state in self.states for column in state.inputs}
+        return {column: df[column].to_numpy(dtype= 'float64') for column in columns}
+
+    def update(self, bar):
+        """
+        Updates all indicator states with one bar.
+
+        Parameters:
+            bar (dict): Column name to value (or numpy array with one value per symbol).
+
+        Returns:
+            list: The indicator values of the bar, in the order of the columns attribute.
+        """
+
+        values = []
+        for state in self.states:
+            inputs = [np.asarray(bar[column], dtype= 'float64').reshape(self.size) for column in state.inputs]
+            values.extend(_flatten(state.update(*inputs)))
+        return values
+
+    def seed(self, df):
+        """
+        Sets the states of a new engine from whole histories in one vectorized pass,
+        like run but without updating the states one bar at a time.
+
+        Parameters:
+            df (DataFrame or dict): The price history of a single symbol sorted by date, or a panel of
+                column name to numpy array of shape (bars, size) like panel_indicators.build_panel.
+
+        Returns:
+            DataFrame: The indicator values of the rows indexed like df, for a single history.
+            numpy.ndarray: The indicator values of shape (bars, columns, size), for a panel. The
+                future spans of the ichimoku indicator sets are not masked.
+
+        Raises:
+            ValueError: If the engine has already been updated.
+        """
+
+        if self.last_date is not None:
+            raise ValueError('Only a new engine can be seeded, use run to add bars.')
+        if isinstance(df, dict):
+            length = len(next(iter(df.values()), []))
+            return self._seed_states({column: np.asarray(value, dtype= 'float64') for column, value in df.items()}, length)
+        if len(df) == 0:
+            return self.run(df)
+        inputs = {column: value.reshape(-1, 1) for column, value in self._inputs(df).items()}
+        values = self._seed_states(inputs, len(df))[:, :, 0]
+        self._remember(df)
+        return mask_future_spans(pd.DataFrame(values, index= df.index, columns= self.columns), self.indicators)
+
+    def _seed_states(self, inputs, length):
+        """
+        Seeds the states from column name to (bars x size) arrays and returns the (bars x columns x size) values.
+        """
+
+        values = []
+        for state in self.states:
+            values.extend(_flatten(state.seed(*[inputs[column] for column in state.inputs])))
+        return np.stack(values, axis= 1) if len(values) > 0 else np.empty((length, 0, self.size))
+
+    def run(self, df):
+        """
+        Updates the states with all rows of a single symbol history.
+
+        Parameters:
+            df (DataFrame): The price history sorted by date.
+
+        Returns:
+            DataFrame: The indicator values of the rows, indexed like df.
+        """
+
+        inputs = self._inputs(df)
+        rows = []
+        for i in range(len(df)):
+            rows.append([value[0] for value in self.update({k: v[i] for k, v in inputs.items()})])
+        if len(df) > 0:
+            self._remember(df)
+        inds_df = pd.DataFrame(rows, index= df.index, columns= self.columns, dtype= 'float64')
+        return mask_future_spans(inds_df, self.indicators)
@@ -0,0 +1,196 @@
+# This module contains a cache of combined histories and their indicators for the pytse_filter project.
+# An entry keeps the downloaded price and client histories of a symbol with the date of their last bar,
+# and the columns of each indicator set keyed by the hash of its settings. A history downloaded again
+# with the same records keeps its indicators, and a changed setting recomputes only its own columns.
+# Entries are kept in a memory LRU and optionally in pickle files, and a recent entry is used without
+# downloading the histories again.
+
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from os import path
+from time import time
+import pandas as pd
+from . import config
+from . import inds_setting
+from . import client_setting
+from .calculate_indicators import indicator_columns
+from .calculate_client_data import calculate_client_data
+from .incremental_indicators import settings_hash
+
+CLIENT_KEY = 'client'
+
+def _client_hash():
+    return settings_hash({CLIENT_KEY: client_setting.calculations})
+
+def _settings_hashes():
+    """
+    Returns the hashes of the current indicator sets and client calculations.
+    """
+
+    hashes = {_client_hash()}
+    for ind_name, ind_sets in inds_setting.indicators.items():
+        hashes.update(settings_hash({ind_name: [ind_set]}) for ind_set in ind_sets)
+    return hashes
+
+class CacheEntry:
+    """
+    The histories of a symbol and the indicator columns calculated from them.
+    """
+
+    def __init__(self, price_df, client_df):
+        self.price_df = price_df
+        self.client_df = client_df
+        self.last_date = price_df.index[-1] if len(price_df) > 0 else None
+        self.fetched_at = time()
+        self.groups = {}
+
+    def same_histories(self, price_df, client_df):
+        last_date = price_df.index[-1] if len(price_df) > 0 else None
+        return last_date == self.last_date and self.price_df.equals(price_df) and self.client_df.equals(client_df)
+
+
+class IndicatorCache:
+    """
+    A cache of combined histories keyed by inscode, kind of price and length. The entry of a key is replaced
+    when the downloaded histories have a new last bar or different records, for example after a readjustment.
+    The indicator columns are keyed by the hash of the settings of each indicator set.
+    """
+
+    def __init__(self, base_path= None, max_entries= None, ttl= None):
+        """
+        Parameters:
+            base_path (str): The directory of the pickle files, the entries are only kept in memory if None.
+            max_entries (int): Number of entries kept in memory, config.INDICATOR_CACHE_SIZE if None.
+            ttl (float): Time in seconds an entry is used without downloading the histories again, config.INDICATOR_CACHE_TTL if None.
+        """
+
+        self.path = base_path
+        if self.path is not None and not path.exists(self.path):
+            os.makedirs(self.path)
+        self.max_entries = max_entries or config.INDICATOR_CACHE_SIZE
+        self.ttl = config.INDICATOR_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(inscode, adjusted_price, length):
+        return (inscode, 'adjusted_price' if adjusted_price else 'price', length)
+
+    def _file_path(self, key):
+        return path.join(self.path, '{}_{}_{}.pkl'.format(*key))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.path is not None and path.isfile(self._file_path(key)):
+            try:
+                with open(self._file_path(key), 'rb') as f:
+                    entry = pickle.load(f)
+            except Exception:
+                return
+            self._put(key, entry, save= False)
+            return entry
+
+    def _put(self, key, entry, save= True):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last= False)
+        if save and self.path is not None:
+            file_path = self._file_path(key)
+            temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(temp_path, file_path)
+
+    def fresh(self, inscode, adjusted_price, length):
+        """
+        Returns the entry of a symbol if it was downloaded less than ttl seconds ago, otherwise None.
+        """
+
+        entry = self._get(self.key(inscode, adjusted_price, length))
+        if entry is not None and time() - entry.fetched_at <= self.ttl:
+            return entry
+
+    def update(self, inscode, adjusted_price, length, price_df, client_df):
+        """
+        Stores downloaded histories. The indicators of the previous entry are kept if the histories did not change.
+        Indicator columns already in price_df, for example read from a HistoryStore, are cached with the entry.
+
+        Returns:
+            CacheEntry: The entry of the histories, or None if a history is missing.
+        """
+
+        if price_df is None or client_df is None:
+            return
+        groups = {}
+        for ind_name, ind_sets in inds_setting.indicators.items():
+            for ind_set in ind_sets:
+                columns = inds_setting.output_columns(ind_name, ind_set)
+                if all(column in price_df.columns for column in columns):
+                    groups[settings_hash({ind_name: [ind_set]})] = price_df[columns]
+        if len(groups) > 0:
+            price_df = price_df.drop(columns= [column for group in groups.values() for column in group.columns])
+        key = self.key(inscode, adjusted_price, length)
+        entry = self._get(key)
+        if entry is None or not entry.same_histories(price_df, client_df):
+            entry = CacheEntry(price_df, client_df)
+        else:
+            entry.fetched_at = time()
+        entry.groups.update(groups)
+        self._put(key, entry)
+        return entry
+
+    def combine(self, inscode, adjusted_price, length, entry, calc_inds= True, calc_client= True):
+        """
+        Joins the histories of an entry with the indicator columns, calculating only the columns
+        of the settings that are not in the entry yet.
+
+        Returns:
+            DataFrame: The combined history, like join_histories.
+        """
+
+        groups = {}
+        price_groups = []
+        client_groups = []
+        if calc_inds:
+            for ind_name, ind_sets in inds_setting.indicators.items():
+                for ind_set in ind_sets:
+                    settings = {ind_name: [ind_set]}
+                    settings_key = settings_hash(settings)
+                    group = entry.groups.get(settings_key)
+                    groups[settings_key] = group if group is not None else indicator_columns(entry.price_df, settings)
+                    price_groups.append(groups[settings_key])
+        if calc_client:
+            settings_key = _client_hash()
+            group = entry.groups.get(settings_key)
+            if group is None:
+                client_df = calculate_client_data(entry.client_df.copy())
+                group = client_df[client_df.columns.difference(entry.client_df.columns, sort= False)]
+            groups[settings_key] = group
+            client_groups.append(group)
+        if groups.keys() - entry.groups.keys():
+            current = _settings_hashes()
+            entry.groups = {key: group for key, group in {**entry.groups, **groups}.items() if key in current}
+            self._put(self.key(inscode, adjusted_price, length), entry)
+        price_df = pd.concat([entry.price_df] + price_groups, axis= 1)
+        client_df = pd.concat([entry.client_df] + client_groups, axis= 1)
+        return pd.concat([price_df, client_df], axis= 1, sort= True)
+
+    def clear(self):
+        """
+        Removes all entries from memory and disk.
+        """
+
+        with self._lock:
+            self._entries.clear()
+        if self.path is not None:
+            for file_name in os.listdir(self.path):
+                if file_name.endswith('.pkl'):
+                    os.remove(path.join(self.path, file_name))
@@ -2,6 +2,8 @@
 # It contains a dictionary named 'indicators' which outlines the calculation details
 # for each technical indicator used in the analysis.
 
+import re
+
 indicators = {
     "rsi": [
         {
@@ -211,3 +213,37 @@ def find_count(d):
         for value in values:
             max_value = maximum(value, max_value)
     return max_value + 100
+
+def output_columns(ind_name, ind_set):
+    """
+    Returns the flat list of columns added to the history DataFrame by an indicator set.
+
+    Parameters:
+        ind_name (str): The indicator name, a key of the indicators dictionary.
+        ind_set (dict): One setting of the indicator.
+
+    Returns:
+        list: The column names.
+    """
+
+    if ind_name == 'ichimoku':
+        return ind_set['columns'][0] + ind_set['columns'][1]
+    if ind_name in ['min', 'max']:
+        return [ind_set['columns'][0], "dis_from" + ind_set['columns'][0]]
+    return list(ind_set['columns'])
+
+def source_column(value):
+    """
+    Returns the column name of an argument that refers to a column of the history DataFrame.
+
+    Parameters:
+        value: An argument value of an indicator, for example "df['close']".
+
+    Returns:
+        str: The column name, or None if the value is not a column reference.
+    """
+
+    if not isinstance(value, str):
+        return
+    match = re.fullmatch(r"""\s*df\[\s*['"](\w+)['"]\s*\]\s*""", value)
+    return match.group(1) if match else None
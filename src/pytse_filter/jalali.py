@@ -0,0 +1,90 @@
+# This module converts Gregorian dates to Jalali dates for the pytse_filter project.
+# The Jalali date of every day of the years 1339 to 1439 (1960 to 2061) is computed once
+# from the lengths of the Jalali months and kept in lookup tables, so a whole column of
+# dates is converted with one subtraction and one indexing instead of one jdatetime
+# object per row. Dates outside the tables are converted with jdatetime.
+
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import jdatetime
+
+FIRST_YEAR = 1339
+LAST_YEAR = 1439
+
+@lru_cache(maxsize= None)
+def _tables():
+    """
+    Returns the first Gregorian day of the tables and the Jalali dates of all days as yyyymmdd integers and 'yyyy-mm-dd' strings.
+    """
+
+    start = np.datetime64(jdatetime.date(FIRST_YEAR, 1, 1).togregorian(), 'D')
+    parts = []
+    for year in range(FIRST_YEAR, LAST_YEAR + 1):
+        for month in range(1, 13):
+            if month <= 6:
+                days = 31
+            elif month <= 11:
+                days = 30
+            else:
+                days = 30 if jdatetime.date(year, 1, 1).isleap() else 29
+            parts.append(year * 10000 + month * 100 + np.arange(1, days + 1, dtype= 'int32'))
+    ints = np.concatenate(parts)
+    strings = np.array([f'{value // 10000}-{value // 100 % 100:02d}-{value % 100:02d}' for value in ints.tolist()], dtype= object)
+    return start, ints, strings
+
+def _positions(dates):
+    """
+    Returns the positions of dates in the tables, -1 for the dates outside the tables and for missing dates.
+    """
+
+    start, ints, _ = _tables()
+    days = pd.DatetimeIndex(dates).to_numpy().astype('datetime64[D]')
+    positions = (days - start).astype('int64')
+    outside = np.isnat(days) | (positions < 0) | (positions >= len(ints))
+    positions[outside] = -1
+    return days, positions
+
+def _fallback(days, positions, result, function):
+    """
+    Converts the dates outside the tables one by one with jdatetime.
+    """
+
+    for i in np.flatnonzero(positions < 0):
+        if not np.isnat(days[i]):
+            result[i] = function(jdatetime.date.fromgregorian(date= days[i].astype(object)))
+    return result
+
+def jalali_dates(dates):
+    """
+    Converts Gregorian dates to Jalali date strings.
+
+    Parameters:
+        dates (Series/DatetimeIndex/array): The Gregorian dates.
+
+    Returns:
+        numpy.ndarray: The Jalali dates as 'yyyy-mm-dd' strings, None for missing dates.
+    """
+
+    _, _, strings = _tables()
+    days, positions = _positions(dates)
+    result = strings.take(np.maximum(positions, 0))
+    result[positions < 0] = None
+    return _fallback(days, positions, result, lambda date: date.strftime('%Y-%m-%d'))
+
+def jalali_ints(dates):
+    """
+    Converts Gregorian dates to Jalali dates as yyyymmdd integers, for example 14020101.
+
+    Parameters:
+        dates (Series/DatetimeIndex/array): The Gregorian dates.
+
+    Returns:
+        numpy.ndarray: The Jalali dates as int32, 0 for missing dates.
+    """
+
+    _, ints, _ = _tables()
+    days, positions = _positions(dates)
+    result = ints.take(np.maximum(positions, 0))
+    result[positions < 0] = 0
+    return _fallback(days, positions, result, lambda date: date.year * 10000 + date.month * 100 + date.day)
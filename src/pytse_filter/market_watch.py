@@ -0,0 +1,238 @@
+# This module contains an incremental session for the MarketWatchPlus data of the pytse_filter project.
+# The whole board is downloaded once, after that the h (heven) and r (refid) parameters of the endpoint
+# are sent so tsetmc only returns the rows that changed since the previous request. The changes are
+# written in place into a persistent numpy snapshot and the calculated columns are updated only for
+# the rows that changed.
+
+import threading
+from time import time
+import numpy as np
+import pandas as pd
+from . import config
+from . import http_client
+from .download_realtime import (
+    PRICE_FIELDS, PRICE_COLUMNS, ORDER_BOOK_FIELDS, ORDER_BOOK_COLUMNS,
+    _parse_order_book, _parse_price_rows, _join_price, _add_calculated_columns
+)
+
+TEXT_COLUMNS = ['code', 'symbol', 'name']
+# The fields of the short rows of an incremental update.
+UPDATE_FIELDS = ['id', 'heven', 'pf', 'pc', 'pl', 'tno', 'tvol', 'tval', 'pmin', 'pmax']
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+def _split_fields(rows, fields):
+    """
+    Splits the few rows of an incremental section, where the fixed cost of the C parser
+    of _read_rows is larger than the cost of splitting them in Python.
+
+    Parameters:
+        rows (list): The rows, each row has its fields separated by ','.
+        fields (int): The number of fields, rows with another number of fields are skipped.
+
+    Returns:
+        tuple: The ids (first field) and a float64 array of the other fields.
+    """
+
+    rows = [row.split(',') for row in rows]
+    rows = [row for row in rows if len(row) == fields]
+    ids = [row[0] for row in rows]
+    values = np.array([[_to_float(value) for value in row[1:]] for row in rows], dtype= 'float64').reshape(len(rows), fields - 1)
+    return ids, values
+
+
+class MarketWatchSession:
+    """
+    This class keeps a snapshot of the MarketWatchPlus board and updates it with the incremental
+    protocol of tsetmc. The first call of update downloads the whole board, the next calls only
+    download and parse the rows that changed.
+    """
+
+    def __init__(self, url= None):
+        """
+        Parameters:
+            url (str): The url of MarketWatchPlus, config.PRICE_URL if None. It can point to a local
+                server that replays recorded payloads.
+        """
+
+        self.url = config.PRICE_URL if url is None else url
+        self.heven = 0
+        self.refid = 0
+        self.ids = None
+        self.text = None
+        self.columns = None
+        self.values = None
+        self.changed = pd.Index([])
+        self.payload_size = 0
+        self.fetched_at = None
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Forgets the snapshot, so the next update downloads the whole board again.
+        """
+
+        self.__init__(self.url)
+
+    def _fetch(self):
+        response = http_client.get(self.url, 'price', params= {'h': self.heven, 'r': self.refid})
+        self.payload_size = len(response.content)
+        self.fetched_at = time()
+        return response.text
+
+    def _load(self, sections):
+        """
+        Builds the snapshot from the sections of a payload of the whole board.
+        """
+
+        order_book = _parse_order_book(sections[3])
+        if len(order_book[0]) < 100 : return
+        price_df = _parse_price_rows(sections[2], price_columns= ['heven'] + PRICE_COLUMNS)
+        if price_df is None : return
+        self.heven = int(np.nanmax(price_df.pop('heven').to_numpy(), initial= self.heven))
+        df = _join_price(price_df, order_book)
+        self.ids = df.index
+        self.text = {column: df[column].to_numpy(dtype= object) for column in TEXT_COLUMNS}
+        self.columns = list(df.columns[len(TEXT_COLUMNS):])
+        self.values = df[self.columns].to_numpy(dtype= 'float64', copy= True)
+        self.changed = df.index
+        return df
+
+    def _positions(self, ids):
+        """
+        Returns the rows of the snapshot of ids, appending rows for the ids that are not in the snapshot.
+        """
+
+        positions = self.ids.get_indexer(ids)
+        new = pd.Index(ids[positions < 0], name= self.ids.name).unique()
+        if len(new) > 0:
+            self.ids = self.ids.append(new)
+            for column in TEXT_COLUMNS:
+                self.text[column] = np.concatenate([self.text[column], np.full(len(new), None, dtype= object)])
+            self.values = np.vstack([self.values, np.full((len(new), len(self.columns)), np.nan)])
+            positions = self.ids.get_indexer(ids)
+        return positions
+
+    @staticmethod
+    def _split_price_rows(section):
+        """
+        Separates the complete price rows of a section from the short rows of an incremental update.
+        """
+
+        full_rows, short_rows = [], []
+        for row in section.split(';'):
+            fields = row.count(',') + 1
+            if fields == len(PRICE_FIELDS):
+                full_rows.append(row)
+            elif fields == len(UPDATE_FIELDS):
+                short_rows.append(row)
+        return full_rows, short_rows
+
+    def _apply(self, full_rows, short_rows, order_book):
+        """
+        Writes the rows of an incremental payload into the snapshot.
+
+        Parameters:
+            full_rows (list): The complete price rows, of new symbols or of symbols sent again.
+            short_rows (list): The rows with the fields of UPDATE_FIELDS.
+            order_book (str): The order book section of the payload.
+
+        Returns:
+            numpy.ndarray: The rows of the snapshot that changed.
+        """
+
+        changed = []
+        if full_rows:
+            price_df = _parse_price_rows(';'.join(full_rows), min_rows= 0, price_columns= ['heven'] + PRICE_COLUMNS)
+            if price_df is not None and len(price_df) > 0:
+                self.heven = int(np.nanmax(price_df.pop('heven').to_numpy(), initial= self.heven))
+                positions = self._positions(price_df.index.to_numpy())
+                for column in TEXT_COLUMNS:
+                    self.text[column][positions] = price_df[column].to_numpy(dtype= object)
+                columns = [self.columns.index(column) for column in PRICE_COLUMNS]
+                self.values[positions[:, None], columns] = price_df[PRICE_COLUMNS].to_numpy(dtype= 'float64')
+                changed.append(positions)
+        if short_rows:
+            ids, rows = _split_fields(short_rows, len(UPDATE_FIELDS))
+            positions = self.ids.get_indexer(ids)
+            known = positions >= 0
+            self.heven = int(np.nanmax(rows[:, 0], initial= self.heven))
+            columns = [self.columns.index(column) for column in UPDATE_FIELDS[2:]]
+            self.values[positions[known, None], columns] = rows[known, 1:]
+            changed.append(positions[known])
+        if len(order_book) > 0:
+            ids, rows = _split_fields(order_book.split(';'), 2 + len(ORDER_BOOK_FIELDS))
+            positions = self.ids.get_indexer(ids)
+            depth = rows[:, 0]
+            valid = (positions >= 0) & (depth >= 1) & (depth <= 5)
+            first = self.columns.index(ORDER_BOOK_COLUMNS[0])
+            columns = first + (depth[valid].astype('int64')[:, None] - 1) * len(ORDER_BOOK_FIELDS) + np.arange(len(ORDER_BOOK_FIELDS))
+            self.values[positions[valid, None], columns] = rows[valid, 1:]
+            changed.append(positions[valid])
+        return np.unique(np.concatenate(changed)) if changed else np.array([], dtype= 'int64')
+
+    def _recalculate(self, rows):
+        """
+        Updates the calculated columns of the rows of the snapshot.
+        """
+
+        data = {column: self.values[rows, j] for j, column in enumerate(self.columns)}
+        with np.errstate(divide= 'ignore', invalid= 'ignore'):
+            data = _add_calculated_columns(data)
+        for j, column in enumerate(self.columns):
+            if column not in PRICE_COLUMNS and column not in ORDER_BOOK_COLUMNS:
+                self.values[rows, j] = data[column]
+
+    def frame(self):
+        """
+        Returns the snapshot as a data frame with the columns of get_price.
+        """
+
+        if self.values is None:
+            return
+        text = pd.DataFrame(self.text, index= self.ids)
+        values = pd.DataFrame(self.values.copy(), index= self.ids, columns= self.columns)
+        return pd.concat([text, values], axis= 1)
+
+    def update(self):
+        """
+        Downloads the changes of the board since the previous call and applies them to the snapshot.
+        The whole board is downloaded on the first call, or when the server sends the whole board again.
+        The ids of the rows that changed are stored in the changed attribute.
+
+        Returns:
+            df (pd.DataFrame): The snapshot with the same columns as get_price, or None if the download failed.
+        """
+
+        with self._lock:
+            try:
+                datas = self._fetch()
+            except:
+                return
+            sections = datas.split('@')
+            if len(sections) < 5 : return
+            full_rows, short_rows = self._split_price_rows(sections[2])
+            if self.values is None or len(full_rows) >= 100:
+                if self._load(sections) is None : return
+            else:
+                rows = self._apply(full_rows, short_rows, sections[3])
+                self.changed = self.ids[rows]
+                if len(rows) > 0:
+                    self._recalculate(rows)
+                elif self._frame is not None:
+                    self.refid = self._refid(sections[-1])
+                    return self._frame
+            self.refid = self._refid(sections[-1])
+            self._frame = self.frame()
+            return self._frame
+
+    def _refid(self, text):
+        try:
+            return int(text.strip())
+        except ValueError:
+            return self.refid
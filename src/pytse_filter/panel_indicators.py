@@ -0,0 +1,63 @@
+# This module contains a vectorized engine that calculates the indicators of many symbols
+# together for the pytse_filter project. The histories of all symbols are stacked into
+# 2-D numpy panels (bars x symbols) and the incremental indicator engine is seeded
+# from the whole panel at once.
+
+import numpy as np
+import pandas as pd
+from . import inds_setting
+from .incremental_indicators import IndicatorEngine
+
+def build_panel(frames, columns):
+    """
+    Stacks the histories of many symbols into aligned 2-D arrays.
+    Histories are aligned on their last bar, shorter histories are padded with NaN at
+    the top, so every symbol keeps its own sequence of trading days.
+
+    Parameters:
+        frames (dict): Symbol to price history DataFrame sorted by date.
+        columns (list): The columns to stack.
+
+    Returns:
+        dict: Column name to numpy array of shape (bars, symbols).
+    """
+
+    length = max((len(df) for df in frames.values()), default= 0)
+    panel = {column: np.full((length, len(frames)), np.nan) for column in columns}
+    for j, df in enumerate(frames.values()):
+        for column in columns:
+            panel[column][length - len(df):, j] = df[column].to_numpy(dtype= 'float64')
+    return panel
+
+def calculate_panel_indicators(frames, indicators= None):
+    """
+    Calculates the indicators of many symbols in one vectorized pass.
+    The result of each symbol has the same columns as calculate_indicators, the indicators
+    without an incremental state are calculated for each symbol with calculate_indicators.
+
+    Parameters:
+        frames (dict): Symbol to price history DataFrame sorted by date.
+        indicators (dict): The indicator settings, inds_setting.indicators if None.
+
+    Returns:
+        dict: Symbol to DataFrame with additional columns for each indicator calculated.
+    """
+
+    indicators = inds_setting.indicators if indicators is None else indicators
+    if len(frames) == 0:
+        return {}
+    engine = IndicatorEngine(size= len(frames), indicators= indicators)
+    columns = sorted({column for state in engine.states for column in state.inputs})
+    panel = build_panel(frames, columns)
+    length = max(len(df) for df in frames.values())
+    values = engine.seed(panel)
+    for ind_set in indicators.get('ichimoku', []):
+        future_columns = [engine.columns.index(column) for column in ind_set['columns'][1]]
+        values[:max(length - ind_set['args']['kijun'], 0), future_columns] = np.nan
+    result = {}
+    for j, (symbol, df) in enumerate(frames.items()):
+        inds_df = pd.DataFrame(values[length - len(df):, :, j], index= df.index, columns= engine.columns)
+        if len(engine.fallback) > 0:
+            inds_df = pd.concat([inds_df, engine.fallback_columns(df)], axis= 1)[engine.output_columns]
+        result[symbol] = pd.concat([df, inds_df], axis= 1)
+    return result
@@ -0,0 +1,131 @@
+# This module contains the compute stage of the summary pipeline of the pytse_filter project.
+# The indicators of many downloaded histories are calculated with calculate_indicators in a
+# pool of processes. The columns used by the indicators of all symbols are stacked into one
+# 2-D array in shared memory and the workers write the indicators into a second shared array,
+# so only the settings and the positions of the symbols are sent to the processes.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from . import config
+from . import inds_setting
+from .calculate_indicators import indicator_columns
+
+def input_columns(indicators):
+    """
+    Returns the columns of the history used by the indicators.
+
+    Parameters:
+        indicators (dict): The indicator settings.
+
+    Returns:
+        list: The column names, always including 'close'.
+    """
+
+    columns = {'close'}
+    for ind_sets in indicators.values():
+        for ind_set in ind_sets:
+            columns.update(
+                column for column in map(inds_setting.source_column, ind_set['args'].values()) if column is not None
+            )
+    return sorted(columns)
+
+def _attach(name, shape):
+    """
+    Returns a shared memory block and a float64 array of the given shape on it.
+    """
+
+    block = shared_memory.SharedMemory(name= name)
+    return block, np.ndarray(shape, dtype= 'float64', buffer= block.buf)
+
+def _calculate_chunk(indicators, columns, inputs, outputs, chunk):
+    """
+    Calculates the indicators of a chunk of histories in a worker process.
+
+    Parameters:
+        indicators (dict): The indicator settings of the parent process.
+        columns (list): The columns of the input array.
+        inputs (tuple): The name and shape of the shared (bars x columns) array of all histories.
+        outputs (tuple): The name and shape of the shared (bars x indicator columns) array of the results.
+        chunk (list): The first and last row of each history of the chunk in the shared arrays.
+
+    Returns:
+        int: Number of calculated histories.
+    """
+
+    inds_setting.indicators = indicators
+    input_block, values = _attach(*inputs)
+    output_block, results = _attach(*outputs)
+    try:
+        for start, stop in chunk:
+            df = pd.DataFrame(values[start:stop], columns= columns)
+            results[start:stop] = indicator_columns(df).to_numpy(dtype= 'float64')
+    finally:
+        # The arrays must be released before their blocks are closed.
+        values = results = None
+        input_block.close()
+        output_block.close()
+    return len(chunk)
+
+def calculate_parallel_indicators(frames, processes= None, chunks_per_process= 4):
+    """
+    Calculates the indicators of many symbols with calculate_indicators in a pool of processes.
+    On platforms that start processes with spawn, such as Windows, the calling script must be
+    protected by "if __name__ == '__main__':".
+
+    Parameters:
+        frames (dict): Symbol to price history DataFrame sorted by date.
+        processes (int): Number of worker processes, config.COMPUTE_PROCESSES or the number of cores if None.
+        chunks_per_process (int): Number of chunks of symbols sent to each process, to balance the work.
+
+    Returns:
+        dict: Symbol to DataFrame of the indicator columns, indexed like the history.
+    """
+
+    processes = processes or config.COMPUTE_PROCESSES or os.cpu_count() or 1
+    indicators = inds_setting.indicators
+    columns = input_columns(indicators)
+    new_columns = [
+        column
+        for ind_name, ind_sets in indicators.items()
+        for ind_set in ind_sets
+        for column in inds_setting.output_columns(ind_name, ind_set)
+    ]
+    result = {}
+    if len(frames) == 0:
+        return result
+    stops = np.cumsum([len(df) for df in frames.values()]).tolist()
+    ranges = list(zip([0] + stops[:-1], stops))
+    size = max(1, -(-len(ranges) // (processes * chunks_per_process)))
+    chunks = [ranges[i:i + size] for i in range(0, len(ranges), size)]
+    inputs = (stops[-1], len(columns))
+    outputs = (stops[-1], len(new_columns))
+    # A shared memory block can not be empty.
+    input_block = shared_memory.SharedMemory(create= True, size= max(1, 8 * inputs[0] * inputs[1]))
+    output_block = shared_memory.SharedMemory(create= True, size= max(1, 8 * outputs[0] * outputs[1]))
+    values = results = None
+    try:
+        values = np.ndarray(inputs, dtype= 'float64', buffer= input_block.buf)
+        for (start, stop), df in zip(ranges, frames.values()):
+            values[start:stop] = df[columns].to_numpy(dtype= 'float64', na_value= np.nan)
+        with ProcessPoolExecutor(max_workers= min(processes, len(chunks))) as executor:
+            list(executor.map(
+                _calculate_chunk,
+                [indicators] * len(chunks),
+                [columns] * len(chunks),
+                [(input_block.name, inputs)] * len(chunks),
+                [(output_block.name, outputs)] * len(chunks),
+                chunks
+            ))
+        results = np.ndarray(outputs, dtype= 'float64', buffer= output_block.buf)
+        for (start, stop), (symbol, df) in zip(ranges, frames.items()):
+            result[symbol] = pd.DataFrame(results[start:stop].copy(), index= df.index, columns= new_columns)
+    finally:
+        values = results = None
+        input_block.close()
+        input_block.unlink()
+        output_block.close()
+        output_block.unlink()
+    return result
@@ -0,0 +1,222 @@
+# This module contains a polling service for real time data of the pytse_filter project.
+# It downloads snapshots at a fixed cadence, compares each snapshot with the previous one
+# and emits per-symbol deltas and condition enter/exit events to registered callbacks
+# or to an async iterator.
+
+import asyncio
+import threading
+from time import monotonic
+import pandas as pd
+from .realtime import RealTime, RealTimeCondition
+from .download_realtime import same_snapshot
+from .condition_compiler import evaluate_conditions
+from .snapshot_buffer import SnapshotBuffer
+
+class PollEvent:
+    """
+    An event emitted by the RealTimePoller.
+
+    Attributes:
+        kind (str): 'snapshot', 'delta', 'enter' or 'exit'.
+        name (str): The name of the condition for 'enter' and 'exit' events, otherwise None.
+        data (pd.DataFrame): The rows of the symbols concerned by the event.
+        delta (pd.DataFrame): For 'delta' events, the change of the numeric columns since the previous snapshot.
+    """
+
+    def __init__(self, kind, data, name= None, delta= None):
+        self.kind = kind
+        self.data = data
+        self.name = name
+        self.delta = delta
+
+    def __repr__(self):
+        name = '' if self.name is None else f' {self.name}'
+        return f'<PollEvent {self.kind}{name}: {len(self.data)} symbols>'
+
+
+class RealTimePoller:
+    """
+    This class polls the real time data at a fixed cadence. For each new snapshot only the rows that changed
+    since the previous snapshot are processed: their deltas are emitted and the conditions are evaluated on them
+    to find the symbols that start ('enter') or stop ('exit') matching each condition.
+    """
+
+    kinds = ('snapshot', 'delta', 'enter', 'exit')
+
+    def __init__(self, interval= 10, conditions= None, market= None):
+        """
+        Parameters:
+            interval (float): The time between two polls in seconds.
+            conditions (dict): Names to RealTimeCondition objects or raw texts of conditions.
+            market (RealTime): The object used to download the data, a new RealTime object if None. An AsyncRealTime object can be used with stream.
+        """
+
+        self.interval = interval
+        self.market = RealTime() if market is None else market
+        self.conditions = {}
+        self.matches = {}
+        self.previous = None
+        self.callbacks = {kind: [] for kind in self.kinds}
+        self._stop = threading.Event()
+        self._thread = None
+        for name, condition in (conditions or {}).items():
+            self.add_condition(name, condition)
+
+    def add_condition(self, name, condition):
+        """
+        Adds a condition whose enter and exit events are emitted.
+
+        Parameters:
+            name (str): The name of the condition.
+            condition (RealTimeCondition/str): The condition object or the raw text of the condition.
+                A snapshot buffer is added to the market if the condition uses windowed operators and the market has none.
+        """
+
+        if isinstance(condition, str):
+            condition = RealTimeCondition(condition)
+        if condition.compiled.windowed and self.market.buffer is None:
+            self.market.buffer = SnapshotBuffer()
+        self.conditions[name] = condition
+        self.matches[name] = pd.Index([])
+
+    def on(self, kind, callback):
+        """
+        Registers a callback that is called with a PollEvent for each event of a kind.
+
+        Parameters:
+            kind (str): 'snapshot', 'delta', 'enter' or 'exit'.
+            callback (callable): The function to call.
+        """
+
+        if kind not in self.callbacks:
+            raise ValueError(f'The event kind must be one of {self.kinds}.')
+        self.callbacks[kind].append(callback)
+
+    def _changed_rows(self, df):
+        """
+        Returns the index of the rows of df that are new or differ from the previous snapshot.
+        """
+
+        if self.previous is None:
+            return df.index
+        if same_snapshot(df, self.previous):
+            return df.index[:0]
+        previous = self.previous.reindex(df.index)
+        current = df.to_numpy(dtype= object)
+        old = previous.to_numpy(dtype= object)
+        same = (current == old) | (pd.isna(current) & pd.isna(old))
+        return df.index[~same.all(axis= 1)]
+
+    def poll(self):
+        """
+        Downloads one snapshot and returns its events. The callbacks are called for each event.
+
+        Returns:
+            list: The PollEvent objects of the snapshot, empty if the download failed.
+        """
+
+        self.market.download()
+        return self._process(self.market.datas)
+
+    def _process(self, df):
+        """
+        Returns the events of a downloaded snapshot and calls the callbacks for each event.
+        """
+
+        if df is None:
+            return []
+        events = [PollEvent('snapshot', df)]
+        changed = self._changed_rows(df)
+        changed_df = df.loc[changed]
+        if self.previous is not None and len(changed) > 0:
+            numeric = df.select_dtypes('number').columns
+            previous = self.previous.reindex(changed)[numeric]
+            events.append(PollEvent('delta', changed_df, delta= changed_df[numeric] - previous))
+        removed = pd.Index([]) if self.previous is None else self.previous.index.difference(df.index)
+        if len(self.conditions) > 0:
+            # The windowed values of a symbol change with time even if its row did not, so windowed conditions are evaluated on all rows.
+            windowed = any(condition.compiled.windowed for condition in self.conditions.values())
+            rows = df.index if windowed else changed
+            membership = evaluate_conditions(
+                df if windowed else changed_df, {name: c.compiled for name, c in self.conditions.items()}, buffer= self.market.buffer
+            )
+            for name in self.conditions:
+                matches = self.matches[name]
+                mask = membership[name].to_numpy()
+                entered = rows[mask].difference(matches)
+                exited = rows[~mask].intersection(matches).union(removed.intersection(matches))
+                self.matches[name] = matches.difference(exited).union(entered)
+                if len(entered) > 0:
+                    events.append(PollEvent('enter', df.loc[entered], name= name))
+                if len(exited) > 0:
+                    exited_df = pd.concat([df.loc[exited.intersection(df.index)], self.previous.loc[exited.difference(df.index)]])
+                    events.append(PollEvent('exit', exited_df, name= name))
+        self.previous = df
+        for event in events:
+            for callback in self.callbacks[event.kind]:
+                callback(event)
+        return events
+
+    def run(self, max_polls= None):
+        """
+        Polls at a fixed cadence until stop is called or max_polls snapshots were polled.
+        The time of each poll is scheduled from the start of the previous one, the poller
+        sleeps between polls instead of busy waiting.
+
+        Parameters:
+            max_polls (int): The number of polls, unlimited if None.
+        """
+
+        self._stop.clear()
+        polls = 0
+        next_time = monotonic()
+        while not self._stop.is_set() and (max_polls is None or polls < max_polls):
+            self.poll()
+            polls += 1
+            next_time += self.interval
+            self._stop.wait(max(0, next_time - monotonic()))
+
+    def start(self):
+        """
+        Starts polling in a background thread.
+        """
+
+        self._thread = threading.Thread(target= self.run, daemon= True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops polling.
+        """
+
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    async def stream(self, max_polls= None):
+        """
+        An async iterator over the events of the snapshots polled at a fixed cadence.
+        If the market is an AsyncRealTime object the downloads run in the event loop,
+        otherwise they run in the default executor of the event loop.
+
+        Parameters:
+            max_polls (int): The number of polls, unlimited if None.
+
+        Yields:
+            PollEvent: The events of each snapshot.
+        """
+
+        loop = asyncio.get_running_loop()
+        polls = 0
+        next_time = loop.time()
+        while max_polls is None or polls < max_polls:
+            if asyncio.iscoroutinefunction(self.market.download):
+                await self.market.download()
+                events = self._process(self.market.datas)
+            else:
+                events = await loop.run_in_executor(None, self.poll)
+            for event in events:
+                yield event
+            polls += 1
+            next_time += self.interval
+            await asyncio.sleep(max(0, next_time - loop.time()))
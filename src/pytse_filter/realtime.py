@@ -2,13 +2,15 @@
 # for the pytse_filter project.
 
 from . import config
-from .download_realtime import combine_realtime
-import re
+from .condition_compiler import compile_condition, evaluate_conditions
+from .download_realtime import combine_realtime, compact_realtime, snapshot_age, same_snapshot
+from .market_watch import MarketWatchSession
+from .snapshot_buffer import SnapshotBuffer
 import pandas as pd
 
 class RealTimeCondition:
     """
-    This class represents a condition that the user has for filtering the stock data. It has attributes for the raw text of the condition, the file path of the condition, the last error occurred, and the converted Python code of the condition.
+    This class represents a condition that the user has for filtering the stock data. It has attributes for the raw text of the condition, the file path of the condition, the last error occurred, and the compiled condition.
     """
 
     def __init__(self, rau_text= None, file_path= None):
@@ -21,7 +23,7 @@ class RealTimeCondition:
         """     
 
         self.rau_text = rau_text
-        self.py_code = None
+        self.compiled = None
         if not file_path is None:
             with open(file_path, 'r') as f:
                 self.rau_text = f.read()
@@ -54,24 +56,14 @@ class RealTimeCondition:
 
     def convert(self):
         """
-        This method converts the raw text of the condition to a valid Python code that can be applied to a pandas data frame. It uses the config.CONVERT_DICT to replace the custom syntax with the corresponding pandas syntax. It stores the converted code in the py_code attribute.
+        This method compiles the raw text of the condition to a vectorized evaluator that can be applied to a pandas data frame. The condition may use the columns in config.REALTIME_COLUMNS and the windowed operators delta, roc, prev, sum, avg, min and max, for example 'delta(buy_i_value, 5m) > 1e10' or 'avg(power, 10 polls) > 2', which need a RealTime object with a snapshot buffer. It stores the compiled condition in the compiled attribute.
         """
 
-        rau_text = self.rau_text
-        for key, value in config.REALTIME_CONVERT_DICT.items():
-            pattern = r"\b" + key + r"\b"
-            rau_text = re.sub(pattern, value, rau_text)
-        parts = re.split(r'\b(and|or)\b', rau_text)
-        parts = map(lambda x: x.strip(), parts)
-        change_dict = {'and': ' & ', 'or': ' | '}
-        self.py_code = ''
-        for part in parts:
-            self.py_code += f'({part})' if ( part != 'and' and part != 'or' ) else change_dict[part]
-        self.py_code = f'.loc[({self.py_code})]'
+        self.compiled = compile_condition(self.rau_text, config.REALTIME_COLUMNS, windows= True)
 
     def is_valid(self):
         """
-        Validates the condition by attempting to execute the generated Python code.
+        Validates the condition by compiling it and evaluating it on a dummy DataFrame.
 
         Returns:
             bool: True if the condition is valid, False otherwise.
@@ -79,7 +71,11 @@ class RealTimeCondition:
 
         self.convert()
         df = config.REALTIME_CHECK_DF
-        df = eval(f'df{self.py_code}')
+        buffer = None
+        if self.compiled.windowed:
+            buffer = SnapshotBuffer(1)
+            buffer.append(df, timestamp= 0)
+        self.compiled.evaluate(df, buffer= buffer)
         return True
 
     def __str__(self):
@@ -98,28 +94,62 @@ class RealTime:
     This class represents a market that contains the stock data and the condition for filtering the data. It has attributes for the condition, the data frame of all the stocks, and the data frame of the filtered stocks.
     """
 
-    def __init__(self, condition= None):
+    def __init__(self, condition= None, delta_updates= False, compact= False, buffer_size= None, buffer_fields= None):
         """
         This method initializes a Market object with the given condition.
 
         Parameters:
             conditions (Condition): The condition object for filtering the stock data.
+            delta_updates (bool): Whether to download only the price rows that changed since the previous download. Default is False.
+            compact (bool): Whether to store the data with the compact dtypes of config.REALTIME_COMPACT_DTYPES. Default is False.
+            buffer_size (int): The number of last snapshots kept in the buffer attribute, no buffer if None. Default is None.
+            buffer_fields (list): The columns kept in the buffer, all numeric columns if None. Default is None.
         """
 
         self.condition = condition
         self.datas = None
         self.filtered_symbols = None
         self.download_status = False
+        self.price_session = MarketWatchSession() if delta_updates else None
+        self.compact = compact
+        self._source = None
+        self.buffer = SnapshotBuffer(buffer_size, fields= buffer_fields) if buffer_size else None
     
     def download(self):
         """
         This method loads the stock data from the web source and stores it in the datas attribute as a pandas data frame. 
         """
 
-        self.datas = combine_realtime()
+        self._set_datas(combine_realtime(price_session= self.price_session))
+
+    def _set_datas(self, df):
+        """
+        Stores a downloaded data frame in the datas attribute, converted to compact dtypes if requested,
+        and appends it to the snapshot buffer. A snapshot that did not change since the previous
+        download is neither converted nor appended again.
+        """
+
+        if df is not None and not same_snapshot(df, self._source):
+            self._source = df
+            if self.buffer is not None:
+                self.buffer.append(df)
+            if self.compact:
+                self._compact = compact_realtime(df)
+        if self.compact and df is not None:
+            self._compact.attrs = dict(df.attrs)
+            df = self._compact
+        self.datas = df
         if not self.datas is None:
             self.download_status = True
         
+    @property
+    def snapshot_age(self):
+        """
+        The age in seconds of the downloaded data, measured from the older of the price and client downloads, or None if nothing was downloaded.
+        """
+
+        return snapshot_age(self.datas)
+
     def get_all_stocks_data(self, update_data = True):
         """
         This method returns the data frame of all the stocks. It optionally updates the data from the web source before returning it.
@@ -166,7 +196,7 @@ class RealTime:
         df = self.datas
         if df is None :
             return pd.DataFrame()
-        df = eval(f'df{self.condition.py_code}')
+        df = df.loc[self.condition.compiled.evaluate(df, buffer= self.buffer)]
         self.filtered_symbols = df[df['symbol'].notnull()]
         return self.filtered_symbols
 
@@ -186,6 +216,46 @@ class RealTime:
         self.filtered_symbols = self.filter_by_obj_condition()
         return self.filtered_symbols
 
+    def membership(self, conditions, update_data= True):
+        """
+        This method evaluates a named set of conditions on the stock data in one pass. Sub-expressions shared by the conditions are computed once. It optionally updates the data from the web source before evaluating.
+
+        Parameters:
+            conditions (dict): Names to RealTimeCondition objects or raw texts of conditions.
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            membership (pd.DataFrame): A boolean data frame with one row per stock and one column per condition.
+        """
+
+        compiled = {
+            name: (RealTimeCondition(condition) if isinstance(condition, str) else condition).compiled
+            for name, condition in conditions.items()
+        }
+        if update_data:
+            self.download()
+        df = self.datas
+        if df is None:
+            return pd.DataFrame(columns= list(conditions), dtype= bool)
+        return evaluate_conditions(df, compiled, buffer= self.buffer)
+
+    def filter_by_conditions(self, conditions, update_data= True):
+        """
+        This method filters the stock data by a named set of conditions in one pass, see the membership method.
+
+        Parameters:
+            conditions (dict): Names to RealTimeCondition objects or raw texts of conditions.
+            update_data (bool): Whether to update the data from the web source or not. Default is True.
+
+        Returns:
+            filtered (dict): Names of the conditions to the data frames of the filtered stocks.
+        """
+
+        membership = self.membership(conditions, update_data= update_data)
+        if self.datas is None:
+            return {name: pd.DataFrame() for name in conditions}
+        return {name: self.datas.loc[membership[name].to_numpy()] for name in conditions}
+
     def __str__(self):
         """
         This method returns the string representation of the Market object, which is the string representation of the data frame of all the stocks.
@@ -0,0 +1,203 @@
+# This module contains a ring buffer of intraday realtime snapshots for the pytse_filter project.
+# The numeric columns of the last snapshots are kept in one preallocated (time x symbol x field)
+# numpy array, so a snapshot is appended without copying the previous ones and window features
+# such as deltas, rolling sums and rates of change are computed for all symbols at once.
+
+from time import time
+import numpy as np
+import pandas as pd
+from . import config
+
+class SnapshotBuffer:
+    """
+    A fixed capacity ring buffer of realtime snapshots. When the buffer is full the oldest snapshot is overwritten.
+
+    A window is selected either by a number of polls or by a number of seconds:
+    delta and rate_of_change compare the last snapshot with the snapshot 'polls' polls before it, or with the
+    oldest snapshot of the last 'seconds' seconds; the aggregations (sum, mean, max, min) use the last 'polls'
+    snapshots, or the snapshots of the last 'seconds' seconds.
+    """
+
+    def __init__(self, capacity= 120, fields= None, dtype= 'float32'):
+        """
+        Parameters:
+            capacity (int): The number of snapshots kept.
+            fields (list): The columns kept, the numeric columns of config.REALTIME_COLUMNS if None.
+            dtype (str): The dtype of the stored values. With the default fields, 120 snapshots of 700 symbols use about 25 MB in float32.
+        """
+
+        self.capacity = capacity
+        self.fields = list(fields) if fields is not None else [
+            column for column in config.REALTIME_COLUMNS if column not in ('code', 'symbol', 'name')
+        ]
+        self.dtype = np.dtype(dtype)
+        self.field_positions = {field: i for i, field in enumerate(self.fields)}
+        self.ids = pd.Index([], name= 'id')
+        self.values = np.full((capacity, 0, len(self.fields)), np.nan, dtype= self.dtype)
+        self.times = np.full(capacity, np.nan)
+        self.count = 0
+        self.head = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        """
+        Removes all the snapshots.
+        """
+
+        self.values[:] = np.nan
+        self.times[:] = np.nan
+        self.count = 0
+        self.head = 0
+
+    def _positions(self, ids):
+        """
+        Returns the positions of ids on the symbol axis, growing the axis for new ids.
+        """
+
+        positions = self.ids.get_indexer(ids)
+        new = pd.Index(ids[positions < 0], name= 'id').unique()
+        if len(new) > 0:
+            size = len(self.ids) + len(new)
+            if size > self.values.shape[1]:
+                values = np.full((self.capacity, max(size, 2 * self.values.shape[1]), len(self.fields)), np.nan, dtype= self.dtype)
+                values[:, :self.values.shape[1]] = self.values
+                self.values = values
+            self.ids = self.ids.append(new)
+            positions = self.ids.get_indexer(ids)
+        return positions
+
+    def append(self, df, timestamp= None):
+        """
+        Appends a snapshot.
+
+        Parameters:
+            df (pd.DataFrame): A snapshot returned by combine_realtime, indexed by id.
+            timestamp (float): The time of the snapshot, df.attrs['snapshot_time'] or the current time if None.
+        """
+
+        if timestamp is None:
+            timestamp = df.attrs.get('snapshot_time') or time()
+        positions = self._positions(df.index.to_numpy())
+        fields = [field for field in self.fields if field in df.columns]
+        slot = self.head
+        self.values[slot] = np.nan
+        self.values[slot, positions[:, None], [self.field_positions[field] for field in fields]] = (
+            df[fields].to_numpy(dtype= 'float64', na_value= np.nan)
+        )
+        self.times[slot] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.count += 1
+
+    def _slots(self, polls= None, seconds= None, lag= False):
+        """
+        Returns the slots of a window in chronological order.
+
+        Parameters:
+            polls (int): The size of the window in polls.
+            seconds (float): The size of the window in seconds, used if polls is None.
+            lag (bool): Whether the window is used to compare with the snapshot 'polls' polls before the last one.
+        """
+
+        size = len(self)
+        if size == 0:
+            raise ValueError('The buffer is empty.')
+        order = (self.head - size + np.arange(size)) % self.capacity
+        if polls is not None:
+            polls = polls + 1 if lag else polls
+            if polls > size:
+                raise ValueError(f'The buffer has {size} snapshots, a window of {polls} snapshots was requested.')
+            return order[size - polls:]
+        if seconds is not None:
+            times = self.times[order]
+            return order[times >= times[-1] - seconds]
+        return order
+
+    def _series(self, values):
+        return pd.Series(values, index= self.ids, dtype= 'float64')
+
+    def window(self, field, polls= None, seconds= None):
+        """
+        Returns the values of a field in a window.
+
+        Parameters:
+            field (str): The column.
+            polls (int): The number of last snapshots, all snapshots if polls and seconds are None.
+            seconds (float): The number of last seconds.
+
+        Returns:
+            pd.DataFrame: One row per snapshot indexed by the time of the snapshot and one column per id.
+        """
+
+        slots = self._slots(polls, seconds)
+        values = self.values[slots, :len(self.ids), self.field_positions[field]]
+        return pd.DataFrame(values, index= pd.to_datetime(self.times[slots], unit= 's'), columns= self.ids)
+
+    def _values(self, field, polls, seconds, lag= False):
+        slots = self._slots(polls, seconds, lag= lag)
+        return self.values[slots, :len(self.ids), self.field_positions[field]].astype('float64')
+
+    def latest(self, field):
+        """
+        Returns the values of a field in the last snapshot.
+        """
+
+        return self._series(self._values(field, 1, None)[-1])
+
+    def previous(self, field, polls= 1):
+        """
+        Returns the values of a field 'polls' polls before the last snapshot.
+        """
+
+        return self._series(self._values(field, polls, None, lag= True)[0])
+
+    def delta(self, field, polls= 1, seconds= None):
+        """
+        Returns the change of a field from the start of the window to the last snapshot.
+        """
+
+        values = self._values(field, None if seconds is not None else polls, seconds, lag= True)
+        return self._series(values[-1] - values[0])
+
+    def rate_of_change(self, field, polls= 1, seconds= None):
+        """
+        Returns the change of a field from the start of the window to the last snapshot in percent.
+        """
+
+        values = self._values(field, None if seconds is not None else polls, seconds, lag= True)
+        with np.errstate(divide= 'ignore', invalid= 'ignore'):
+            return self._series(100 * (values[-1] - values[0]) / values[0])
+
+    def sum(self, field, polls= None, seconds= None):
+        """
+        Returns the sum of a field over the window, missing values are ignored.
+        """
+
+        return self._series(np.nansum(self._values(field, polls, seconds), axis= 0))
+
+    def mean(self, field, polls= None, seconds= None):
+        """
+        Returns the mean of a field over the window, missing values are ignored.
+        """
+
+        with np.errstate(invalid= 'ignore', divide= 'ignore'):
+            values = self._values(field, polls, seconds)
+            counts = np.sum(~np.isnan(values), axis= 0)
+            return self._series(np.where(counts > 0, np.nansum(values, axis= 0) / np.maximum(counts, 1), np.nan))
+
+    def max(self, field, polls= None, seconds= None):
+        """
+        Returns the maximum of a field over the window, missing values are ignored.
+        """
+
+        values = self._values(field, polls, seconds)
+        return self._series(np.where(np.isnan(values).all(axis= 0), np.nan, np.nanmax(np.where(np.isnan(values), -np.inf, values), axis= 0)))
+
+    def min(self, field, polls= None, seconds= None):
+        """
+        Returns the minimum of a field over the window, missing values are ignored.
+        """
+
+        values = self._values(field, polls, seconds)
+        return self._series(np.where(np.isnan(values).all(axis= 0), np.nan, np.nanmin(np.where(np.isnan(values), np.inf, values), axis= 0)))
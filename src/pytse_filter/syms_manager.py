@@ -1,25 +1,155 @@
 # This module is responsible for managing the symbols and their corresponding codes (inscodes)
 # for the Tehran stock market. It provides functionality to convert between a symbol and its inscode.
 import json
+import os
+import threading
+from time import monotonic
 from . import config
 from .download_realtime import get_price
-import requests
+from . import http_client
 import pandas as pd
 from os import path
 
+_PERSIAN_LETTERS = str.maketrans({chr(1610): 'ی', chr(1603): 'ک'})
+
+def normalize_symbol(symbol):
+    """
+    Replaces the Arabic 'ي' and 'ك' of a symbol with the Persian 'ی' and 'ک'.
+
+    Parameters:
+        symbol (str): The stock symbol.
+
+    Returns:
+        str: The normalized symbol.
+    """
+
+    return symbol.translate(_PERSIAN_LETTERS)
+
+
+class SymbolRegistry:
+    """
+    An in-memory index of the symbols and their inscodes.
+    The json file is read once, when the index is first used, and read again only
+    if the modification time of the file changes. The modification time is checked at
+    most once every check_interval seconds. The index of the normalized symbols and the
+    reversed dictionary are computed once per read, so each lookup is a dictionary access.
+    """
+
+    def __init__(self, file_path, check_interval= 1.0):
+        """
+        Parameters:
+            file_path (str): The path of the json file of symbols and inscodes.
+            check_interval (float): The minimum number of seconds between two checks of the modification time.
+        """
+
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self._mtime = None
+        self._checked = None
+        self._symbols = {}
+        self._index = {}
+        self._inscodes = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """
+        Reads the json file if it was never read or if it changed since the last read.
+        """
+
+        now = monotonic()
+        if self._mtime is not None and now - self._checked < self.check_interval:
+            return
+        mtime = os.stat(self.file_path).st_mtime_ns
+        self._checked = now
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                symbols = json.load(f)
+            self._symbols = symbols
+            self._index = {normalize_symbol(symbol): inscode for symbol, inscode in symbols.items()}
+            self._inscodes = {inscode: symbol for symbol, inscode in symbols.items()}
+            self._mtime = mtime
+
+    def reload(self):
+        """
+        Forces the json file to be read again on the next lookup.
+        """
+
+        self._mtime = None
+
+    @property
+    def symbols(self):
+        """
+        dict: The symbols as keys and their inscodes as values.
+        """
+
+        self._load()
+        return self._symbols
+
+    @property
+    def inscodes(self):
+        """
+        dict: The inscodes as keys and their symbols as values.
+        """
+
+        self._load()
+        return self._inscodes
+
+    def to_inscode(self, symbol):
+        self._load()
+        return self._index.get(normalize_symbol(symbol))
+
+    def to_symbol(self, inscode):
+        return self.inscodes.get(str(inscode))
+
+    def to_inscodes(self, symbols):
+        """
+        Converts many symbols to their inscodes at once.
+
+        Parameters:
+            symbols (list/Series): The stock symbols.
+
+        Returns:
+            list/Series: The inscodes in the same order, None (NaN for a Series) for unknown symbols.
+        """
+
+        self._load()
+        table = self._index
+        if isinstance(symbols, pd.Series):
+            return symbols.str.translate(_PERSIAN_LETTERS).map(table)
+        return [table.get(normalize_symbol(symbol)) for symbol in symbols]
+
+    def to_symbols(self, inscodes):
+        """
+        Converts many inscodes to their symbols at once.
+
+        Parameters:
+            inscodes (list/Series): The inscodes.
+
+        Returns:
+            list/Series: The symbols in the same order, None (NaN for a Series) for unknown inscodes.
+        """
+
+        table = self.inscodes
+        if isinstance(inscodes, pd.Series):
+            return inscodes.astype(str).map(table)
+        return [table.get(str(inscode)) for inscode in inscodes]
+
+
+registry = SymbolRegistry(path.join(path.dirname(__file__), 'syms.json'))
+
 def symbols_dict():
     """
-    Reads the 'syms.json' file and returns a dictionary of stock symbols and their inscodes.
+    Returns a dictionary of stock symbols and their inscodes from the 'syms.json' file.
 
     Returns:
         dict: A dictionary with symbols as keys and inscodes as values.
     """
 
-    file_path = path.join(path.dirname(__file__), 'syms.json')
-    with open(file_path, 'r', encoding='utf-8') as f:
-        symbols_dict = json.load(f)
-
-    return symbols_dict
+    return dict(registry.symbols)
 
 def symbol_to_inscode(symbol):
     """
@@ -32,9 +162,7 @@ def symbol_to_inscode(symbol):
         str: The corresponding inscode if found, otherwise None.
 """
 
-    symbols = symbols_dict()
-    symbol = symbol.replace(chr(1610), 'ی').replace(chr(1603), 'ک')
-    return symbols[symbol] if symbol in symbols.keys() else None
+    return registry.to_inscode(symbol)
 
 def inscode_to_symbol(inscode):
     """
@@ -47,9 +175,20 @@ def inscode_to_symbol(inscode):
         str: The corresponding stock symbol if found, otherwise None.
     """
 
-    symbols = symbols_dict()
-    symbols = {value: key for key, value in symbols.items()}
-    return symbols[id] if id in symbols.keys() else None
+    return registry.to_symbol(inscode)
+
+def symbols_to_inscodes(symbols):
+    """
+    Converts a list or a Series of stock symbols to their inscodes.
+
+    Parameters:
+        symbols (list/Series): The stock symbols to convert.
+
+    Returns:
+        list/Series: The corresponding inscodes, missing values for unknown symbols.
+    """
+
+    return registry.to_inscodes(symbols)
 
 def symbols_category():
     """
@@ -71,7 +210,7 @@ def symbols_category():
     """
 
     try:
-        datas = requests.get(url= config.SYMBOLS, headers= config.HEADERS).text
+        datas = http_client.get(config.SYMBOLS, 'symbols').text
         market_df = pd.read_html(datas, header=0)  [0]
     except:
         return
@@ -132,4 +271,5 @@ def update_syms_file():
     symbols_dict = df['id'].to_dict()
     with open(file_path, 'w', encoding= 'utf-8') as f:
         json.dump(symbols_dict, f, ensure_ascii=False, indent=4)
-    return True
\ No newline at end of file
+    registry.reload()
+    return True